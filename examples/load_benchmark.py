@@ -0,0 +1,55 @@
+""" Benchmark of the queries sent to load collections of resources.
+
+Counts the queries sent to the store, and measures the time taken, to load
+all the resources of a class with ``all().full()``, with the session
+`auto_load` off and on.
+
+    python examples/load_benchmark.py [resources] [repeat]
+
+"""
+import sys
+import timeit
+
+import surf
+from surf.namespace import FOAF
+from surf.rdf import URIRef
+
+
+def build_session(resources):
+    store = surf.Store(reader="rdflib", writer="rdflib")
+    session = surf.Session(store)
+    Person = session.get_class(FOAF.Person)
+    for i in range(resources):
+        person = Person("http://example.com/person/%d" % i)
+        person.foaf_name = "Person %d" % i
+        person.foaf_knows = URIRef("http://example.com/person/%d" % ((i + 1) % resources))
+    session.commit()
+    return session
+
+
+def run(session, auto_load, resources, repeat):
+    reader = session.default_store.reader
+    execute = reader._execute
+    queries = []
+    reader._execute = lambda query: queries.append(query) or execute(query)
+
+    session.auto_load = auto_load
+    Person = session.get_class(FOAF.Person)
+    load = lambda: list(Person.all().full())
+    try:
+        load()
+        count = len(queries)
+        seconds = min(timeit.repeat(load, number=1, repeat=repeat))
+    finally:
+        reader._execute = execute
+
+    print "auto_load %-5s %6d resources  %6d queries  %8.2f ms" % (auto_load, resources, count, seconds * 1000)
+
+
+if __name__ == '__main__':
+    resources = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    session = build_session(resources)
+    run(session, False, resources, repeat)
+    run(session, True, resources, repeat)
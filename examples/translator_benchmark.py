@@ -0,0 +1,46 @@
+""" Micro-benchmark of the SPARQL / SPARUL translation of large queries.
+
+Measures how many triple patterns per second are translated for an INSERT
+with many statements (as built by the sparql_protocol writer when saving
+resources) and for a SELECT with many triple patterns.
+
+    python examples/translator_benchmark.py [patterns] [repeat]
+
+"""
+import sys
+import timeit
+
+from surf.namespace import FOAF
+from surf.query import select
+from surf.query.update import insert
+from surf.rdf import Literal, URIRef, RDF
+
+
+def build_insert(patterns):
+    query = insert().into(URIRef("http://example.com/graph"))
+    for i in range(patterns):
+        subject = URIRef("http://example.com/person/%d" % (i / 10))
+        query.template((subject, RDF.type, FOAF.Person))
+        query.template((subject, FOAF.name, Literal("Person %d" % i)))
+        query.template((subject, FOAF.knows, URIRef("http://example.com/person/%d" % (i + 1))))
+    return query
+
+
+def build_select(patterns):
+    query = select("?s")
+    for i in range(patterns):
+        query.where(("?s", FOAF["p%d" % (i % 20)], "?v%d" % i))
+    return query
+
+
+def run(name, query, patterns, repeat):
+    seconds = min(timeit.repeat(lambda: unicode(query), number=1, repeat=repeat))
+    print "%-8s %7d patterns  %8.2f ms  %10.0f patterns/s" % (name, patterns, seconds * 1000, patterns / seconds)
+
+
+if __name__ == '__main__':
+    patterns = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    run("INSERT", build_insert(patterns), patterns * 3, repeat)
+    run("SELECT", build_select(patterns), patterns, repeat)
@@ -36,6 +36,8 @@
 __author__ = 'Cosmin Basca'
 
 
+import threading
+
 from surf.log import *
 from surf.plugin.writer import RDFWriter
 
@@ -46,6 +48,9 @@ from franz.openrdf.sail.allegrographserver import AllegroGraphServer
 from franz.openrdf.repository.repository import Repository
 from franz.openrdf.rio.rdfformat import RDFFormat
 
+# the maximum number of statements sent in one addTriples or removeQuads call
+DEFAULT_BATCH_SIZE = 10000
+
 
 class WriterPlugin(RDFWriter):
     def __init__(self, reader, *args, **kwargs):
@@ -76,6 +81,8 @@ class WriterPlugin(RDFWriter):
 
         self.__con = self.__allegro_repository.getConnection()
         self.__f = self.__allegro_repository.getValueFactory()
+        self.__batch_size = int(kwargs.get('batch_size', DEFAULT_BATCH_SIZE))
+        self.__lock = threading.Lock()
 
     results_format = property(lambda self: 'json')
     server = property(lambda self: self.__server)
@@ -86,37 +93,51 @@ class WriterPlugin(RDFWriter):
     allegro_server = property(lambda self: self.__allegro_server)
     allegro_catalog = property(lambda self: self.__allegro_catalog)
     allegro_repository = property(lambda self: self.__allegro_repository)
+    batch_size = property(lambda self: self.__batch_size)
 
     def _save(self, *resources):
+        convert = self.__converter()
         for resource in resources:
-            s = resource.subject
-            self.__remove(s, context=resource.context)
-            for p, objs in resource.rdf_direct.items():
-                for o in objs:
-                    self.__add(s, p, o, resource.context)
+            self.__remove(resource.subject, context=resource.context, convert=convert)
+        self.__add_many(self.__quads(resources, convert))
 
     def _update(self, *resources):
+        convert = self.__converter()
+        removed_quads, quads = [], []
         for resource in resources:
-            s = resource.subject
-            for p in resource.rdf_direct:
-                self.__remove(s, p, context=resource.context)
-            for p, objs in resource.rdf_direct.items():
-                for o in objs:
-                    self.__add(s, p, o, resource.context)
+            removed, added = self._changes(resource)
+            removed_quads.extend((s, p, o, resource.context) for s, p, o in removed)
+            quads.extend((convert(s), convert(p), convert(o), convert(resource.context))
+                         for s, p, o in added)
+        self.__remove_many(removed_quads, convert)
+        self.__add_many(quads)
 
     def _remove(self, *resources, **kwargs):
         inverse = kwargs.get("inverse")
+        convert = self.__converter()
         for resource in resources:
-            self.__remove(s = resource.subject, context=resource.context)
+            self.__remove(s = resource.subject, context=resource.context, convert=convert)
             if inverse:
-                self.__remove(o = resource.subject, context=resource.context)
+                self.__remove(o = resource.subject, context=resource.context, convert=convert)
 
     def _size(self):
-        return self.__con.size()
+        with self.__lock:
+            return self.__con.size()
 
     def _add_triple(self, s = None, p = None, o = None, context = None):
         self.__add(s, p, o, context)
 
+    def _add_triples(self, quads):
+        convert = self.__converter()
+        self.__add_many((convert(s), convert(p), convert(o), convert(context))
+                        for s, p, o, context in quads)
+
+    def _write_batch(self, removed, added):
+        convert = self.__converter()
+        self.__remove_many(removed, convert)
+        self.__add_many((convert(s), convert(p), convert(o), convert(context))
+                        for s, p, o, context in added)
+
     def _set_triple(self, s = None, p = None, o = None, context = None):
         self.__remove(s, p, context = context)
         self.__add(s, p, o, context)
@@ -125,13 +146,80 @@ class WriterPlugin(RDFWriter):
         self.__remove(s, p, o, context)
 
     # used by the sesame api
+    def __converter(self):
+        '''
+        returns a function converting terms to sesame values, caching the
+        conversions for the lifetime of one batch
+        '''
+        values = {}
+
+        def convert(term):
+            if term not in values:
+                values[term] = toSesame(term, self.__f)
+            return values[term]
+
+        return convert
+
+    def __quads(self, resources, convert):
+        for resource in resources:
+            s = convert(resource.subject)
+            context = convert(resource.context)
+            for p, objs in resource.rdf_direct.items():
+                p = convert(p)
+                for o in objs:
+                    yield s, p, convert(o), context
+
+    def __add_many(self, quads):
+        batch = []
+        for quad in quads:
+            batch.append(quad)
+            if len(batch) >= self.__batch_size:
+                self.__add_batch(batch)
+                batch = []
+        if batch:
+            self.__add_batch(batch)
+
+    def __add_batch(self, batch):
+        debug('ADD TRIPLES: %d' % len(batch))
+        # the repository connection is not safe to share between threads
+        with self.__lock:
+            self.__con.addTriples(batch)
+
+    def __remove_many(self, quads, convert):
+        '''
+        removes the `(s, p, o, context)` quads, where `None` is a wildcard:
+        the concrete quads are removed in batches of `batch_size`, the
+        patterns, and the statements removed from every context, one
+        removeTriples call each
+        '''
+        batch = []
+        for s, p, o, context in quads:
+            if s is None or p is None or o is None or context is None:
+                self.__remove(s, p, o, context = context, convert = convert)
+                continue
+            batch.append((convert(s), convert(p), convert(o), convert(context)))
+            if len(batch) >= self.__batch_size:
+                self.__remove_batch(batch)
+                batch = []
+        if batch:
+            self.__remove_batch(batch)
+
+    def __remove_batch(self, batch):
+        debug('REM TRIPLES: %d' % len(batch))
+        with self.__lock:
+            self.__con.removeQuads(batch)
+
     def __add(self, s = None, p = None, o = None, context = None):
         info('ADD TRIPLE: %s, %s, %s, %s' % (s, p, o, context))
-        self.__con.addTriple(toSesame(s, self.__f), toSesame(p, self.__f), toSesame(o, self.__f), contexts = toSesame(context, self.__f))
+        with self.__lock:
+            self.__con.addTriple(toSesame(s, self.__f), toSesame(p, self.__f), toSesame(o, self.__f), contexts = toSesame(context, self.__f))
 
-    def __remove(self, s = None, p = None, o = None, context = None):
+    def __remove(self, s = None, p = None, o = None, context = None, convert = None):
         info('REM TRIPLE: %s, %s, %s, %s' % (s, p, o, context))
-        self.__con.removeTriples(toSesame(s, self.__f), toSesame(p, self.__f), toSesame(o, self.__f), contexts = toSesame(context, self.__f))
+        if convert is None:
+            convert = lambda term: toSesame(term, self.__f)
+        with self.__lock:
+            self.__con.removeTriples(convert(s), convert(p), convert(o), contexts = convert(context))
 
     def index_triples(self, **kwargs):
         """ Index triples if this functionality is present.
@@ -156,14 +244,16 @@ class WriterPlugin(RDFWriter):
         context = kwargs['context'] if 'context' in kwargs else None
         server_side = kwargs['server_side'] if 'server_side' in kwargs else True
         if source:
-            self.__con.addFile(source, base = base, format = format, context = toSesame(context, self.__f), serverSide = server_side)
+            with self.__lock:
+                self.__con.addFile(source, base = base, format = format, context = toSesame(context, self.__f), serverSide = server_side)
             return True
         return False
 
     def _clear(self, context = None):
         """ Clear the triple-store. """
 
-        self.__con.clear(contexts = toSesame(context, self.__f))
+        with self.__lock:
+            self.__con.clear(contexts = toSesame(context, self.__f))
 
     # Extra functionality
     def register_fts_predicate(self, namespace, localname):
@@ -173,19 +263,25 @@ class WriterPlugin(RDFWriter):
         self.__allegro_repository.registerFreeTextPredicate(namespace = unicode(namespace), localname = localname)
 
     def namespaces(self):
-        return self.__con.getNamespaces()
+        with self.__lock:
+            return self.__con.getNamespaces()
 
     def namespace(self, prefix):
-        return self.__con.getNamespace(prefix)
+        with self.__lock:
+            return self.__con.getNamespace(prefix)
 
     def set_namespace(self, prefix, namespace):
-        self.__con.setNamespace(prefix, namespace)
+        with self.__lock:
+            self.__con.setNamespace(prefix, namespace)
 
     def remove_namespace(self, prefix):
-        self.__con.removeNamespace(prefix)
+        with self.__lock:
+            self.__con.removeNamespace(prefix)
 
     def clear_namespaces(self):
-        self.__con.clearNamespaces()
+        with self.__lock:
+            self.__con.clearNamespaces()
 
     def close(self):
-        self.__con.close()
+        with self.__lock:
+            self.__con.close()
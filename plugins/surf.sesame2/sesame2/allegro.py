@@ -49,8 +49,8 @@ class AllegroException(Exception):
 
 class Allegro(sesame2.Sesame2):
 
-    def __init__(self, host, port = 80, root_path = '/sesame', directory = '', strict = False):
-        sesame2.Sesame2.__init__(self, host, port, root_path, strict)
+    def __init__(self, host, port = 80, root_path = '/sesame', directory = '', strict = False, pool = None):
+        sesame2.Sesame2.__init__(self, host, port, root_path, strict, pool)
         sesame2.Sesame2.url['load'] = '/repositories/%(id)s/load'
         sesame2.Sesame2.url['index'] = '/repositories/%(id)s/index'
         sesame2.Sesame2.url['map'] = '/repositories/%(id)s/map'
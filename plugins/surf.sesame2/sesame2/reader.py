@@ -34,9 +34,9 @@
 
 # -*- coding: utf-8 -*-
 from surf.log import *
-from surf.util import json_to_rdflib
 from surf.plugin.query_reader import RDFQueryReader
 from allegro import Allegro
+from sesame2 import ConnectionPool
 
 __author__ = 'Cosmin Basca'
 
@@ -50,6 +50,16 @@ class ReaderPlugin(RDFQueryReader):
         self.__repository_path = kwargs['repository_path'] if 'repository_path' in kwargs else ''
         self.__repository = kwargs['repository'] if 'repository' in kwargs else None
         self.__use_allegro_extensions = kwargs['use_allegro_extensions'] if 'use_allegro_extensions' in kwargs else False
+        use_gzip = kwargs.get('use_gzip', False)
+        if isinstance(use_gzip, basestring):
+            use_gzip = (use_gzip.lower() == 'true')
+
+        # the connection pool is shared with the writer plugin
+        self.__allegro = Allegro(self.__server, self.__port, self.__root_path, self.__repository_path,
+                                 pool = ConnectionPool(self.__server, self.__port,
+                                                       max_connections = int(kwargs.get('max_connections', 4)),
+                                                       gzip = use_gzip,
+                                                       timeout = float(kwargs.get('pool_timeout', 60))))
 
         info('INIT: %s, %s, %s, %s' % (self.server,
                                                 self.port, 
@@ -71,6 +81,9 @@ class ReaderPlugin(RDFQueryReader):
     use_allegro_extensions = property(lambda self: self.__use_allegro_extensions)
 
     def _to_table(self, result):
+        '''
+        the result is already a sequence (usually a generator) of rows
+        '''
         return result
 
     def _ask(self, result):
@@ -80,29 +93,20 @@ class ReaderPlugin(RDFQueryReader):
         return result
 
     def get_allegro(self):
-        return Allegro(self.server, self.port, self.root_path, 
-                       self.repository_path)
+        return self.__allegro
 
     # execute
     def _execute(self, query):
+        '''
+        results are requested as SPARQL XML and parsed incrementally, rows
+        are yielded as they are consumed
+        '''
         q_string = unicode(query)
-        result = self.execute_sparql(q_string)
-
-        if 'boolean' in result:
-            return result['boolean']
-
-        converted = []
-        for binding in result["results"]["bindings"]:
-            rdf_item = {}
-            for key, obj in binding.items():
-                try:
-                    rdf_item[key] = json_to_rdflib(obj)
-                except ValueError:
-                    continue
-
-            converted.append(rdf_item)
-
-        return converted
+        debug(q_string)
+        return self.get_allegro().sparql_query(self.repository,
+                                               q_string,
+                                               infer = self.inference,
+                                               format = 'sparql')
 
     def execute_sparql(self, query, format='JSON'):
         try:
@@ -121,5 +125,5 @@ class ReaderPlugin(RDFQueryReader):
             error("Exception on query")
 
     def close(self):
-        pass
+        self.__allegro.close()
 
@@ -37,68 +37,141 @@ __author__ = 'Cosmin Basca'
 
 import httplib
 import logging
+import socket
+import threading
+import time
+import zlib
+from StringIO import StringIO
 from urllib import urlencode
-from xml.dom.minidom import parseString, getDOMImplementation
+from xml.dom.minidom import getDOMImplementation
+try:
+    from xml.etree.cElementTree import iterparse
+except ImportError, e:
+    from xml.etree.ElementTree import iterparse
 try:
     from json import loads
 except Exception, e:
     from simplejson import loads
 
+from surf.log import *
 from surf.rdf import BNode, ConjunctiveGraph, Graph, Literal, Namespace, URIRef
 
-def parse_sparql_xml(response):
-        def get_text(node):
-            t = ""
-            for n in node.childNodes:
-                if n.nodeType == n.TEXT_NODE:
-                    t += n.nodeValue
-            return t
-
-        def get_binding(node):
-            cnt = None
-            for cn in node.childNodes:
-                if cn.nodeType == cn.ELEMENT_NODE:
-                    cnt = cn
-                    break
-            if cnt:
-                txt = get_text(cnt)
-                if cnt.nodeName == 'uri':
-                    return URIRef(txt)
-                elif cnt.nodeName == 'literal':
-                    return Literal(txt)
-                elif cnt.nodeName == 'bnode':
-                    return BNode(txt)
-            else:
-                return None
-
-        #print 'response ,',response
+SPARQL_RESULTS_NS = 'http://www.w3.org/2005/sparql-results#'
+XML_NS = 'http://www.w3.org/XML/1998/namespace'
+
+_RESULTS = '{%s}results' % SPARQL_RESULTS_NS
+_RESULT = '{%s}result' % SPARQL_RESULTS_NS
+_BINDING = '{%s}binding' % SPARQL_RESULTS_NS
+_BOOLEAN = '{%s}boolean' % SPARQL_RESULTS_NS
+_URI = '{%s}uri' % SPARQL_RESULTS_NS
+_LITERAL = '{%s}literal' % SPARQL_RESULTS_NS
+_BNODE = '{%s}bnode' % SPARQL_RESULTS_NS
+_LANG = '{%s}lang' % XML_NS
+
+
+def _sparql_xml_term(elem):
+    """
+    Convert a `uri`, `literal` or `bnode` result element to its rdflib term,
+    keeping the datatype and language of literals.
+    """
+    text = elem.text or u''
+    if elem.tag == _URI:
+        return URIRef(text)
+    elif elem.tag == _BNODE:
+        return BNode(text)
+    datatype = elem.get('datatype')
+    return Literal(text, lang=elem.get(_LANG), datatype=URIRef(datatype) if datatype else None)
+
+
+def _close(source):
+    close = getattr(source, 'close', None)
+    if close:
+        close()
+
+
+def _iter_sparql_xml_rows(events, results, source):
+    """
+    Yield the rows of a SPARQL XML result set as dicts of rdflib terms, while
+    discarding the already consumed elements. The `source` is closed once
+    the rows are consumed, or when the generator is closed after it started.
+    """
+    row = None
+    name = None
+    try:
+        for event, elem in events:
+            if event == 'start':
+                if elem.tag == _RESULT:
+                    row = {}
+                elif elem.tag == _BINDING:
+                    name = elem.get('name')
+            elif elem.tag in (_URI, _LITERAL, _BNODE):
+                row[name] = _sparql_xml_term(elem)
+            elif elem.tag == _RESULT:
+                yield row
+                # drop the consumed results from the tree
+                elem.clear()
+                results.clear()
+    except SyntaxError, e:
+        error('Invalid SPARQL XML results: %s', e)
+    finally:
+        _close(source)
+
+
+class SparqlXMLRows(object):
+    """
+    Iterator over the rows of a SPARQL XML result set, see
+    :func:`_iter_sparql_xml_rows`. Unlike a generator, it closes the `source`
+    when it is closed or garbage collected before its first row was read, so
+    a dropped result gives its response back to the pool.
+    """
+
+    def __init__(self, events, results, source):
+        self.__source = source
+        self.__rows = _iter_sparql_xml_rows(events, results, source)
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        return next(self.__rows)
+
+    def close(self):
+        self.__rows.close()
+        source, self.__source = self.__source, None
+        _close(source)
 
-        try:
-            doc = parseString(response)
-            #head = doc.getElementsByTagName('head')[0]
-            #headers = []
-            #for h in head.childNodes:
-            #    if h.nodeType == h.ELEMENT_NODE:
-            #        headers.append(h.getAttribute('name'))
-            results_nodes = doc.getElementsByTagName('results')
-            if results_nodes:
-                results = results_nodes[0]
-                res_list = []
-                for result in results.childNodes:
-                    if result.nodeType == result.ELEMENT_NODE:
-                        res = {}
-                        for binding in result.childNodes:
-                            if binding.nodeType == binding.ELEMENT_NODE:
-                                res[binding.getAttribute('name')] = get_binding(binding)
-                        res_list.append(res)
-                return res_list
-            else:
-                boolean = doc.getElementsByTagName('boolean')[0]
-                value = boolean.childNodes[0].nodeValue
-                return {'false': False, 'true': True}[value]
-        except:
-            print 'NOT XML Response: %s' % response
-            return []
+    def __del__(self):
+        self.close()
+
+
+def parse_sparql_xml(source):
+    """
+    Incrementally parse a SPARQL XML results document.
+
+    :param source: the document, a string or a file-like object, such as the
+        response of a :class:`ConnectionPool` request, which is closed once
+        the results are read
+    :return: the value of an **ASK** result, otherwise an iterator yielding
+        each result row as a dict of rdflib terms
+    :rtype: bool or :class:`SparqlXMLRows`
+    """
+    if isinstance(source, unicode):
+        source = source.encode('utf-8')
+    if isinstance(source, str):
+        source = StringIO(source)
+
+    events = iterparse(source, events=('start', 'end'))
+    try:
+        for event, elem in events:
+            if event == 'start' and elem.tag == _RESULTS:
+                return SparqlXMLRows(events, elem, source)
+            elif event == 'end' and elem.tag == _BOOLEAN:
+                _close(source)
+                return (elem.text or '').strip() == 'true'
+    except SyntaxError, e:
+        error('Invalid SPARQL XML results: %s', e)
+    _close(source)
+    return []
 
 '''
 represents an RDF Transaction object
@@ -110,10 +183,23 @@ class RDFTransaction(object):
         impl = getDOMImplementation()
         self.transaction = impl.createDocument(None, 'transaction', None)
         self.root = self.transaction.documentElement
+        self.__operations = 0
+
+    def __len__(self):
+        '''
+        the number of operations in the transaction
+        '''
+        return self.__operations
+
+    def _append(self, node):
+        self.root.appendChild(node)
+        self.__operations += 1
 
     def _rdf_node(self, entity):
         node = None
-        if type(entity) is URIRef:
+        if entity is None:
+            node = self.transaction.createElement('null')
+        elif type(entity) is URIRef:
             node = self.transaction.createElement('uri')
             node.appendChild(self.transaction.createTextNode(unicode(entity)))
         elif type(entity) is BNode:
@@ -122,56 +208,48 @@ class RDFTransaction(object):
         elif type(entity) is Literal:
             node = self.transaction.createElement('literal')
             node.appendChild(self.transaction.createTextNode(unicode(entity)))
-            if entity.lang:
-                node.setAttribute('xml:lang', entity.lang)
+            if entity.language:
+                node.setAttribute('xml:lang', entity.language)
             if entity.datatype:
                 node.setAttribute('datatype', entity.datatype)
         return node
 
+    def _statement(self, operation, s, p, o, context):
+        '''
+        an operation on a statement, `None` terms and context stand for
+        wildcards and for the null context respectively
+        '''
+        if context is not None and type(context) not in [URIRef, BNode]:
+            context = URIRef(context)
+
+        node = self.transaction.createElement(operation)
+        node.appendChild(self._rdf_node(s))
+        node.appendChild(self._rdf_node(p))
+        node.appendChild(self._rdf_node(o))
+        contexts = self.transaction.createElement('contexts')
+        contexts.appendChild(self._rdf_node(context))
+        node.appendChild(contexts)
+        self._append(node)
+
     def add_triple(self, s, p, o, context = None):
-        try:
-            node = self.transaction.createElement('add')
-            node.appendChild(self._rdf_node(s))
-            node.appendChild(self._rdf_node(p))
-            node.appendChild(self._rdf_node(o))
-            if context:
-                node.appendChild(self.transaction.createTextNode(unicode(context)))
-            self.root.appendChild(node)
-        except:
-            pass
+        self._statement('add', s, p, o, context)
+
+    def remove_triple(self, s = None, p = None, o = None, context = None):
+        self._statement('remove', s, p, o, context)
 
     def add(self, graph, context = None):
-        try:
-            node = self.transaction.createElement('add')
-            for s, p, o in graph:
-                node.appendChild(self._rdf_node(s))
-                node.appendChild(self._rdf_node(p))
-                node.appendChild(self._rdf_node(o))
-                if context:
-                    node.appendChild(self.transaction.createTextNode(unicode(context)))
-            self.root.appendChild(node)
-        except:
-            pass
+        for s, p, o in graph:
+            self.add_triple(s, p, o, context)
 
     def remove(self, graph, context = None):
-        try:
-            node_name = 'removeFromNamedContext' if context else 'remove'
-            node = self.transaction.createElement(node_name)
-            for s, p, o in graph:
-                node.appendChild(self._rdf_node(s))
-                node.appendChild(self._rdf_node(p))
-                node.appendChild(self._rdf_node(o))
-                if context:
-                    node.appendChild(self.transaction.createTextNode(unicode(context)))
-            self.root.appendChild(node)
-        except:
-            pass
+        for s, p, o in graph:
+            self.remove_triple(s, p, o, context)
 
     def clear(self, context = None):
         node = self.transaction.createElement('clear')
         if context:
-            node.appendChild(self.transaction.createTextNode(unicode(context)))
-        self.root.appendChild(node)
+            node.appendChild(self._rdf_node(URIRef(context)))
+        self._append(node)
 
 
     def add_namespace(self, **namespaces):
@@ -179,29 +257,192 @@ class RDFTransaction(object):
             node = self.transaction.createElement('setNamespace')
             node.setAttribute('prefix', prefix)
             node.setAttribute('name', unicode(namespaces[prefix]))
-            self.root.appendChild(node)
+            self._append(node)
 
     def remove_namespace(self, *namespaces):
         for prefix in namespaces:
             node = self.transaction.createElement('removeNamespace')
             node.setAttribute('prefix', prefix)
-            self.root.appendChild(node)
+            self._append(node)
 
     def __str__(self):
-        self.xml()
+        return self.xml()
 
     def xml(self):
         return self.transaction.toxml()
 
 
 class Sesame2Exception(Exception):
-    def __init__(self, response):
-        self._response = response
+    def __init__(self, status, reason, content):
+        self._status = status
+        self._reason = reason
+        self._content = content
 
     def __str__(self):
-        return 'Sesame 2 exception, response = [%d, %s, %s]' % (self._response.status, self._response.reason, self._response.read())
+        return 'Sesame 2 exception, response = [%d, %s, %s]' % (self._status, self._reason, self._content)
 
-class Sesame2(httplib.HTTPConnection):
+class ConnectionPoolTimeout(Exception):
+    '''
+    raised when no request slot of a :class:`ConnectionPool` is freed in time
+    '''
+
+class ResponseStream(object):
+    '''
+    the body of a response as a file-like object, read as it arrives and
+    decompressed if it is gzip encoded
+
+    `done` is called once, with `True` when the body was read to the end and
+    the connection can be reused, or with `False` when the stream is closed
+    before
+    '''
+
+    def __init__(self, response, done):
+        self.__response = response
+        self.__done = done
+        self.__decompressor = None
+        if (response.getheader('Content-Encoding') or '').lower() == 'gzip':
+            self.__decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def read(self, size = -1):
+        if size < 0:
+            chunks = []
+            chunk = self.read(16384)
+            while chunk:
+                chunks.append(chunk)
+                chunk = self.read(16384)
+            return ''.join(chunks)
+
+        while self.__done:
+            data = self.__response.read(size)
+            if not data:
+                data = self.__decompressor.flush() if self.__decompressor else ''
+                self.__finish(True)
+                return data
+            if self.__decompressor:
+                data = self.__decompressor.decompress(data)
+            if data:
+                return data
+        return ''
+
+    def close(self):
+        if self.__done:
+            self.__finish(False)
+
+    def __finish(self, reusable):
+        done, self.__done = self.__done, None
+        done(reusable)
+
+class ConnectionPool(object):
+    '''
+    a thread-safe pool of persistent (keep-alive) HTTP connections to one
+    server, at most `max_connections` requests are waiting for a response at
+    any time
+
+    a request waits at most `timeout` seconds for a slot, then raises
+    :class:`ConnectionPoolTimeout`. The slot is freed as soon as the response
+    headers arrive, a streamed body being read does not hold it, so results
+    read while other requests are sent can not exhaust the pool
+    '''
+
+    def __init__(self, host, port = 80, max_connections = 4, gzip = False, strict = False, timeout = 60):
+        self.host = host
+        self.port = port
+        self.gzip = gzip
+        self.timeout = timeout
+        self.__strict = strict
+        self.__idle = []
+        self.__lock = threading.Lock()
+        self.__slots = max_connections
+        self.__slot_freed = threading.Condition(self.__lock)
+
+    def __connection(self):
+        '''
+        returns an idle connection if available or a new one, and whether it
+        was reused
+        '''
+        with self.__lock:
+            if self.__idle:
+                return self.__idle.pop(), True
+        return httplib.HTTPConnection(self.host, self.port, self.__strict), False
+
+    def __acquire_slot(self):
+        deadline = time.time() + self.timeout
+        with self.__lock:
+            while not self.__slots:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise ConnectionPoolTimeout('No connection to %s:%s freed in %s seconds' %
+                                                (self.host, self.port, self.timeout))
+                self.__slot_freed.wait(remaining)
+            self.__slots -= 1
+
+    def __release_slot(self):
+        with self.__lock:
+            self.__slots += 1
+            self.__slot_freed.notify()
+
+    def __release(self, connection, reusable):
+        if reusable:
+            with self.__lock:
+                self.__idle.append(connection)
+        else:
+            connection.close()
+
+    def __send(self, connection, method, url, body, headers):
+        connection.request(method, url, body, headers)
+        return connection.getresponse()
+
+    def request(self, method, url, body = '', headers = {}, stream = False):
+        '''
+        performs the request and reads the whole response,
+        returns a (status, reason, content type, content) tuple
+
+        with `stream` set, the content is a :class:`ResponseStream` reading
+        the response as it arrives, the connection is only returned to the
+        pool once the content is read to the end or closed
+        '''
+        headers = dict(headers)
+        if self.gzip:
+            headers['Accept-Encoding'] = 'gzip'
+
+        self.__acquire_slot()
+        try:
+            connection, reused = self.__connection()
+            try:
+                try:
+                    response = self.__send(connection, method, url, body, headers)
+                except (httplib.HTTPException, socket.error):
+                    if not reused:
+                        raise
+                    # the server dropped the idle connection, retry once
+                    debug('Stale connection to %s:%s, reconnecting' % (self.host, self.port))
+                    connection.close()
+                    response = self.__send(connection, method, url, body, headers)
+            except:
+                self.__release(connection, False)
+                raise
+        finally:
+            self.__release_slot()
+
+        content = ResponseStream(response, lambda reusable: self.__release(connection, reusable))
+        if not stream:
+            try:
+                content = content.read()
+            except:
+                content.close()
+                raise
+        return response.status, response.reason, response.getheader('Content-Type'), content
+
+    def close(self):
+        '''
+        closes all idle connections
+        '''
+        with self.__lock:
+            idle, self.__idle = self.__idle, []
+        for connection in idle:
+            connection.close()
+
+class Sesame2(object):
     url = {
         'protocol'          : '/protocol',
         'repositories'      : '/repositories',
@@ -242,26 +483,29 @@ class Sesame2(httplib.HTTPConnection):
         'DESCRIBE'  : ['xml', 'n3']
     }
 
-    def __init__(self, host, port = 80, root_path = '/sesame', strict = False):
-        httplib.HTTPConnection.__init__(self, host, port, strict)
+    def __init__(self, host, port = 80, root_path = '/sesame', strict = False, pool = None):
         self.root_path = root_path
+        self.__pool = pool if pool else ConnectionPool(host, port, strict = strict)
 
-    def __del__(self):
-        self.close()
+    pool = property(lambda self: self.__pool)
 
-    def __deserialize(self, response):
-        '''
-        serializes the response based on the Content-Type or Accept header
-        '''
-        content_type = response.getheader('Content-type')
-        content = response.read()
+    def close(self):
+        self.__pool.close()
 
+    @staticmethod
+    def __format(content_type):
         format = 'text'
         if isinstance(content_type, str):
             for type, mimetype in Sesame2.response_format.items():
                 if content_type.startswith(mimetype):
                     format = type
-        
+        return format
+
+    def __deserialize(self, content_type, content):
+        '''
+        serializes the response based on the Content-Type or Accept header
+        '''
+        format = self.__format(content_type)
         ser_content = content
         if format in ['nt', 'xml', 'n3', 'turtle']:
             graph = ConjunctiveGraph()
@@ -278,14 +522,20 @@ class Sesame2(httplib.HTTPConnection):
         params = urlencode(params)
         url = '%s?%s' % (url, params) if len(params) > 0 else url
 
-        self.connect() # Re-open connection if it was closed.
-        self.request(method, url, body, headers)
-        response = self.getresponse()
-        if response.status in [200, 204]:
-            return self.__deserialize(response)
+        status, reason, content_type, content = self.__pool.request(method, url, body, headers, stream = True)
+        if status in [200, 204] and self.__format(content_type) == 'sparql':
+            # the results are parsed as they arrive
+            return parse_sparql_xml(content)
+
+        try:
+            data = content.read()
+        finally:
+            content.close()
+        content = data
+        if status in [200, 204]:
+            return self.__deserialize(content_type, content)
         else:
-            print response.read()
-            raise Sesame2Exception(response)
+            raise Sesame2Exception(status, reason, content)
 
     def protocol(self):
         protocol = self.sesame2_request('GET', 'protocol')
@@ -0,0 +1,174 @@
+""" Module for sesame2 connection pool tests. """
+
+import gzip
+import threading
+import time
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+from StringIO import StringIO
+from unittest import TestCase
+
+from sesame2.sesame2 import ConnectionPool, ConnectionPoolTimeout, Sesame2
+
+
+RESULT = ('<result><binding name="s"><uri>http://example.org/%s</uri></binding></result>'
+          % ('x' * 200))
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    connections = set()
+    # set by the client to receive the second half of the SPARQL results
+    proceed = None
+    waited_out = False
+    # set by the client to answer the requests for /slow
+    answer = None
+
+    def do_GET(self):
+        Handler.connections.add(self.client_address)
+        if self.path.startswith('/sesame/'):
+            return self.send_results()
+        if self.path == '/slow':
+            Handler.answer.wait(5)
+
+        body = 'hello'
+        headers = {'Content-Type': 'text/plain'}
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            buf = StringIO()
+            gz = gzip.GzipFile(fileobj = buf, mode = 'wb')
+            gz.write(body)
+            gz.close()
+            body = buf.getvalue()
+            headers['Content-Encoding'] = 'gzip'
+
+        self.send_response(200)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_results(self):
+        # the first half of the results is sent before the second is asked for
+        head = ('<?xml version="1.0"?><sparql xmlns="http://www.w3.org/2005/sparql-results#">'
+                '<head><variable name="s"/></head><results>' + RESULT * 200)
+        tail = RESULT * 200 + '</results></sparql>'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/sparql-results+xml')
+        self.send_header('Content-Length', str(len(head) + len(tail)))
+        self.end_headers()
+        self.wfile.write(head)
+        self.wfile.flush()
+        if Handler.proceed:
+            Handler.waited_out = not Handler.proceed.wait(5)
+        self.wfile.write(tail)
+
+    def log_message(self, *args):
+        pass
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class ConnectionPoolTest(TestCase):
+
+    def setUp(self):
+        Handler.connections = set()
+        Handler.proceed = None
+        Handler.waited_out = False
+        Handler.answer = threading.Event()
+        self.server = Server(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target = self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_keep_alive(self):
+        """ Test that consecutive requests reuse one connection. """
+
+        pool = ConnectionPool('127.0.0.1', self.server.server_port)
+        for _ in range(3):
+            status, _, content_type, content = pool.request('GET', '/')
+            self.assertEqual(200, status)
+            self.assertEqual('hello', content)
+        pool.close()
+
+        self.assertEqual(1, len(Handler.connections))
+
+    def test_gzip(self):
+        """ Test that gzip encoded responses are decompressed. """
+
+        pool = ConnectionPool('127.0.0.1', self.server.server_port, gzip = True)
+        _, _, _, content = pool.request('GET', '/')
+        pool.close()
+
+        self.assertEqual('hello', content)
+
+    def test_streamed_results(self):
+        """ Test that SPARQL results are parsed as they arrive. """
+
+        pool = ConnectionPool('127.0.0.1', self.server.server_port, max_connections = 1)
+        sesame = Sesame2('127.0.0.1', self.server.server_port, pool = pool)
+        query = 'SELECT ?s WHERE { ?s ?p ?o }'
+
+        try:
+            Handler.proceed = threading.Event()
+            rows = sesame.sparql_query('test', query, format = 'sparql')
+            self.assertTrue(next(rows)['s'].endswith('x'))
+            Handler.proceed.set()
+            self.assertEqual(399, len(list(rows)))
+            self.assertFalse(Handler.waited_out)
+
+            # a partly read response gives its connection back when closed
+            rows = sesame.sparql_query('test', query, format = 'sparql')
+            next(rows)
+            rows.close()
+            self.assertEqual(400, len(list(sesame.sparql_query('test', query, format = 'sparql'))))
+
+            # so does a response dropped before it is read
+            for _ in range(3):
+                sesame.sparql_query('test', query, format = 'sparql')
+            self.assertEqual(400, len(list(sesame.sparql_query('test', query, format = 'sparql'))))
+        finally:
+            pool.close()
+
+    def test_nested_requests(self):
+        """ Test that requests sent while a streamed result is read don't wait for its slot. """
+
+        pool = ConnectionPool('127.0.0.1', self.server.server_port, max_connections = 1, timeout = 5)
+        sesame = Sesame2('127.0.0.1', self.server.server_port, pool = pool)
+        query = 'SELECT ?s WHERE { ?s ?p ?o }'
+
+        counts = []
+        def nested():
+            for row, _ in zip(sesame.sparql_query('test', query, format = 'sparql'), range(3)):
+                counts.append(len(list(sesame.sparql_query('test', query, format = 'sparql'))))
+
+        try:
+            threads = [threading.Thread(target = nested) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(10)
+            self.assertEqual([400] * 6, counts)
+        finally:
+            pool.close()
+
+    def test_timeout(self):
+        """ Test that waiting too long for a slot raises an error. """
+
+        pool = ConnectionPool('127.0.0.1', self.server.server_port, max_connections = 1, timeout = 0.2)
+        slow = threading.Thread(target = pool.request, args = ('GET', '/slow'))
+        slow.start()
+        try:
+            time.sleep(0.1)
+            self.assertRaises(ConnectionPoolTimeout, pool.request, 'GET', '/')
+        finally:
+            Handler.answer.set()
+            slow.join()
+        self.assertEqual('hello', pool.request('GET', '/')[3])
+        pool.close()
@@ -0,0 +1,98 @@
+""" Module for sesame2 SPARQL XML results parsing tests. """
+
+from unittest import TestCase
+
+from surf.rdf import BNode, Literal, URIRef
+from sesame2.sesame2 import _RESULTS, _iter_sparql_xml_rows, iterparse, parse_sparql_xml
+
+SELECT_RESULTS = """<?xml version="1.0"?>
+<sparql xmlns="http://www.w3.org/2005/sparql-results#">
+  <head><variable name="s"/><variable name="v"/></head>
+  <results>
+    <result>
+      <binding name="s"><uri>http://example.org/a</uri></binding>
+      <binding name="v"><literal xml:lang="en">Anna</literal></binding>
+    </result>
+    <result>
+      <binding name="s"><bnode>b0</bnode></binding>
+      <binding name="v"><literal datatype="http://www.w3.org/2001/XMLSchema#integer">42</literal></binding>
+    </result>
+    <result>
+      <binding name="s"><uri>http://example.org/c</uri></binding>
+    </result>
+  </results>
+</sparql>"""
+
+ASK_RESULTS = """<?xml version="1.0"?>
+<sparql xmlns="http://www.w3.org/2005/sparql-results#">
+  <head></head>
+  <boolean>true</boolean>
+</sparql>"""
+
+
+class SparqlXmlTest(TestCase):
+
+    def test_select(self):
+        """ Test that rows keep the datatypes and language tags. """
+
+        rows = list(parse_sparql_xml(SELECT_RESULTS))
+        self.assertEqual(3, len(rows))
+        self.assertEqual(URIRef("http://example.org/a"), rows[0]["s"])
+        self.assertEqual("en", rows[0]["v"].language)
+        self.assertEqual(Literal("Anna", lang="en"), rows[0]["v"])
+        self.assertEqual(BNode("b0"), rows[1]["s"])
+        self.assertEqual(42, rows[1]["v"].toPython())
+        self.assertFalse("v" in rows[2])
+
+    def test_file_like(self):
+        """ Test that file-like sources are consumed incrementally. """
+
+        from StringIO import StringIO
+        rows = parse_sparql_xml(StringIO(SELECT_RESULTS))
+        self.assertEqual(URIRef("http://example.org/a"), next(rows)["s"])
+
+    def test_ask(self):
+        """ Test that ASK results are returned as booleans. """
+
+        self.assertTrue(parse_sparql_xml(ASK_RESULTS) is True)
+
+    def test_invalid(self):
+        """ Test that a malformed response yields no rows. """
+
+        self.assertEqual([], list(parse_sparql_xml("<html>error")))
+
+    def test_unicode(self):
+        """ Test that unicode documents are parsed. """
+
+        rows = list(parse_sparql_xml(SELECT_RESULTS.decode('utf-8').replace(u'Anna', u'J\xf6hn')))
+        self.assertEqual(Literal(u'J\xf6hn', lang="en"), rows[0]["v"])
+
+    def test_consumed_results_discarded(self):
+        """ Test that the consumed results are removed from the tree. """
+
+        from StringIO import StringIO
+        result = SELECT_RESULTS[SELECT_RESULTS.index('<result>'):SELECT_RESULTS.index('</results>')]
+        document = SELECT_RESULTS.replace(result, result * 1000)
+
+        events = iterparse(StringIO(document), events=('start', 'end'))
+        results = next(elem for event, elem in events if elem.tag == _RESULTS)
+        count, size = 0, 0
+        for row in _iter_sparql_xml_rows(events, results, None):
+            size = max(size, len(results))
+            count += 1
+        self.assertEqual(3000, count)
+        # at most the results parsed ahead from one read of the source
+        self.assertTrue(size < 300)
+
+    def test_dropped_results_closed(self):
+        """ Test that results dropped before being read close their source. """
+
+        from StringIO import StringIO
+        source = StringIO(SELECT_RESULTS)
+        rows = parse_sparql_xml(source)
+        del rows
+        self.assertTrue(source.closed)
+
+        source = StringIO(SELECT_RESULTS)
+        parse_sparql_xml(source).close()
+        self.assertTrue(source.closed)
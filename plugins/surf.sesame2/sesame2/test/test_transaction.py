@@ -0,0 +1,101 @@
+""" Module for sesame2 RDF transaction tests. """
+
+from unittest import TestCase
+from xml.dom.minidom import parseString
+
+from surf.plugin.reader import NoneReader
+from surf.rdf import Literal, URIRef
+from sesame2.sesame2 import RDFTransaction
+from sesame2.writer import Sesame2WriterException, WriterPlugin
+
+
+class MockAllegro(object):
+    def __init__(self):
+        self.transactions = []
+        self.fail = False
+
+    def transaction(self, id, rdf_transaction):
+        self.transactions.append(parseString(rdf_transaction.xml()))
+        return not self.fail
+
+
+class MockResource(object):
+    def __init__(self, subject, values):
+        self.subject = URIRef(subject)
+        self.context = URIRef("http://context")
+        self.rdf_direct = {URIRef("http://p"): values}
+
+    def graph(self, direct = True):
+        return [(self.subject, URIRef("http://p"), value)
+                for value in self.rdf_direct[URIRef("http://p")]]
+
+
+class RDFTransactionTest(TestCase):
+
+    def test_statements(self):
+        """ Test that each operation carries its terms and contexts. """
+
+        transaction = RDFTransaction()
+        transaction.add_triple(URIRef("http://s"), URIRef("http://p"),
+                               Literal("o", lang="en"), URIRef("http://c"))
+        transaction.remove_triple(URIRef("http://s"), URIRef("http://p"))
+        self.assertEqual(2, len(transaction))
+
+        doc = parseString(transaction.xml())
+        add = doc.getElementsByTagName("add")[0]
+        self.assertEqual("en", add.getElementsByTagName("literal")[0].getAttribute("xml:lang"))
+        self.assertEqual("http://c", add.getElementsByTagName("contexts")[0].firstChild.firstChild.nodeValue)
+        remove = doc.getElementsByTagName("remove")[0]
+        self.assertEqual(2, len(remove.getElementsByTagName("null")))
+
+
+class WriterTransactionTest(TestCase):
+
+    def _writer(self, **kwargs):
+        writer = WriterPlugin(NoneReader(), repository = "test", **kwargs)
+        allegro = MockAllegro()
+        writer.get_allegro = lambda: allegro
+        return writer, allegro
+
+    def test_save_one_transaction(self):
+        """ Test that saving several resources posts one transaction. """
+
+        writer, allegro = self._writer()
+        writer.save(MockResource("http://a", [Literal(1)]),
+                    MockResource("http://b", [Literal(2), Literal(3)]))
+
+        self.assertEqual(1, len(allegro.transactions))
+        doc = allegro.transactions[0]
+        self.assertEqual(2, len(doc.getElementsByTagName("remove")))
+        self.assertEqual(3, len(doc.getElementsByTagName("add")))
+
+    def test_update_transaction_size(self):
+        """ Test that transactions are split at the size cap. """
+
+        writer, allegro = self._writer(transaction_size = 2)
+        writer.update(MockResource("http://a", [Literal(1)]),
+                      MockResource("http://b", [Literal(2), Literal(3)]))
+
+        self.assertEqual(3, len(allegro.transactions))
+
+    def test_write_batch_one_transaction(self):
+        """ Test that a batch of removed and added triples posts one transaction. """
+
+        writer, allegro = self._writer()
+        s, p = URIRef("http://s"), URIRef("http://p")
+        writer.write_batch([(s, p, None, None)],
+                           [(s, p, Literal(1), None), (s, p, Literal(2), URIRef("http://c"))])
+
+        self.assertEqual(1, len(allegro.transactions))
+        doc = allegro.transactions[0]
+        self.assertEqual(1, len(doc.getElementsByTagName("remove")))
+        self.assertEqual(2, len(doc.getElementsByTagName("add")))
+
+    def test_failed_transaction(self):
+        """ Test that a failed transaction raises an exception. """
+
+        writer, allegro = self._writer()
+        allegro.fail = True
+        resource = MockResource("http://a", [Literal(1)])
+        for write in (writer.save, writer.update, writer.remove):
+            self.assertRaises(Sesame2WriterException, write, resource)
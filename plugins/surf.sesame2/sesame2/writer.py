@@ -39,9 +39,17 @@ from allegro import Allegro
 
 from surf.rdf import BNode, Literal, URIRef
 from reader import ReaderPlugin
+from sesame2 import ConnectionPool, RDFTransaction
 
 __author__ = 'Cosmin Basca'
 
+# the maximum number of operations posted in one RDF transaction
+DEFAULT_TRANSACTION_SIZE = 10000
+
+
+class Sesame2WriterException(Exception):
+    pass
+
 
 class WriterPlugin(RDFWriter):
     def __init__(self, reader, *args, **kwargs):
@@ -53,6 +61,8 @@ class WriterPlugin(RDFWriter):
             self.__repository_path = self.reader.repository_path
             self.__repository = self.reader.repository
             self.__use_allegro_extensions = self.reader.use_allegro_extensions
+            self.__allegro = self.reader.get_allegro()
+            self.__owns_allegro = False
 
         else:
             self.__server = kwargs['server'] if 'server' in kwargs else 'localhost'
@@ -61,6 +71,16 @@ class WriterPlugin(RDFWriter):
             self.__repository_path = kwargs['repository_path'] if 'repository_path' in kwargs else ''
             self.__repository = kwargs['repository'] if 'repository' in kwargs else None
             self.__use_allegro_extensions = kwargs['use_allegro_extensions'] if 'use_allegro_extensions' in kwargs else False
+            use_gzip = kwargs.get('use_gzip', False)
+            if isinstance(use_gzip, basestring):
+                use_gzip = (use_gzip.lower() == 'true')
+
+            self.__allegro = Allegro(self.__server, self.__port, self.__root_path, self.__repository_path,
+                                     pool = ConnectionPool(self.__server, self.__port,
+                                                           max_connections = int(kwargs.get('max_connections', 4)),
+                                                           gzip = use_gzip,
+                                                           timeout = float(kwargs.get('pool_timeout', 60))))
+            self.__owns_allegro = True
 
             info('INIT: %s, %s, %s, %s' % (self.server,
                                                     self.port, 
@@ -74,49 +94,84 @@ class WriterPlugin(RDFWriter):
                 opened = self.get_allegro().open_repository(self.repository)
                 info('ALLEGRO repository opened: ' + unicode(opened))
 
+        self.__transaction_size = int(kwargs.get('transaction_size', DEFAULT_TRANSACTION_SIZE))
+
     server = property(lambda self: self.__server)
     port = property(lambda self: self.__port)
     root_path = property(lambda self: self.__root_path)
     repository_path = property(lambda self: self.__repository_path)
     repository = property(lambda self: self.__repository)
+    transaction_size = property(lambda self: self.__transaction_size)
+    batch_size = transaction_size
 
     def get_allegro(self):
-        return Allegro(self.server, self.port, self.root_path,
-                       self.repository_path)
+        return self.__allegro
+
 
+    def __commit(self, operations):
+        '''
+        posts the (add, s, p, o, context) operations, where `add` is False for
+        removals, as RDF transactions of at most `transaction_size` operations,
+        returns False if any of the transactions failed
+        '''
+        allegro = self.get_allegro()
+        success = True
+        transaction = RDFTransaction()
+        for add, s, p, o, context in operations:
+            if add:
+                transaction.add_triple(s, p, o, context)
+            else:
+                transaction.remove_triple(s, p, o, context)
+
+            if len(transaction) >= self.__transaction_size:
+                success &= self.__post(allegro, transaction)
+                transaction = RDFTransaction()
+
+        if len(transaction):
+            success &= self.__post(allegro, transaction)
+        return success
+
+    def __post(self, allegro, transaction):
+        debug('TRANSACTION: %d operations' % len(transaction))
+        if not allegro.transaction(self.__repository, transaction):
+            error('Transaction of %d operations failed' % len(transaction))
+            return False
+        return True
 
     def _save(self, *resources):
-        for resource in resources:
-            allegro = self.get_allegro()
-            s = resource.subject
-            context = resource.context and resource.context.n3() or None
-            allegro.remove_statements(self.__repository, s = s.n3(), context = context)
-            graph = resource.graph()
-            allegro.add_statements(self.__repository,
-                                   graph.serialize(format = 'nt'), update = True, content_type = 'nt', context = context)
+        def operations():
+            for resource in resources:
+                s = resource.subject
+                yield False, s, None, None, resource.context
+                for _, p, o in resource.graph():
+                    yield True, s, p, o, resource.context
+
+        if not self.__commit(operations()):
+            raise Sesame2WriterException('Could not save %d resources' % len(resources))
 
     def _update(self, *resources):
-        for resource in resources:
-            allegro = self.get_allegro()
-            graph = resource.graph()
-            context = resource.context and resource.context.n3() or None
-            for s, p, o in graph:
-                allegro.remove_statements(self.__repository, s = s.n3(), p = p.n3(), context = context)
-            allegro.add_statements(self.__repository,
-                                   graph.serialize(format = 'nt'), update = True, content_type = 'nt', context = context)
+        def operations():
+            for resource in resources:
+                removed, added = self._changes(resource)
+                for s, p, o in removed:
+                    yield False, s, p, o, resource.context
+                for s, p, o in added:
+                    yield True, s, p, o, resource.context
+
+        if not self.__commit(operations()):
+            raise Sesame2WriterException('Could not update %d resources' % len(resources))
 
     def _remove(self, *resources, **kwargs):
         inverse = kwargs.get("inverse")
-        
-        allegro = self.get_allegro()
-        for resource in resources:
-            context = resource.context and resource.context.n3() or None
-            allegro.remove_statements(self.__repository, 
-                                      s = resource.subject.n3(), context = context)
-            
-            if inverse:
-                allegro.remove_statements(self.__repository, 
-                                          o = resource.subject.n3(), context = context)
+
+        def operations():
+            for resource in resources:
+                yield False, resource.subject, None, None, resource.context
+                if inverse:
+                    yield False, None, None, resource.subject, resource.context
+
+        if not self.__commit(operations()):
+            raise Sesame2WriterException('Could not remove %d resources' % len(resources))
 
     def _size(self):
         return self.get_allegro().size(self.__repository)
@@ -125,18 +180,20 @@ class WriterPlugin(RDFWriter):
         self.get_allegro().add_statements(self.__repository,
                                           self.__tontriples(s, p, o), update = True, content_type = 'nt')
 
-    def _set_triple(self, s = None, p = None, o = None, context = None):
-        allegro = self.get_allegro()
-        sn3 = s.n3() if s else None
-        pn3 = p.n3() if p else None
-        on3 = o.n3() if o else None
-        allegro.remove_statements(self.__repository, s = sn3, p = pn3,
-                                  context = context)
+    def _add_triples(self, quads):
+        if not self.__commit((True, s, p, o, context) for s, p, o, context in quads):
+            raise Sesame2WriterException('Could not add %d triples' % len(quads))
 
-        allegro.add_statements(self.__repository,
-                               self.__tontriples(s, p, o),
-                               update = True,
-                               content_type = 'nt')
+    def _write_batch(self, removed, added):
+        operations = [(False, s, p, o, context) for s, p, o, context in removed]
+        operations.extend((True, s, p, o, context) for s, p, o, context in added)
+        if not self.__commit(operations):
+            raise Sesame2WriterException('Could not write %d operations' % len(operations))
+
+    def _set_triple(self, s = None, p = None, o = None, context = None):
+        if not self.__commit([(False, s, p, None, context),
+                              (True, s, p, o, context)]):
+            raise Sesame2WriterException('Could not set the triple')
 
     def _remove_triple(self, s = None, p = None, o = None, context = None):
         sn3 = s.n3() if s else None
@@ -172,3 +229,7 @@ class WriterPlugin(RDFWriter):
                                            externalFormat = externalFormat,
                                            saveStrings = saveStrings)
         return True
+
+    def close(self):
+        if self.__owns_allegro:
+            self.__allegro.close()
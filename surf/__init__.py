@@ -41,7 +41,7 @@ __author__ = 'Cosmin Basca'
 #
 # -----------------------------------------------------------------------------
 from surf.query import Query, select, ask, describe, construct, OptionalGroup, \
-    Group, NamedGroup, Filter
+    Group, NamedGroup, Filter, param, aggregate
 from surf.resource import Resource, RDF_TYPE
 from surf.store import Store, NO_CONTEXT
 from surf.session import Session
@@ -0,0 +1,293 @@
+# Copyright (c) 2009, Digital Enterprise Research Institute (DERI),
+# NUI Galway
+# All rights reserved.
+
+# author: Cosmin Basca
+# email: cosmin.basca@gmail.com
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer
+#      in the documentation and/or other materials provided with
+#      the distribution.
+#    * Neither the name of DERI nor the
+#      names of its contributors may be used to endorse or promote
+#      products derived from this software without specific prior
+#      written permission.
+
+# THIS SOFTWARE IS PROVIDED BY DERI ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DERI BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY,
+# OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# -*- coding: utf-8 -*-
+import gzip
+import json
+import mmap
+import os
+import threading
+import uuid
+from Queue import Queue
+
+from rdflib.plugins.parsers.ntriples import NTriplesParser, ParseError, r_nodeid, r_tail, r_wspace
+
+from surf.log import *
+from surf.rdf import BNode
+
+__author__ = 'Cosmin Basca'
+
+GZIP_MAGIC = '\x1f\x8b'
+
+
+class BulkLoadException(Exception):
+    pass
+
+
+class StatementParser(NTriplesParser):
+    """ Parses `N-Triples` or `N-Quads` one line at a time.
+
+    The parser keeps its own blank node labels, so blank nodes are shared
+    between the lines of one source but never across sources. With a `seed`
+    the blank node of a label is the same for every parser given that seed,
+    so a load resumed with a new parser keeps the blank nodes of the lines
+    loaded before.
+
+    """
+
+    def __init__(self, seed=None):
+        super(StatementParser, self).__init__()
+        self._bnode_ids = {}
+        self.__seed = seed
+
+    def nodeid(self):
+        if self.__seed is None or not self.peek('_'):
+            return super(StatementParser, self).nodeid()
+        return BNode(self.__seed + self.eat(r_nodeid).group(1))
+
+    def parse_statement(self, line):
+        """ Return a `(s, p, o, context)` tuple for the line, `None` if the
+        line is empty or a comment. The `context` is `None` for triples.
+        """
+
+        self.line = line
+        self.eat(r_wspace)
+        if (not self.line) or self.line.startswith('#'):
+            return None
+
+        subject = self.subject()
+        self.eat(r_wspace)
+        predicate = self.predicate()
+        self.eat(r_wspace)
+        obj = self.object()
+        self.eat(r_wspace)
+        context = self.uriref() or self.nodeid() or None
+        self.eat(r_tail)
+
+        if self.line:
+            raise ParseError("Trailing garbage")
+        return subject, predicate, obj, context
+
+
+def open_source(source, use_mmap=True):
+    """ Open the `source` for reading, `source` is a file name or a file-like
+    object. Gzip compressed files are detected by their magic number, plain
+    files are memory mapped if `use_mmap` is True.
+    """
+
+    if hasattr(source, 'readline'):
+        return source
+
+    with open(source, 'rb') as fp:
+        compressed = fp.read(2) == GZIP_MAGIC
+
+    if compressed:
+        return gzip.open(source, 'rb')
+
+    fp = open(source, 'rb')
+    if use_mmap and os.fstat(fp.fileno()).st_size > 0:
+        try:
+            return mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            fp.close()
+    return fp
+
+
+def iter_statements(fp, offset=0, seed=None):
+    """ Iterate over the statements read from `fp`, starting at byte `offset`,
+    the blank nodes are labelled with `seed` (see :class:`StatementParser`).
+
+    Yields `(offset, statement)` pairs, where `offset` is the position right
+    after the line the statement was parsed from.
+    """
+
+    if offset:
+        fp.seek(offset)
+
+    parser = StatementParser(seed)
+    for line in iter(fp.readline, ''):
+        offset += len(line)
+        try:
+            statement = parser.parse_statement(line.rstrip('\r\n').decode('utf-8'))
+        except ParseError, e:
+            raise BulkLoadException("Invalid line (%s): %r" % (e, line))
+        if statement:
+            yield offset, statement
+
+
+class Checkpoint(object):
+    """ Records how far a source has been loaded, so that a failed load can be
+    resumed. The offset is written atomically after every batch, along with
+    the `seed` the blank nodes of the source are labelled with, the lines
+    loaded after resuming refer to the same blank nodes as the ones before.
+    """
+
+    def __init__(self, path, source):
+        self.__path = path
+        self.__source = source if isinstance(source, basestring) else None
+        self.__seed = uuid.uuid4().hex
+
+    path = property(lambda self: self.__path)
+    seed = property(lambda self: self.__seed)
+
+    def load(self):
+        """ Return the offset to resume from, 0 if nothing was loaded yet. """
+
+        if not os.path.exists(self.__path):
+            return 0
+
+        with open(self.__path) as fp:
+            state = json.load(fp)
+        if state.get('source') != self.__source:
+            raise BulkLoadException("Checkpoint %s belongs to %s, not %s" %
+                                    (self.__path, state.get('source'), self.__source))
+        if state['offset'] and 'seed' not in state:
+            raise BulkLoadException("Checkpoint %s has no blank node seed, the load can not be resumed" %
+                                    self.__path)
+        self.__seed = state.get('seed', self.__seed)
+        return state['offset']
+
+    def save(self, offset):
+        tmp_path = self.__path + '.tmp'
+        with open(tmp_path, 'w') as fp:
+            json.dump({'source': self.__source, 'offset': offset, 'seed': self.__seed}, fp)
+        os.rename(tmp_path, self.__path)
+
+    def remove(self):
+        if os.path.exists(self.__path):
+            os.remove(self.__path)
+
+
+class BulkLoader(object):
+    """ Streams `N-Triples` or `N-Quads` into a store through the
+    :meth:`surf.plugin.writer.RDFWriter.add_triples` method of its `writer`.
+
+    Statements are sent in batches of `batch_size` (by default the writer's
+    own :attr:`batch_size`), by up to `workers` concurrent threads. Statements
+    without a context go to `context`. When a `checkpoint` path is given, the
+    load can be resumed from the last batch acknowledged by the store, the
+    checkpoint is removed once the whole source was loaded. The blank nodes
+    of a checkpointed load are labelled from a seed kept in the checkpoint,
+    so they are the same before and after resuming.
+
+    """
+
+    def __init__(self, writer, batch_size=None, workers=1, checkpoint=None, context=None):
+        self.__writer = writer
+        self.__batch_size = batch_size or writer.batch_size
+        self.__workers = max(1, workers)
+        self.__checkpoint = checkpoint
+        self.__context = context
+
+    batch_size = property(lambda self: self.__batch_size)
+    workers = property(lambda self: self.__workers)
+
+    def load(self, source, use_mmap=True):
+        """ Load all statements from `source` and return their number. """
+
+        checkpoint = Checkpoint(self.__checkpoint, source) if self.__checkpoint else None
+        start = checkpoint.load() if checkpoint else 0
+        if start:
+            info('resuming bulk load of %s at offset %d', source, start)
+
+        seed = checkpoint.seed if checkpoint else None
+        fp = open_source(source, use_mmap=use_mmap)
+        try:
+            count = self.__load(iter_statements(fp, start, seed), start, checkpoint)
+        finally:
+            if fp is not source:
+                fp.close()
+
+        if checkpoint:
+            checkpoint.remove()
+        return count
+
+    def __batches(self, statements):
+        batch = []
+        for offset, (s, p, o, context) in statements:
+            batch.append((s, p, o, context or self.__context))
+            if len(batch) >= self.__batch_size:
+                yield offset, batch
+                batch = []
+        if batch:
+            yield offset, batch
+
+    def __load(self, statements, start, checkpoint):
+        pending = Queue(maxsize=self.__workers * 2)
+        state = {'done': {}, 'next': 0, 'offset': start, 'count': 0, 'error': None}
+        lock = threading.Lock()
+
+        def acknowledge(index, offset, size):
+            # the checkpoint only advances over an unbroken run of batches
+            with lock:
+                state['done'][index] = offset
+                state['count'] += size
+                while state['next'] in state['done']:
+                    state['offset'] = state['done'].pop(state['next'])
+                    state['next'] += 1
+                if checkpoint:
+                    checkpoint.save(state['offset'])
+
+        def work():
+            for index, offset, batch in iter(pending.get, None):
+                if state['error']:
+                    continue
+                try:
+                    self.__writer.add_triples(batch)
+                    acknowledge(index, offset, len(batch))
+                except Exception, e:
+                    error('bulk load batch %d failed: %s', index, e)
+                    state['error'] = e
+
+        threads = [threading.Thread(target=work) for _ in range(self.__workers)]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        try:
+            for index, (offset, batch) in enumerate(self.__batches(statements)):
+                if state['error']:
+                    break
+                pending.put((index, offset, batch))
+        finally:
+            for _ in threads:
+                pending.put(None)
+            for thread in threads:
+                thread.join()
+
+        if state['error']:
+            raise BulkLoadException("Bulk load failed after offset %d: %s" %
+                                    (state['offset'], state['error']))
+        debug('bulk loaded %d statements', state['count'])
+        return state['count']
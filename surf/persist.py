@@ -0,0 +1,295 @@
+# Copyright (c) 2009, Digital Enterprise Research Institute (DERI),
+# NUI Galway
+# All rights reserved.
+
+# author: Cosmin Basca
+# email: cosmin.basca@gmail.com
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer
+#      in the documentation and/or other materials provided with
+#      the distribution.
+#    * Neither the name of DERI nor the
+#      names of its contributors may be used to endorse or promote
+#      products derived from this software without specific prior
+#      written permission.
+
+# THIS SOFTWARE IS PROVIDED BY DERI ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DERI BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY,
+# OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# -*- coding: utf-8 -*-
+import threading
+import time
+from collections import OrderedDict
+
+from surf.log import *
+
+__author__ = 'Cosmin Basca'
+
+
+class WriteBehind(object):
+    """ Writes the changed resources of a `session` to their stores in the
+    background, see :attr:`surf.session.Session.auto_persist`.
+
+    Changed resources are queued, repeated changes of the same subject are
+    written once. A background thread writes them in batches of up to
+    `batch_size` resources, one
+    :meth:`surf.plugin.writer.RDFWriter.write_batch` call per store, as soon
+    as that many are queued or `delay` seconds after the oldest one was
+    queued. The changes of a resource are taken when it leaves the queue,
+    a resource changed again while it is written stays dirty and is queued
+    again. Queuing blocks while `max_pending` resources are waiting to be
+    written. When writing fails, the resources stay dirty and `on_error` is
+    called with them and the exception.
+
+    """
+
+    def __init__(self, session, max_pending=1000, batch_size=100, delay=1.0, on_error=None):
+        self.session = session
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.delay = delay
+        self.on_error = on_error
+
+        self.__pending = OrderedDict()
+        # when the oldest pending resource was queued
+        self.__since = None
+        self.__writing = 0
+        self.__flushing = 0
+        self.__closed = False
+        self.__condition = threading.Condition()
+        self.__thread = None
+
+    pending = property(lambda self: len(self.__pending))
+    """ The number of resources waiting to be written. """
+
+    def enqueue(self, resource):
+        """ Queue the `resource` to be written and mark it dirty, block while
+        `max_pending` resources are waiting to be written. """
+
+        key = (resource.store_key, resource.subject)
+        with self.__condition:
+            if self.__closed:
+                resource._mark_dirty(True)
+                return
+
+            if threading.current_thread() is not self.__thread:
+                while key not in self.__pending and len(self.__pending) >= self.max_pending:
+                    self.__condition.wait()
+
+            self.__start()
+            # the latest instance of a subject is the one written
+            self.__pending[key] = resource
+            resource._mark_dirty(True)
+            if self.__since is None:
+                self.__since = time.time()
+            self.__condition.notify_all()
+
+    def flush(self):
+        """ Write the queued resources now, return once they are written. """
+
+        with self.__condition:
+            self.__flushing += 1
+            self.__condition.notify_all()
+            try:
+                while self.__pending or self.__writing:
+                    self.__condition.wait()
+            finally:
+                self.__flushing -= 1
+
+    def close(self):
+        """ Write the queued resources and stop the background thread. """
+
+        self.flush()
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify_all()
+        if self.__thread:
+            self.__thread.join()
+            self.__thread = None
+
+    def __start(self):
+        if self.__thread is None:
+            self.__thread = threading.Thread(target=self.__run)
+            self.__thread.daemon = True
+            self.__thread.start()
+
+    def __ready(self):
+        if not self.__pending:
+            return False
+        return (self.__flushing or self.__closed
+                or len(self.__pending) >= min(self.batch_size, self.max_pending)
+                or time.time() - self.__since >= self.delay)
+
+    def __timeout(self):
+        if not self.__pending:
+            return None
+        return max(0, self.__since + self.delay - time.time())
+
+    def __take(self):
+        """ Dequeue the next batch, as `(resource, values, changes)` tuples
+        holding the direct values of each resource and the statements that
+        write them. """
+
+        batch = []
+        while self.__pending and len(batch) < self.batch_size:
+            resource = self.__pending.popitem(last=False)[1]
+            values, changes = resource._snapshot()
+            batch.append((resource, values, changes))
+        if not self.__pending:
+            self.__since = None
+        self.__writing = len(batch)
+        # there is room for the blocked enqueue calls
+        self.__condition.notify_all()
+        return batch
+
+    def __run(self):
+        while True:
+            with self.__condition:
+                while not self.__ready():
+                    if self.__closed:
+                        return
+                    self.__condition.wait(self.__timeout())
+                batch = self.__take()
+
+            try:
+                self.__write(batch)
+            finally:
+                with self.__condition:
+                    self.__writing = 0
+                    self.__condition.notify_all()
+
+    def __write(self, batch):
+        by_store = OrderedDict()
+        for item in batch:
+            by_store.setdefault(item[0].store_key, []).append(item)
+
+        for store_key, items in by_store.items():
+            removed, added = [], []
+            for resource, values, (resource_removed, resource_added) in items:
+                context = resource.context
+                removed.extend((s, p, o, context) for s, p, o in resource_removed)
+                added.extend((s, p, o, context) for s, p, o in resource_added)
+
+            resources = [item[0] for item in items]
+            try:
+                self.session[store_key].writer.write_batch(removed, added)
+            except Exception, e:
+                error('writing %d resources to %s failed: %s', len(resources), store_key, e)
+                self.__error(resources, e)
+                continue
+
+            with self.__condition:
+                for resource, values, changes in items:
+                    resource._set_stored(values)
+                    # Changed again while being written, the resource is
+                    # still dirty
+                    if (store_key, resource.subject) not in self.__pending:
+                        resource._mark_dirty(False)
+
+    def __error(self, resources, exception):
+        if self.on_error:
+            try:
+                self.on_error(resources, exception)
+            except Exception, e:
+                error('write behind error callback failed: %s', e)
+
+
+class WriteBatch(object):
+    """ Records the triples added to and removed from a `store`, and writes
+    them at once with :meth:`surf.plugin.writer.RDFWriter.write_batch`, see
+    :meth:`surf.store.Store.batch`.
+
+    The removals are written before the additions, so the batch keeps the
+    effect of the recorded changes: adding a triple drops its recorded
+    removal, removing triples drops their recorded additions.
+
+    """
+
+    def __init__(self, writer, resolve_context=None):
+        self.__writer = writer
+        self.__resolve_context = resolve_context or (lambda context: context)
+        self.__removed = OrderedDict()
+        self.__added = OrderedDict()
+        # the added statements by (s, p, context)
+        self.__added_index = {}
+
+    removed = property(lambda self: self.__removed.keys())
+    """ The `(s, p, o, context)` statements to remove. """
+
+    added = property(lambda self: self.__added.keys())
+    """ The `(s, p, o, context)` statements to add. """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Nothing is written when the block failed
+        if exc_type is None:
+            self.flush()
+
+    def add_triple(self, s=None, p=None, o=None, context=None):
+        """ Record the triple to add, in the specified ``context``. """
+
+        quad = (s, p, o, self.__resolve_context(context))
+        self.__removed.pop(quad, None)
+        self.__added[quad] = True
+        self.__added_index.setdefault((s, p, quad[3]), set()).add(quad)
+
+    def set_triple(self, s=None, p=None, o=None, context=None):
+        """ Record the triple replacing the values of `p` for `s`, in the
+        specified ``context``. """
+
+        self.remove_triple(s, p, None, context)
+        self.add_triple(s, p, o, context)
+
+    def remove_triple(self, s=None, p=None, o=None, context=None):
+        """ Record the triple to remove, from the specified ``context``.
+
+        `None` can be used as a wildcard.
+
+        """
+
+        pattern = (s, p, o, self.__resolve_context(context))
+        if s is not None and p is not None:
+            # Only the additions of the same subject and predicate match
+            key = (s, p, pattern[3])
+            if o is None:
+                quads = self.__added_index.pop(key, ())
+            else:
+                quads = [pattern] if pattern in self.__added else []
+        else:
+            quads = [quad for quad in self.__added if quad[3] == pattern[3] and
+                     all(term is None or term == value for term, value in zip(pattern[:3], quad[:3]))]
+
+        for quad in quads:
+            del self.__added[quad]
+            added = self.__added_index.get(quad[:2] + quad[3:])
+            if added:
+                added.discard(quad)
+        self.__removed[pattern] = True
+
+    def flush(self):
+        """ Write the recorded changes to the `store` and forget them. """
+
+        removed, added = self.removed, self.added
+        self.__removed.clear()
+        self.__added.clear()
+        self.__added_index.clear()
+        if removed or added:
+            self.__writer.write_batch(removed, added)
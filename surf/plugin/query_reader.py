@@ -34,15 +34,26 @@
 
 # -*- coding: utf-8 -*-
 from abc import ABCMeta, abstractmethod
+from collections import OrderedDict
 
 from surf.plugin.reader import RDFReader
-from surf.query import Query, Union
-from surf.query import a, ask, select, optional_group, named_group
-from surf.rdf import URIRef
+from surf.query import Group, Query, Union, Values
+from surf.query import a, aggregate, ask, select, optional_group, named_group
+from surf.query.translator.term import render
+from surf.rdf import BNode, Literal, URIRef
 from surf.log import *
 
 __author__ = 'Cosmin Basca'
 
+# the number of resources whose statements are selected by one export query
+EXPORT_SUBJECTS_CHUNK = 100
+
+# the number of subjects checked by one existence query
+PRESENT_SUBJECTS_CHUNK = 500
+
+# the number of resources loaded by one query when getting resources by subject
+GET_SUBJECTS_CHUNK = 100
+
 
 def query_sp(s, p, direct, context):
     """
@@ -64,6 +75,78 @@ def query_sp(s, p, direct, context):
     return query
 
 
+def query_sp_window(s, p, direct, context, limit, offset):
+    """
+    Construct :class:`surf.query.Query` with `?v` and `?c` as unknowns,
+    selecting the window of ``limit`` values (all of them if `None`) after
+    the first ``offset`` ones, ordered by value.
+
+    :param s: the `subject`
+    :param p: the `predicate`
+    :param bool direct: whether the predicate is direct or inverse
+    :param context: the context
+    :param int limit: the maximum number of values
+    :param int offset: the number of values to skip
+    :return: the query
+    :rtype: :class:`surf.query.Query`
+    """
+    s, v = (s, '?v') if direct else ('?v', s)
+    # The window is taken on the values, not on the (value, concept) rows
+    values = select('?v').distinct().where((s, p, v)).order_by('?v').offset(offset)
+    if limit is not None:
+        values.limit(limit)
+
+    query = select('?v', '?c').distinct()
+    query.where(values).optional_group(('?v', a, '?c')).order_by('?v')
+    if context:
+        query.from_(context)
+
+    return query
+
+
+def query_sp_count(s, p, direct, context):
+    """
+    Construct :class:`surf.query.Query` counting the values as `?n`.
+
+    :param s: the `subject`
+    :param p: the `predicate`
+    :param bool direct: whether the predicate is direct or inverse
+    :param context: the context
+    :return: the query
+    :rtype: :class:`surf.query.Query`
+    """
+    s, v = (s, '?v') if direct else ('?v', s)
+    query = select(aggregate('count', '?v', '?n', distinct=True))
+    query.where((s, p, v))
+    if context:
+        query.from_(context)
+
+    return query
+
+
+def query_spv_ask(s, p, v, direct, context):
+    """
+    Construct :class:`surf.query.Query` of type **ASK**, checking that `v`
+    is one of the values.
+
+    :param s: the `subject`
+    :param p: the `predicate`
+    :param v: the value
+    :param bool direct: whether the predicate is direct or inverse
+    :param context: the context
+    :return: the query
+    :rtype: :class:`surf.query.Query`
+    """
+    statement = (s, p, v) if direct else (v, p, s)
+    query = ask()
+    if context:
+        query.where(named_group(context, statement))
+    else:
+        query.where(statement)
+
+    return query
+
+
 def query_s(s, direct, context):
     """
     Construct :class:`surf.query.Query` with `?p`, `?v` and `?c` as unknowns.
@@ -83,6 +166,26 @@ def query_s(s, direct, context):
     return query
 
 
+def query_s_summary(s, direct, context):
+    """
+    Construct :class:`surf.query.Query` with `?p` as unknown and the number
+    of its values as `?n`.
+
+    :param s: the `subject`
+    :param bool direct: whether the predicates are direct or inverse
+    :param context: the context
+    :return: the query
+    :rtype: :class:`surf.query.Query`
+    """
+    s, v = (s, '?v') if direct else ('?v', s)
+    query = select('?p', aggregate('count', '?v', '?n', distinct=True))
+    query.where((s, '?p', v))
+    if context:
+        query.from_(context)
+
+    return query.group_by('?p')
+
+
 def query_ask(s, context):
     """
     Construct :class:`surf.query.Query` of type **ASK**.
@@ -102,6 +205,62 @@ def query_ask(s, context):
     return query
 
 
+def query_are_present(subjects, context):
+    """
+    Construct :class:`surf.query.Query` with `?s` as the unknown, selecting
+    which of the ``subjects`` are present.
+
+    :param list subjects: the subjects
+    :param context: the context
+    :return: the query
+    :rtype: :class:`surf.query.Query`
+    """
+    query = select('?s').distinct()
+    if context:
+        query.where(named_group(context, ('?s', '?p', '?o')))
+    else:
+        query.where(('?s', '?p', '?o'))
+
+    return query.values('?s', subjects)
+
+
+def query_statements(s, attributes, direct_only, context):
+    """
+    Construct :class:`surf.query.Query` with `?s`, `?p` and `?o` as unknowns,
+    selecting the distinct statements of the subject ``s``.
+
+    :param s: the `subject`
+    :param list attributes: the `(predicate, direct)` attributes, all of them if `None`
+    :param bool direct_only: whether to leave out the inverse statements when all the attributes are selected
+    :param context: the context
+    :return: the query, `None` if no statement is selected
+    :rtype: :class:`surf.query.Query`
+    """
+    if attributes is None:
+        branches = [('?s', None)] if direct_only else [('?s', None), ('?o', None)]
+    else:
+        branches = []
+        for variable, direct in (('?s', True), ('?o', False)):
+            predicates = [predicate for predicate, attribute_direct in attributes if attribute_direct == direct]
+            if predicates:
+                branches.append((variable, predicates))
+    if not branches:
+        return None
+
+    groups = []
+    for variable, predicates in branches:
+        group = Group([('?s', '?p', '?o'), Values(variable, [s])])
+        if predicates:
+            group.append(Values('?p', predicates))
+        groups.append(group)
+    pattern = groups[0] if len(groups) == 1 else Union(groups)
+
+    query = select('?s', '?p', '?o').distinct()
+    if context:
+        return query.where(named_group(context, pattern))
+    return query.where(pattern)
+
+
 def query_p_s(c, p, direct, context):
     """
     Construct :class:`surf.query.Query` with `?s` and `?c` as unknowns.
@@ -140,6 +299,132 @@ def query_concept(s):
     return select('?c').distinct().where((s, a, '?c'))
 
 
+def query_export(params, direct, context):
+    """
+    Construct :class:`surf.query.Query` with `?s`, `?p` and `?v` as unknowns,
+    selecting the statements of the resources matching ``params``. The limit,
+    offset and order of the resources are not applied.
+
+    :param dict params: the query parameters
+    :param bool direct: whether to select the direct or inverse statements
+    :param context: the context
+    :return: the query
+    :rtype: :class:`surf.query.Query`
+    """
+    s, v = ('?s', '?v') if direct else ('?v', '?s')
+    query = select('?s', '?p', '?v')
+    query.where((s, '?p', v))
+    params = dict((key, value) for key, value in params.items() if key in ('get_by', 'filter'))
+    _apply_solution_modifiers(params, query)
+    if context:
+        query.from_(context)
+
+    return query.order_by('?s', '?p', '?v')
+
+
+def query_export_subjects(params, context):
+    """
+    Construct :class:`surf.query.Query` with `?s` as the unknown, selecting
+    each of the resources matching ``params`` once, in their order. When the
+    resources are ordered by an attribute, its first value in that order is
+    bound to `?o`.
+
+    :param dict params: the query parameters
+    :param context: the context
+    :return: the query
+    :rtype: :class:`surf.query.Query`
+    """
+    subjects = select('?s')
+    filters = dict((key, value) for key, value in params.items() if key in ('get_by', 'filter'))
+    if filters:
+        _apply_solution_modifiers(filters, subjects)
+    else:
+        subjects.where(('?s', '?p', '?v'))
+
+    order = params.get('order', True)
+    desc = bool(params.get('desc'))
+    if order is True:
+        query = subjects.distinct()
+        query.order_by('DESC(?s)' if desc else '?s')
+    else:
+        # A resource comes once, at its first value of the attribute
+        subjects.query_vars.append(aggregate('max' if desc else 'min', '?ov', '?o'))
+        subjects.optional_group(('?s', order, '?ov'))
+        subjects.group_by('?s')
+        query = select('?s', '?o').where(subjects)
+        query.order_by(*(('DESC(?o)', 'DESC(?s)') if desc else ('?o', '?s')))
+
+    if 'after' in params:
+        _apply_keyset(dict(params, order=order), query)
+    if 'limit' in params:
+        query.limit(params['limit'])
+    if 'offset' in params:
+        query.offset(params['offset'])
+    if context:
+        query.from_(context)
+
+    return query
+
+
+def query_aggregate(params, aggregates, group_by, context):
+    """
+    Construct :class:`surf.query.Query` computing the ``aggregates`` over the
+    resources matching ``params``, grouped by the values of the ``group_by``
+    attributes. The aggregates are bound to `?a0`, `?a1`, ... and the
+    grouping values to `?g0`, `?g1`, ...
+
+    Each resource is selected once, the values of each aggregated attribute
+    are matched in their own branch of a union, so they are not multiplied
+    by the values of the other attributes.
+
+    :param dict params: the query parameters, only the `get_by` and `filter` ones are applied
+    :param list aggregates: `(function, attribute, direct)` tuples, when `attribute` is `None` the resources themselves
+        are aggregated, with `count`, `sample` or `group_concat`
+    :param list group_by: `(attribute, direct)` tuples
+    :param context: the context
+    :return: the query
+    :rtype: :class:`surf.query.Query`
+    """
+    def order_terms(s, p, o, direct):
+        return (s, p, o) if direct else (o, p, s)
+
+    subjects = select('?s').distinct()
+    params = dict((key, value) for key, value in params.items() if key in ('get_by', 'filter'))
+    if params:
+        _apply_solution_modifiers(params, subjects)
+    else:
+        subjects.where(('?s', '?p', '?o'))
+    query = select().where(subjects)
+
+    projections, branches = [], []
+    for index, (function, attribute, direct) in enumerate(aggregates):
+        if attribute is None:
+            if function.lower() not in ('count', 'sample', 'group_concat'):
+                raise ValueError('The resources can not be aggregated with <%s>, only counted, sampled or '
+                                 'concatenated' % function)
+            # A resource appears in one solution per attribute value
+            projections.append(aggregate(function, '?s', '?a%d' % index, distinct=True))
+        else:
+            variable = '?v%d' % index
+            branches.append(Group([order_terms('?s', attribute, variable, direct)]))
+            projections.append(aggregate(function, variable, '?a%d' % index))
+
+    if len(branches) == 1:
+        query.optional_group(*branches[0])
+    elif branches:
+        query.optional_group(Union(branches))
+
+    group_variables = ['?g%d' % index for index in range(len(group_by))]
+    for variable, (attribute, direct) in zip(group_variables, group_by):
+        query.optional_group(order_terms('?s', attribute, variable, direct))
+
+    query.query_vars.extend(group_variables + projections)
+    if context:
+        query.from_(context)
+
+    return query.group_by(*group_variables)
+
+
 def _apply_solution_modifiers(params, query):
     """
     Apply limit, offset, order parameters to query.
@@ -154,15 +439,14 @@ def _apply_solution_modifiers(params, query):
         def order_terms(s, p, o):
             return (s, p, o) if direct else (o, p, s)
 
-        for attribute, values, direct in params["get_by"]:
+        for index, (attribute, values, direct) in enumerate(params["get_by"]):
             if hasattr(values, "__iter__"):
-                where_clause = Union()
-                for value in values:
-                    where_clause.append(order_terms("?s", attribute, value))
+                # Alternatives are bound as inline data
+                variable = "?g%d" % index
+                query.where(order_terms("?s", attribute, variable))
+                query.values(variable, values)
             else:
-                where_clause = order_terms("?s", attribute, values)
-
-            query.where(where_clause)
+                query.where(order_terms("?s", attribute, values))
 
     if "filter" in params:
         filter_idx = 0
@@ -173,23 +457,83 @@ def _apply_solution_modifiers(params, query):
             query.filter(value % filter_variable)
 
     if "order" in params:
-        if params["order"]:
+        if params["order"] is True:
             # Order by subject URI
             if "desc" in params and params["desc"]:
                 query.order_by("DESC(?s)")
             else:
                 query.order_by("?s")
         else:
-            # Match another variable, order by it
+            # Match another variable, order by it, then by subject URI
+            # so the order of the pages is stable
             query.optional_group(("?s", params["order"], "?o"))
             if "desc" in params and params["desc"]:
-                query.order_by("DESC(?o)")
+                query.order_by("DESC(?o)", "DESC(?s)")
             else:
-                query.order_by("?o")
+                query.order_by("?o", "?s")
+
+    if "after" in params:
+        _apply_keyset(params, query)
+
+    return query
+
 
+def _values_patterns(query, direct_predicates, inverse_predicates):
+    """
+    Add the optional patterns binding the direct values of `?s` to `?p`, `?v`
+    and their types to `?c`, and the inverse ones to `?ip`, `?iv` and `?ic`.
+    The predicates are restricted to ``direct_predicates`` and
+    ``inverse_predicates``, `None` is for all the predicates.
+    """
+    def values_group(pattern, predicate, value, concept, predicates):
+        group = Group([pattern])
+        if predicates is not None:
+            group.append(Values(predicate, predicates))
+        group.append(optional_group((value, a, concept)))
+        return group
+
+    direct_group = values_group(("?s", "?p", "?v"), "?p", "?v", "?c", direct_predicates)
+    if inverse_predicates is None or inverse_predicates:
+        inverse_group = values_group(("?iv", "?ip", "?s"), "?ip", "?iv", "?ic", inverse_predicates)
+        query.optional_group(Union([direct_group, inverse_group]))
+    else:
+        query.optional_group(*direct_group)
     return query
 
 
+def _apply_keyset(params, query):
+    """
+    Select the resources following the `(subject, value)` given in the
+    `after` parameter, in the order of the query. `value` is the value of
+    the attribute the resources are ordered by, if any.
+    """
+    subject, value = params["after"]
+    desc = bool(params.get("desc"))
+    op = "<" if desc else ">"
+    after_subject = "STR(?s) %s %s" % (op, render(Literal(unicode(subject))))
+
+    if params.get("order", True) is True:
+        if "order" not in params:
+            query.order_by("DESC(?s)" if desc else "?s")
+        query.filter("(%s)" % after_subject)
+        return
+
+    if isinstance(value, Literal):
+        key, value = "?o", render(value)
+    elif value is not None:
+        key, value = "STR(?o)", render(Literal(unicode(value)))
+
+    # Unbound values are ordered first
+    if value is None and desc:
+        condition = "!BOUND(?o) && %s" % after_subject
+    elif value is None:
+        condition = "(!BOUND(?o) && %s) || BOUND(?o)" % after_subject
+    else:
+        condition = "(%s %s %s) || (%s = %s && %s)" % (key, op, value, key, value, after_subject)
+        condition = "!BOUND(?o) || %s" % condition if desc else "BOUND(?o) && (%s)" % condition
+    query.filter("(%s)" % condition)
+
+
 class RDFQueryReader(RDFReader):
     """
     Super class for SuRF Reader plugins that wrap queryable `stores`.
@@ -210,16 +554,51 @@ class RDFQueryReader(RDFReader):
         result = self._execute(query)
         return self.convert(result, 'v', 'c')
 
+    def _get_window(self, subject, attribute, direct, context, limit, offset):
+        query = query_sp_window(subject, attribute, direct, context, limit, offset)
+        values = OrderedDict()
+        for row in self._to_table(self._execute(query)):
+            concepts = values.setdefault(row['v'], [])
+            if row.get('c'):
+                concepts.append(row['c'])
+        return values
+
+    def _count(self, subject, attribute, direct, context):
+        query = query_sp_count(subject, attribute, direct, context)
+        counts = self.convert(self._execute(query), 'n')
+        return int(counts[0]) if counts else 0
+
+    def _has_value(self, subject, attribute, value, direct, context):
+        query = query_spv_ask(subject, attribute, value, direct, context)
+        return self._ask(self._execute(query))
+
     def _load(self, subject, direct, context):
         query = query_s(subject, direct, context)
         result = self._execute(query)
         return self.convert(result, 'p', 'v', 'c')
 
+    def _summary(self, subject, direct, context):
+        query = query_s_summary(subject, direct, context)
+        return dict((row['p'], int(row['n'])) for row in self._to_table(self._execute(query)))
+
+    def _statements(self, subject, attributes, direct_only, context):
+        query = query_statements(subject, attributes, direct_only, context)
+        if query is None:
+            return []
+        return [(row['s'], row['p'], row['o']) for row in self._to_table(self._execute(query))]
+
     def _is_present(self, subject, context):
         query = query_ask(subject, context)
         result = self._execute(query)
         return self._ask(result)
 
+    def _are_present(self, subjects, context):
+        present = set()
+        for start in range(0, len(subjects), PRESENT_SUBJECTS_CHUNK):
+            query = query_are_present(subjects[start:start + PRESENT_SUBJECTS_CHUNK], context)
+            present.update(self.convert(self._execute(query), 's'))
+        return present
+
     def _concept(self, subject):
         query = query_concept(subject)
         result = self._execute(query)
@@ -232,6 +611,12 @@ class RDFQueryReader(RDFReader):
 
     def _get_by(self, params):
         # Decide which loading strategy to use
+        if "subjects" in params:
+            return self._get_by_subjects(params)
+
+        if "only" in params:
+            return self._get_by_only(params)
+
         if "full" in params:
             if self.use_subqueries:
                 return self._get_by_subquery(params)
@@ -330,7 +715,7 @@ class RDFQueryReader(RDFReader):
 
         # Need ordering in outer query
         if "order" in params:
-            if params["order"]:
+            if params["order"] is True:
                 # Order by subject URI
                 query.order_by("?s")
             else:
@@ -376,6 +761,161 @@ class RDFQueryReader(RDFReader):
 
         return results
 
+    def _get_by_only(self, params):
+        context = params.get("context", None)
+        direct_predicates = [a] + [attribute for attribute, direct in params["only"] if direct]
+        inverse_predicates = [attribute for attribute, direct in params["only"] if not direct]
+
+        query = select("?s", "?p", "?v", "?c", "?ip", "?iv", "?ic")
+        if "limit" in params or "offset" in params:
+            # The limit and offset apply to resources, not to their values,
+            # so select the resources first
+            subjects_query = select("?s").distinct()
+            _apply_solution_modifiers(params, subjects_query)
+            if not (context is None):
+                subjects_query.from_(context)
+            subjects = [match["s"] for match in self._to_table(self._execute(subjects_query))]
+            if not subjects:
+                return []
+            query.values("?s", subjects)
+        else:
+            subjects = None
+            _apply_solution_modifiers(params, query)
+
+        _values_patterns(query, direct_predicates, inverse_predicates)
+        if not (context is None):
+            query.from_(context)
+
+        results, order = {}, []
+        self.__instance_data(query, results, order)
+        if subjects is None:
+            subjects = order
+        return [(subject, results[subject]) for subject in subjects if subject in results]
+
+    def _get_by_subjects(self, params):
+        context = params.get("context", None)
+        subjects = params["subjects"]
+        if not params.get("full"):
+            # Just the types
+            direct_predicates, inverse_predicates = [a], []
+        elif params.get("direct_only"):
+            direct_predicates, inverse_predicates = None, []
+        else:
+            direct_predicates, inverse_predicates = None, None
+
+        results = {}
+        for start in range(0, len(subjects), GET_SUBJECTS_CHUNK):
+            query = select("?s", "?p", "?v", "?c", "?ip", "?iv", "?ic")
+            query.values("?s", subjects[start:start + GET_SUBJECTS_CHUNK])
+            _values_patterns(query, direct_predicates, inverse_predicates)
+            if not (context is None):
+                query.from_(context)
+            self.__instance_data(query, results, [])
+
+        return [(subject, results[subject]) for subject in subjects if subject in results]
+
+    def __instance_data(self, query, results, order):
+        """
+        Execute a query with the patterns of :func:`_values_patterns`, and
+        add the values of each subject to ``results``, in the instance data
+        structure of :meth:`_get_by`. New subjects are appended to ``order``.
+        """
+        for match in self._to_table(self._execute(query)):
+            subject = match["s"]
+            if subject not in results:
+                results[subject] = {"direct": {}, "inverse": {}}
+                order.append(subject)
+
+            if match.get("p") is not None:
+                attributes = results[subject]["direct"]
+                predicate, value, concept = match["p"], match["v"], match.get("c")
+            elif match.get("ip") is not None:
+                attributes = results[subject]["inverse"]
+                predicate, value, concept = match["ip"], match["iv"], match.get("ic")
+            else:
+                continue
+
+            predicate_values = attributes.setdefault(predicate, {}).setdefault(value, [])
+            if concept is not None and concept not in predicate_values:
+                predicate_values.append(concept)
+
+    def _export(self, params, direct_only, page_size):
+        context = params.get("context", None)
+        directions = (True, ) if direct_only else (True, False)
+
+        # Select the resources a page at a time, continuing after the last
+        # resource of the previous page, then their statements a few at a time
+        for subjects in self.__export_subjects(params, page_size):
+            # Blank node labels can't refer to the stored nodes in a query
+            blank = [subject for subject in subjects if isinstance(subject, BNode)]
+            if blank:
+                warn('not exporting the statements of %d blank node resources', len(blank))
+                subjects = [subject for subject in subjects if not isinstance(subject, BNode)]
+
+            for start in range(0, len(subjects), EXPORT_SUBJECTS_CHUNK):
+                chunk = subjects[start:start + EXPORT_SUBJECTS_CHUNK]
+                statements = dict((subject, []) for subject in chunk)
+                for direct in directions:
+                    query = query_export({}, direct, context).values('?s', chunk)
+                    for row in self._paginate(query, page_size):
+                        # The statements of a resource about itself are direct
+                        if direct or row["v"] != row["s"]:
+                            statements[row["s"]].append(self.__export_statement(row, direct))
+
+                for subject in chunk:
+                    for statement in statements[subject]:
+                        yield statement
+
+    def __export_subjects(self, params, page_size):
+        """
+        Iterate over the pages of the subjects selected by ``params``, each
+        page is selected with the keyset of the last subject of the previous
+        one instead of an offset.
+        """
+        context = params.get("context", None)
+        params = dict(params)
+        remaining = params.pop("limit", None)
+        while remaining is None or remaining > 0:
+            limit = page_size if remaining is None else min(page_size, remaining)
+            query = query_export_subjects(dict(params, limit=limit), context)
+            rows = list(self._to_table(self._execute(query)))
+            if rows:
+                yield [row["s"] for row in rows]
+            if len(rows) < limit:
+                break
+
+            if remaining is not None:
+                remaining -= len(rows)
+            params.pop("offset", None)
+            params["after"] = (rows[-1]["s"], rows[-1].get("o"))
+
+    def _aggregate(self, params, aggregates, group_by):
+        query = query_aggregate(params, aggregates, group_by, params.get("context", None))
+        names = ['g%d' % index for index in range(len(group_by))]
+        names += ['a%d' % index for index in range(len(aggregates))]
+        return [tuple(row.get(name) for name in names)
+                for row in self._to_table(self._execute(query))]
+
+    @staticmethod
+    def __export_statement(row, direct):
+        if direct:
+            return row["s"], row["p"], row["v"]
+        return row["v"], row["p"], row["s"]
+
+    def _paginate(self, query, page_size):
+        """
+        Execute the ordered ``query`` one page of ``page_size`` rows at a time,
+        and iterate over all the rows.
+        """
+        offset = 0
+        while True:
+            rows = list(self._to_table(self._execute(query.limit(page_size).offset(offset))))
+            for row in rows:
+                yield row
+            if len(rows) < page_size:
+                break
+            offset += page_size
+
     @abstractmethod
     def _ask(self, result):
         """ Return boolean value of an **ASK** query. """
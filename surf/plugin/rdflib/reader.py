@@ -75,6 +75,10 @@ class ReaderPlugin(RDFQueryReader):
     def commit_pending_transaction_on_close(self):
         return self._commit_pending_transaction_on_close
 
+    def _are_present(self, subjects, context):
+        graph = self._graph if context is None else self._graph.get_context(context)
+        return set(subject for subject in subjects if (subject, None, None) in graph)
+
     def _to_table(self, result):
         # Elements in result.selectionF are instances of rdflib.Variable,
         # rdflib.Variable is subclass of unicode. We convert them to 
@@ -85,8 +89,11 @@ class ReaderPlugin(RDFQueryReader):
         return [dict(zip(vars, row)) for row in result]
 
     def _ask(self, result):
-        # askAnswer is list with boolean values, we want first value. 
-        return result.askAnswer[0]
+        # askAnswer is list with boolean values in older rdflib versions,
+        # we want first value.
+        if isinstance(result.askAnswer, list):
+            return result.askAnswer[0]
+        return result.askAnswer
 
     def _execute(self, query):
         q_string = unicode(query)
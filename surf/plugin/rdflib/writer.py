@@ -35,6 +35,7 @@
 # -*- coding: utf-8 -*-
 __author__ = 'Cosmin Basca'
 
+import threading
 import warnings
 
 from surf.plugin.writer import RDFWriter
@@ -44,8 +45,12 @@ from .reader import ReaderPlugin
 
 
 class WriterPlugin(RDFWriter):
+    batch_size = 10000
+
     def __init__(self, reader, *args, **kwargs):
         super(WriterPlugin, self).__init__(reader, *args, **kwargs)
+        # rdflib stores are not thread safe, concurrent bulk adds are serialized
+        self.__lock = threading.Lock()
 
         if isinstance(self.reader, ReaderPlugin):
             self._rdflib_store = self.reader.rdflib_store
@@ -92,12 +97,11 @@ class WriterPlugin(RDFWriter):
 
     def _update(self, *resources):
         for resource in resources:
-            s = resource.subject
-            for p in resource.rdf_direct:
-                self._remove_from_graph(s, p)
-            for p, objs in resource.rdf_direct.items():
-                for o in objs:
-                    self.__add(s, p, o)
+            removed, added = self._changes(resource)
+            for s, p, o in removed:
+                self._remove_from_graph(s, p, o)
+            for s, p, o in added:
+                self.__add(s, p, o)
 
         self._graph.commit()
 
@@ -116,6 +120,24 @@ class WriterPlugin(RDFWriter):
     def _add_triple(self, s=None, p=None, o=None, context=None):
         self.__add(s, p, o, context)
 
+    def _add_triples(self, quads):
+        debug('ADD: %d triples', len(quads))
+        graph = self._graph
+        with self.__lock:
+            graph.addN((s, p, o, graph.get_context(context) if context is not None else graph.default_context)
+                       for s, p, o, context in quads)
+            graph.commit()
+
+    def _write_batch(self, removed, added):
+        debug('BATCH: %d removed, %d added', len(removed), len(added))
+        graph = self._graph
+        with self.__lock:
+            for s, p, o, context in removed:
+                graph.remove((s, p, o, graph.get_context(context)) if context is not None else (s, p, o))
+            graph.addN((s, p, o, graph.get_context(context) if context is not None else graph.default_context)
+                       for s, p, o, context in added)
+            graph.commit()
+
     def _set_triple(self, s=None, p=None, o=None, context=None):
         self._remove_from_graph(s, p, context=context)
         self.__add(s, p, o, context)
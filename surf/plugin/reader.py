@@ -34,11 +34,16 @@
 
 # -*- coding: utf-8 -*-
 from abc import ABCMeta, abstractmethod
+from collections import OrderedDict
 
 from surf.plugin import Plugin
+from surf.rdf import BNode, URIRef
 
 __author__ = 'Cosmin Basca'
 
+# the number of rows fetched per request when exporting
+DEFAULT_EXPORT_PAGE_SIZE = 10000
+
 
 class RDFReader(Plugin):
     """
@@ -95,20 +100,132 @@ class RDFReader(Plugin):
     def _get_by(self, params):
         return []
 
-    def get(self, resource, attribute, direct):
+    def _aggregate(self, params, aggregates, group_by):
+        return []
+
+    def _get_window(self, subject, attribute, direct, context, limit, offset):
+        """
+        Generic implementation of :meth:`get` with a `limit` or an `offset`,
+        on top of :meth:`_get`, plugins should override it.
+        """
+        values = sorted(self._get(subject, attribute, direct, context).items())
+        stop = offset + limit if limit is not None else None
+        return OrderedDict(values[offset:stop])
+
+    def _summary(self, subject, direct, context):
+        """
+        Generic implementation of :meth:`summary` on top of :meth:`_load`,
+        plugins should override it.
+        """
+        return dict((predicate, len(values))
+                    for predicate, values in self._load(subject, direct, context).items())
+
+    def _count(self, subject, attribute, direct, context):
+        """
+        Generic implementation of :meth:`count` on top of :meth:`_get`,
+        plugins should override it.
+        """
+        return len(self._get(subject, attribute, direct, context))
+
+    def _has_value(self, subject, attribute, value, direct, context):
+        """
+        Generic implementation of :meth:`has_value` on top of :meth:`_get`,
+        plugins should override it.
+        """
+        return value in self._get(subject, attribute, direct, context)
+
+    def _statements(self, subject, attributes, direct_only, context):
+        """
+        Generic implementation of :meth:`statements` on top of :meth:`_load`
+        and :meth:`_get`, plugins should override it.
+        """
+        if attributes is None:
+            values = [(None, True, self._load(subject, True, context))]
+            if not direct_only:
+                values.append((None, False, self._load(subject, False, context)))
+        else:
+            values = [(attribute, direct, {attribute: self._get(subject, attribute, direct, context)})
+                      for attribute, direct in attributes]
+
+        # a statement linking the subject to itself is both direct and inverse
+        statements = OrderedDict()
+        for attribute, direct, predicates in values:
+            for predicate, objects in predicates.items():
+                for value in objects:
+                    statements[(subject, predicate, value) if direct else (value, predicate, subject)] = True
+        return list(statements)
+
+    def _are_present(self, subjects, context):
+        """
+        Generic implementation of :meth:`are_present`, one :meth:`_is_present`
+        check per subject, plugins should override it.
+        """
+        return set(subject for subject in subjects if self._is_present(subject, context))
+
+    def _export(self, params, direct_only, page_size):
+        """
+        Generic implementation of :meth:`export` on top of :meth:`_get_by`,
+        plugins that can stream statements from the store should override it.
+        """
+        params = dict(params, full=True, direct_only=direct_only)
+        for subject, instance_data in self._get_by(params):
+            for predicate, values in instance_data.get("direct", {}).items():
+                for value in values:
+                    yield subject, predicate, value
+            if not direct_only:
+                for predicate, values in instance_data.get("inverse", {}).items():
+                    for value in values:
+                        yield value, predicate, subject
+
+    def get(self, resource, attribute, direct, limit=None, offset=None):
         """
         Return the `value(s)` of the corresponding `attribute`.
 
+        When a ``limit`` or an ``offset`` is given, only that window of the
+        values, ordered by value, is returned.
+
         :param resource: the given resource
         :type resource: :class:`surf.resource.Resource`
         :param str attribute: the given attribute
         :param bool direct: whether the attribute is a direct or inverse edge / property. If `False` then the subject
             of the `resource` is considered the object of the query.
+        :param int limit: the maximum number of values to return
+        :param int offset: the number of values to skip
         :return: the value(s) of the corresponding attribute
         :rtype: list
         """
         subj = hasattr(resource, 'subject') and resource.subject or resource
-        return self._get(subj, attribute, direct, resource.context)
+        if limit is None and not offset:
+            return self._get(subj, attribute, direct, resource.context)
+        return self._get_window(subj, attribute, direct, resource.context, limit, offset or 0)
+
+    def count(self, resource, attribute, direct):
+        """
+        Return the number of `values` of the corresponding `attribute`.
+
+        :param resource: the given resource
+        :type resource: :class:`surf.resource.Resource`
+        :param str attribute: the given attribute
+        :param bool direct: whether the attribute is a direct or inverse edge / property
+        :return: the number of values
+        :rtype: int
+        """
+        subj = hasattr(resource, 'subject') and resource.subject or resource
+        return self._count(subj, attribute, direct, resource.context)
+
+    def has_value(self, resource, attribute, value, direct):
+        """
+        Check whether ``value`` is one of the `values` of the corresponding `attribute`.
+
+        :param resource: the given resource
+        :type resource: :class:`surf.resource.Resource`
+        :param str attribute: the given attribute
+        :param value: the value, an `rdflib` term
+        :param bool direct: whether the attribute is a direct or inverse edge / property
+        :rtype: bool
+        """
+        subj = hasattr(resource, 'subject') and resource.subject or resource
+        return self._has_value(subj, attribute, value, direct, resource.context)
 
     def load(self, resource, direct):
         """
@@ -128,6 +245,35 @@ class RDFReader(Plugin):
         subj = hasattr(resource, 'subject') and resource.subject or resource
         return self._load(subj, direct, resource.context)
 
+    def statements(self, resource, attributes=None, direct_only=False):
+        """
+        Return the distinct `(s, p, o)` statements of the `resource`, in as
+        few requests as the store allows.
+
+        :param resource: the given resource
+        :type resource: :class:`surf.resource.Resource`
+        :param list attributes: the `(predicate, direct)` attributes to return the statements of, all of them if `None`
+        :param bool direct_only: whether to leave out the inverse statements when all the attributes are returned
+        :return: the statements
+        :rtype: list
+        """
+        subj = hasattr(resource, 'subject') and resource.subject or resource
+        return self._statements(subj, attributes, direct_only, resource.context)
+
+    def summary(self, resource, direct):
+        """
+        Return the `predicates` of the `resource` with the number of their
+        values, without the values themselves.
+
+        :param resource: the given resource
+        :type resource: :class:`surf.resource.Resource`
+        :param bool direct: whether to summarize the direct or the inverse edges / properties
+        :return: the number of values of each predicate
+        :rtype: dict
+        """
+        subj = hasattr(resource, 'subject') and resource.subject or resource
+        return self._summary(subj, direct, resource.context)
+
     def is_present(self, resource):
         """
         Check whether the `resource` is present in the underlying :class:`surf.store.Store` store
@@ -139,6 +285,35 @@ class RDFReader(Plugin):
         subj = hasattr(resource, 'subject') and resource.subject or resource
         return self._is_present(subj, resource.context)
 
+    def are_present(self, resources, context=None):
+        """
+        Return the subjects of the `resources` present in the underlying :class:`surf.store.Store` store, in as few
+        requests as the store allows.
+
+        The resources are looked for in their own context, the subjects and
+        the resources without one in ``context``.
+
+        :param resources: the resources or their subjects
+        :type resources: iterable of :class:`surf.resource.Resource`, `URIRef` or `str`
+        :param context: the context to look in, all the contexts if `None`
+        :return: the present subjects
+        :rtype: set
+        """
+        subjects = OrderedDict()
+        for resource in resources:
+            if hasattr(resource, 'subject'):
+                subject, resource_context = resource.subject, getattr(resource, 'context', None) or context
+            elif isinstance(resource, (URIRef, BNode)):
+                subject, resource_context = resource, context
+            else:
+                subject, resource_context = URIRef(resource), context
+            subjects.setdefault(resource_context, []).append(subject)
+
+        present = set()
+        for resource_context, context_subjects in subjects.items():
+            present.update(self._are_present(context_subjects, resource_context))
+        return present
+
     def concept(self, resource):
         """
         Return the `concept` URI of the following `resource`.
@@ -166,6 +341,39 @@ class RDFReader(Plugin):
     def get_by(self, params):
         return self._get_by(params)
 
+    def aggregate(self, params, aggregates, group_by=()):
+        """
+        Compute aggregates over the resources selected by ``params`` (the same
+        parameters as :meth:`get_by`, only the `get_by` and `filter` ones are
+        applied) in the store.
+
+        :param dict params: the query parameters gathered by a :class:`surf.resource.result_proxy.ResultProxy`
+        :param list aggregates: `(function, attribute, direct)` tuples, where `function` is one of
+            :attr:`surf.query.Query.AGGREGATE_FUNCTIONS`, when `attribute` is `None` the resources themselves are
+            aggregated
+        :param list group_by: `(attribute, direct)` tuples, the attributes whose values group the resources
+        :return: one row per group, the grouping values followed by the aggregated values
+        :rtype: list of tuples
+        """
+        return self._aggregate(params, list(aggregates), list(group_by))
+
+    def export(self, params, direct_only=True, page_size=None):
+        """
+        Return an iterator over the `(s, p, o)` statements describing the
+        resources selected by ``params`` (the same parameters as :meth:`get_by`),
+        without creating :class:`surf.resource.Resource` instances.
+
+        The statements of a resource are returned together, when
+        ``direct_only`` is `False` they are followed by its inverse statements.
+
+        :param dict params: the query parameters gathered by a :class:`surf.resource.result_proxy.ResultProxy`
+        :param bool direct_only: whether to leave out the inverse statements
+        :param int page_size: the number of rows fetched per request
+        :return: the statements
+        :rtype: iterator
+        """
+        return self._export(params, direct_only, page_size or DEFAULT_EXPORT_PAGE_SIZE)
+
 
 class NoneReader(RDFReader):
     def _load(self, subject, direct, context):
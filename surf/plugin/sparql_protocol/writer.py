@@ -34,13 +34,15 @@
 __author__ = 'Cosmin Basca, Adam Gzella'
 
 import sys
+import threading
+from collections import OrderedDict
 
 from SPARQLWrapper import SPARQLWrapper, JSON
 from SPARQLWrapper.SPARQLExceptions import EndPointNotFound, QueryBadFormed, SPARQLWrapperException
 
 from reader import ReaderPlugin
 from surf.plugin.writer import RDFWriter
-from surf.query import Filter, Group, NamedGroup, Union
+from surf.query import Filter, Group, NamedGroup, Union, Values
 from surf.query.update import insert, delete, clear, load
 from surf.rdf import BNode, Literal, URIRef
 from surf.util import is_uri
@@ -87,40 +89,109 @@ def _prepare_delete_many_query(resources, context, inverse=False):
         where_clause = Group()
 
     subjects = [resource.subject for resource in resources]
-    filter = " OR ".join([u"?s = <{0:s}>".format(subject) for subject in subjects])
-    filter = Filter("(%s)" % filter)
 
     if inverse:
-        filter2 = " OR ".join([u"?o = <{0:s}>".format(subject) for subject in subjects])
-        filter2 = Filter("(%s)" % filter2)
-
-        where1 = Group([("?s", "?p", "?o"), filter])
-        where2 = Group([("?s", "?p", "?o"), filter2])
+        where1 = Group([("?s", "?p", "?o"), Values("?s", subjects)])
+        where2 = Group([("?s", "?p", "?o"), Values("?o", subjects)])
         where_clause.append(Union([where1, where2]))
     else:
         where_clause.append(("?s", "?p", "?o"))
-        where_clause.append(filter)
+        where_clause.append(Values("?s", subjects))
 
     query.where(where_clause)
 
     return query
 
 
-def _prepare_selective_delete_query(resources, context=None):
-    query = delete()
-    if context:
-        query.from_(context)
-
-    query.template(("?s", "?p", "?o"))
+def _prepare_delete_patterns_queries(patterns, context=None):
+    """
+    Return the *DELETE* queries removing the statements matching the
+    `(s, p, o)` ``patterns``, where `None` is a wildcard and a blank node
+    matches any blank node, one query per combination of wildcards.
+    """
+    shapes = OrderedDict()
+    for pattern in patterns:
+        shape = tuple(None if term is None else isinstance(term, BNode) for term in pattern)
+        rows = shapes.setdefault(shape, OrderedDict())
+        rows[tuple(term for term, blank in zip(pattern, shape) if blank is False)] = True
+
+    queries = []
+    for shape, rows in shapes.items():
+        variables = tuple(variable for variable, blank in zip(("?s", "?p", "?o"), shape) if blank is False)
+        query = delete()
+        if context:
+            query.from_(context)
+
+        query.template(("?s", "?p", "?o"))
+        query.where(("?s", "?p", "?o"))
+        for variable, blank in zip(("?s", "?p", "?o"), shape):
+            if blank:
+                query.where(Filter("(isBlank(%s))" % variable))
+        if len(variables) == 1:
+            query.values(variables[0], [row[0] for row in rows])
+        elif variables:
+            query.values(variables, list(rows))
+        queries.append(query)
+    return queries
+
+
+def _prepare_delete_queries(removed, context=None):
+    """
+    Return the queries removing the ``removed`` `(s, p, o)` statements, where
+    `None` is a wildcard: the patterns go into *DELETE* queries, the other
+    statements into a *DELETE DATA* query.
+
+    Blank nodes are not allowed in *DELETE DATA* and their labels are not
+    the ones of the stored nodes anyway, so the statements with blank nodes
+    are patterns too, removing the blank node values matching their other
+    terms.
+    """
+    patterns, statements = [], []
+    for statement in removed:
+        if None in statement or any(isinstance(term, BNode) for term in statement):
+            patterns.append(statement)
+        else:
+            statements.append(statement)
 
-    clauses = []
+    queries = _prepare_delete_patterns_queries(patterns, context)
+    if statements:
+        query = delete(data=True)
+        if context:
+            query.from_(context)
+        queries.append(query.template(*statements))
+    return queries
+
+
+def _prepare_batch_queries(removed, added, context=None):
+    """
+    Return the queries removing the ``removed`` `(s, p, o)` statements,
+    where `None` is a wildcard, then adding the ``added`` ones (see
+    :func:`_prepare_delete_queries`), the added statements go into an
+    *INSERT DATA* query.
+    """
+    queries = _prepare_delete_queries(removed, context)
+    if added:
+        query = insert(data=True)
+        if context:
+            query.into(context)
+        queries.append(query.template(*added))
+    return queries
+
+
+def _prepare_update_queries(resources, context=None):
+    """
+    Return the queries that write the changes of the ``resources``: the
+    removed statements and the removed predicates whose values are not known
+    are deleted (see :func:`_prepare_delete_queries`), and the added
+    statements go into an *INSERT DATA* query.
+    """
+    removed, added = [], []
     for resource in resources:
-        for p in resource.rdf_direct:
-            filter = Filter("(?s = <{0:s}> AND ?p = <{1:s}>)".format(resource.subject, p))
-            clauses.append(Group([("?s", "?p", "?o"), filter]))
+        resource_removed, resource_added = RDFWriter._changes(resource)
+        removed.extend(resource_removed)
+        added.extend(resource_added)
 
-    query.union(*clauses)
-    return query
+    return _prepare_batch_queries(removed, added, context)
 
 
 class WriterPlugin(RDFWriter):
@@ -133,19 +204,32 @@ class WriterPlugin(RDFWriter):
             self._endpoint = kwargs.get("endpoint")
 
         self._combine_queries = kwargs.get("combine_queries")
+        # whether several update operations can be sent in one request
+        self._sparql11_update = kwargs.get("sparql11_update", True)
+        if isinstance(self._sparql11_update, basestring):
+            self._sparql11_update = self._sparql11_update.lower() == "true"
         self._results_format = JSON
 
-        self._sparql_wrapper = SPARQLWrapper(self._endpoint, returnFormat=self._results_format)
-        user = kwargs.get('user', None)
-        password = kwargs.get('password', None)
-        if user is not None and password is not None:
-            self._sparql_wrapper.setCredentials(user, password)
+        self._user = kwargs.get('user', None)
+        self._password = kwargs.get('password', None)
+        self._default_graph = kwargs.get('default_graph', None)
+        # SPARQLWrapper instances hold the query being sent, each thread gets its own
+        self._local = threading.local()
 
-        self._sparql_wrapper.setMethod("POST")
+    @property
+    def _sparql_wrapper(self):
+        sparql_wrapper = getattr(self._local, 'sparql_wrapper', None)
+        if sparql_wrapper is None:
+            sparql_wrapper = SPARQLWrapper(self._endpoint, returnFormat=self._results_format)
+            if self._user is not None and self._password is not None:
+                sparql_wrapper.setCredentials(self._user, self._password)
 
-        default_graph = kwargs.get('default_graph',None)
-        if default_graph:
-            self._sparql_wrapper.addDefaultGraph(default_graph)
+            sparql_wrapper.setMethod("POST")
+
+            if self._default_graph:
+                sparql_wrapper.addDefaultGraph(self._default_graph)
+            self._local.sparql_wrapper = sparql_wrapper
+        return sparql_wrapper
 
     @property
     def endpoint(self):
@@ -160,10 +244,10 @@ class WriterPlugin(RDFWriter):
 
     def _update(self, *resources):
         for context, items in _group_by_context(resources).iteritems():
-            # Explicitly enumerates triples for deletion.
-            remove_query = _prepare_selective_delete_query(items, context)
-            insert_query = _prepare_add_many_query(items, context)
-            self._execute(remove_query, insert_query)
+            # Only writes the statements that changed.
+            queries = _prepare_update_queries(items, context)
+            if queries:
+                self._execute(*queries)
 
     def _remove(self, *resources, **kwargs):
         for context, items in _group_by_context(resources).iteritems():
@@ -179,6 +263,30 @@ class WriterPlugin(RDFWriter):
     def _add_triple(self, s=None, p=None, o=None, context=None):
         self._add(s, p, o, context)
 
+    def _add_triples(self, quads):
+        contexts = {}
+        for s, p, o, context in quads:
+            contexts.setdefault(context, []).append((s, p, o))
+        for context, triples in contexts.iteritems():
+            self._add_many(triples, context)
+
+    def _write_batch(self, removed, added):
+        contexts = OrderedDict()
+        for s, p, o, context in removed:
+            contexts.setdefault(context, []).append((False, (s, p, o)))
+        for s, p, o, context in added:
+            contexts.setdefault(context, []).append((True, (s, p, o)))
+
+        for context, operations in contexts.items():
+            # the removals of a context come before its additions
+            for start in range(0, len(operations), self.batch_size):
+                chunk = operations[start:start + self.batch_size]
+                queries = _prepare_batch_queries([statement for add, statement in chunk if not add],
+                                                 [statement for add, statement in chunk if add],
+                                                 context)
+                # one request per chunk
+                self._execute(*queries, sequence=self._sparql11_update)
+
     def _set_triple(self, s=None, p=None, o=None, context=None):
         self._remove_from_endpoint(s, p, context=context)
         self._add(s, p, o, context)
@@ -186,11 +294,17 @@ class WriterPlugin(RDFWriter):
     def _remove_triple(self, s=None, p=None, o=None, context=None):
         self._remove_from_endpoint(s, p, o, context)
 
-    def _execute(self, *queries):
-        """ Execute several queries. """
-        
-        translated = [unicode(query) for query in queries]  
-        if self._combine_queries:
+    def _execute(self, *queries, **kwargs):
+        """ Execute several queries.
+
+        With ``sequence`` set, the queries are sent in one request as a
+        *SPARQL 1.1 Update* sequence of operations.
+        """
+
+        translated = [unicode(query) for query in queries]
+        if kwargs.get("sequence") and len(translated) > 1:
+            translated = [" ;\n".join(translated)]
+        elif self._combine_queries:
             translated = ["\n".join(translated)]
 
         try:
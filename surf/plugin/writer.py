@@ -63,6 +63,9 @@ class RDFWriter(Plugin):
 
     reader = property(fget = lambda self: self.__reader)
 
+    # the number of statements bulk operations send to the store at once
+    batch_size = 1000
+
     @abstractmethod
     def _clear(self,context=None):
         pass
@@ -94,6 +97,34 @@ class RDFWriter(Plugin):
     def _remove_triple(self, s=None, p=None, o=None, context=None):
         pass
 
+    def _add_triples(self, quads):
+        for s, p, o, context in quads:
+            self._add_triple(s, p, o, context)
+
+    def _write_batch(self, removed, added):
+        for s, p, o, context in removed:
+            self._remove_triple(s, p, o, context)
+        if added:
+            self._add_triples(added)
+
+    @staticmethod
+    def _changes(resource):
+        """
+        Return the `(removed, added)` statements that update ``resource``,
+        see :meth:`surf.resource.Resource.changes`. Removed statements with
+        `None` as object remove all the values of their predicate.
+
+        Resources that don't track their changes have all their direct
+        attributes replaced.
+        """
+        if hasattr(resource, "changes"):
+            return resource.changes()
+
+        s = resource.subject
+        removed = [(s, p, None) for p in resource.rdf_direct]
+        added = [(s, p, o) for p, objs in resource.rdf_direct.items() for o in objs]
+        return removed, added
+
     def clear(self, context=None):
         """
         Remove all triples from the `store`.
@@ -121,7 +152,7 @@ class RDFWriter(Plugin):
             if not hasattr(resource, "subject"):
                 raise InvalidResourceException("Arguments must be of type surf.resource.Resource")
 
-        self._update(resource)
+        self._update(*resources)
 
     def remove(self, *resources, **kwargs):
         """
@@ -166,6 +197,29 @@ class RDFWriter(Plugin):
         """
         self._remove_triple(s,p,o,context)
 
+    def add_triples(self, quads):
+        """
+        Add several triples to the `store` at once, ``quads`` is a list of
+        `(s, p, o, context)` tuples.
+
+        Plugins override `_add_triples` to send the whole list in as few
+        requests as the `store` allows, by default each triple is added
+        separately.
+        """
+        self._add_triples(quads)
+
+    def write_batch(self, removed, added):
+        """
+        Remove the ``removed`` statements from the `store`, then add the
+        ``added`` ones, both lists of `(s, p, o, context)` tuples. `None`
+        can be used as a wildcard in the removed statements.
+
+        Plugins override `_write_batch` to send the statements in as few
+        requests as the `store` allows, by default each removed triple is
+        removed separately, then the added ones are added with `add_triples`.
+        """
+        self._write_batch(list(removed), list(added))
+
     # management
     def close(self):
         """
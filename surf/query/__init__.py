@@ -51,6 +51,23 @@ REDUCED = 'reduced'
 
 UNION = 'union'
 
+# delimits the parameters in the translation of a prepared query
+PARAMETER_MARKER = u'\x00'
+
+
+class Parameter(unicode):
+    """
+    A named placeholder for a term, bound when a prepared query is executed,
+    see :meth:`Query.prepare`. Parameters can be used in triple patterns, as
+    graph names and inside filters.
+    """
+    def __new__(cls, name):
+        if not re.match(r'^\w+$', name):
+            raise ValueError('Invalid parameter name: %s' % name)
+        parameter = super(Parameter, cls).__new__(cls, PARAMETER_MARKER + name + PARAMETER_MARKER)
+        parameter.name = name
+        return parameter
+
 
 class Group(list):
     """
@@ -64,7 +81,7 @@ class NamedGroup(Group):
     """
     def __init__(self, name = None):
         super(NamedGroup, self).__init__()
-        if isinstance(name, URIRef) or (type(name) in [str, unicode] and name.startswith('?')):
+        if isinstance(name, (URIRef, Parameter)) or (type(name) in [str, unicode] and name.startswith('?')):
             self.name = name
         else:
             raise ValueError("Invalid specifier for named group"
@@ -84,6 +101,29 @@ class Union(Group):
     """
 
 
+class Values(object):
+    """
+    A **SPARQL** 1.1 inline data block (*VALUES*), binding ``variables`` to
+    each of the ``rows`` in turn. `None` in a row leaves the variable unbound.
+
+    With a single variable, ``variables`` can be given as a string and the
+    ``rows`` as the list of its values.
+    """
+    def __init__(self, variables, rows):
+        if isinstance(variables, (str, unicode)):
+            variables = (variables, )
+            rows = [(value, ) for value in rows]
+        self.variables = tuple(variables)
+        for variable in self.variables:
+            if not (isinstance(variable, (str, unicode)) and variable.startswith('?')):
+                raise ValueError('Not a variable : <%s>' % variable)
+
+        self.rows = [tuple(row) for row in rows]
+        for row in self.rows:
+            if len(row) != len(self.variables):
+                raise ValueError('Expected %d values in row %s' % (len(self.variables), row))
+
+
 class Filter(unicode):
     """
     A **SPARQL** triple pattern filter
@@ -147,9 +187,9 @@ class Query(object):
     Query methods can be chained.
     """
 
-    STATEMENT_TYPES = [list, tuple, Group, NamedGroup, OptionalGroup, Union, Filter]  # + Query, (cannot reference here)
+    STATEMENT_TYPES = [list, tuple, Group, NamedGroup, OptionalGroup, Union, Filter, Values]  # + Query, (cannot reference here)
 
-    AGGREGATE_FUNCTIONS = ["count", "min", "max", "avg"]
+    AGGREGATE_FUNCTIONS = ["count", "sum", "min", "max", "avg", "sample", "group_concat"]
 
     TYPES = [SELECT, ASK, CONSTRUCT, DESCRIBE]
 
@@ -166,6 +206,8 @@ class Query(object):
         self._limit = None
         self._offset = None
         self._order_by = []
+        self._group_by = []
+        self._having = []
 
     @property
     def query_type(self):
@@ -230,6 +272,20 @@ class Query(object):
         """
         return self._order_by
 
+    @property
+    def query_group_by(self):
+        """
+        the query `group by` variables
+        """
+        return self._group_by
+
+    @property
+    def query_having(self):
+        """
+        the query `having` conditions
+        """
+        return self._having
+
     def distinct(self):
         """
         Add *DISTINCT* modifier.
@@ -314,6 +370,21 @@ class Query(object):
         self._data.append(g)
         return self
 
+    def values(self, variables, rows):
+        """
+        Add a *VALUES* inline data block to *WHERE* clause, see :class:`Values`.
+
+        Example:
+
+        .. code-block:: python
+
+            >>> query = select("?s").where(("?s", FOAF["name"], "?name"))
+            >>> query.values("?name", [Literal("John"), Literal("Jane")])
+
+        """
+        self._data.append(Values(variables, rows))
+        return self
+
     def named_group(self, name, *statements):
         """
         Add ``GROUP ?name { ... }`` construct to *WHERE* clause.
@@ -383,6 +454,49 @@ class Query(object):
 
         return self
 
+    def group_by(self, *variables):
+        """
+        Add *GROUP BY* modifier to query.
+
+        Example:
+
+        .. code-block:: python
+
+            >>> query = select("?c", aggregate("count", "?s", "?n"))
+            >>> query.where(("?s", a, "?c")).group_by("?c")
+
+        """
+        for var in variables:
+            if not (isinstance(var, (str, unicode)) and var.startswith('?')):
+                raise ValueError('Not a variable : <%s>' % var)
+            self._group_by.append(var)
+        return self
+
+    def having(self, *conditions):
+        """
+        Add *HAVING* condition(s) to query, each condition is a `string`
+        expression following the syntax of the query language, for example
+        ``"(COUNT(?s) > 10)"``.
+        """
+        self._having.extend(conditions)
+        return self
+
+    def prepare(self):
+        """
+        Translate the query once into a :class:`PreparedQuery`, a template
+        whose :class:`Parameter` placeholders are bound on execution.
+
+        Example:
+
+        .. code-block:: python
+
+            >>> query = select("?name").where((param("s"), surf.ns.FOAF.name, "?name"))
+            >>> prepared = query.prepare()
+            >>> store.execute(prepared, s = URIRef("http://example.com/john"))
+
+        """
+        return PreparedQuery(self)
+
     def __unicode__(self):
         # Importing here to avoid circular imports.
         from surf.query.translator.sparql import SparqlTranslator
@@ -392,26 +506,100 @@ class Query(object):
         return unicode(self).encode("utf-8")
 
 
+class BoundQuery(Query):
+    """
+    A :class:`PreparedQuery` with all its parameters bound to terms,
+    ready to be executed.
+    """
+    def __init__(self, type, text):
+        super(BoundQuery, self).__init__(type)
+        self.__text = text
+
+    def __unicode__(self):
+        return self.__text
+
+
+class PreparedQuery(object):
+    """
+    The translation of a :class:`Query`, split at its parameters.
+
+    Binding values to the parameters only renders the values and joins the
+    translated segments, the query tree is not translated again.
+    """
+    def __init__(self, query):
+        pieces = unicode(query).split(PARAMETER_MARKER)
+        self.__type = query.query_type
+        self.__segments = pieces[0::2]
+        self.__names = pieces[1::2]
+
+    @property
+    def query_type(self):
+        """
+        the `type` of the prepared query
+        """
+        return self.__type
+
+    @property
+    def parameters(self):
+        """
+        the names of the query parameters
+        """
+        return frozenset(self.__names)
+
+    def bind(self, **values):
+        """
+        Return a :class:`BoundQuery` with every parameter replaced by the
+        safely escaped rendering of its value, values that are not RDF terms
+        are converted with :func:`surf.util.value_to_rdf`.
+        """
+        # Importing here to avoid circular imports.
+        from surf.query.translator.term import render
+        from surf.util import value_to_rdf
+
+        missing = self.parameters.difference(values)
+        if missing:
+            raise ValueError('Unbound query parameters: %s' % ', '.join(sorted(missing)))
+        unknown = set(values).difference(self.parameters)
+        if unknown:
+            raise ValueError('Unknown query parameters: %s' % ', '.join(sorted(unknown)))
+
+        rendered = {}
+        for name, value in values.items():
+            if hasattr(value, 'subject'):
+                value = value.subject
+            elif not isinstance(value, (URIRef, BNode, Literal)):
+                value = value_to_rdf(value)
+            if not isinstance(value, (URIRef, BNode, Literal)):
+                raise ValueError('Can not bind %r to the query parameter %s' % (value, name))
+            rendered[name] = render(value)
+
+        text = [self.__segments[0]]
+        for name, segment in zip(self.__names, self.__segments[1:]):
+            text.append(rendered[name])
+            text.append(segment)
+        return BoundQuery(self.__type, u''.join(text))
+
+
 def validate_statement(statement):
     if isinstance(statement, tuple(Query.STATEMENT_TYPES + [Query])):
-        if isinstance(statement, (list, tuple)):
+        if isinstance(statement, (list, tuple)) and not isinstance(statement, Group):
             try:
                 s, p, o = statement
             except:
                 raise ValueError('''Statement of type [list, tuple] does not
                                  have all the (s,p,o) members (the length of the
                                  supplied arguemnt must be at least 3)''')
-            if isinstance(s, (URIRef, BNode)) or (isinstance(s, (str, unicode)) and s.startswith('?')):
+            if isinstance(s, (URIRef, BNode, Parameter)) or (isinstance(s, (str, unicode)) and s.startswith('?')):
                 pass
             else:
                 raise ValueError('The subject is not a valid variable type')
 
-            if isinstance(p, URIRef) or (isinstance(p, (str, unicode)) and p.startswith('?')):
+            if isinstance(p, (URIRef, Parameter)) or (isinstance(p, (str, unicode)) and p.startswith('?')):
                 pass
             else:
                 raise ValueError('The predicate is not a valid variable type')
 
-            if isinstance(o, (URIRef, BNode, Literal)) or (isinstance(o, (str, unicode)) and o.startswith('?')):
+            if isinstance(o, (URIRef, BNode, Literal, Parameter)) or (isinstance(o, (str, unicode)) and o.startswith('?')):
                 pass
             else:
                 raise ValueError(u'The object is not a valid variable type: {0:s}'.format(o))
@@ -421,6 +609,24 @@ def validate_statement(statement):
         raise ValueError('Statement type not in {0:s}'.format)
 
 
+def aggregate(function, expression, alias, distinct=False):
+    """
+    Return the projection of the aggregate ``function`` over ``expression``,
+    bound to the ``alias`` variable, for example
+    ``aggregate("count", "?s", "?n")`` gives ``(COUNT(?s) AS ?n)``.
+
+    Returned object can be used as argument in :func:`select`.
+    """
+    if function.lower() not in Query.AGGREGATE_FUNCTIONS:
+        raise ValueError('Not a supported aggregate : <%s>, supported aggregates are %s'
+                         % (function, str(Query.AGGREGATE_FUNCTIONS)))
+    if not (isinstance(alias, (str, unicode)) and alias.startswith('?')):
+        raise ValueError('Not a variable : <%s>' % alias)
+
+    modifier = 'DISTINCT ' if distinct else ''
+    return u'(%s(%s%s) AS %s)' % (function.upper(), modifier, expression, alias)
+
+
 def optional_group(*statements):
     """
     Return optional group graph pattern.
@@ -463,6 +669,15 @@ def union(*statements):
     return g
 
 
+def values(variables, rows):
+    """
+    Return a *VALUES* inline data block, see :class:`Values`.
+
+    Returned object can be used as argument in :meth:`Query.where` method.
+    """
+    return Values(variables, rows)
+
+
 def named_group(name, *statements):
     """
     Return named group graph pattern.
@@ -487,6 +702,13 @@ def named_group(name, *statements):
     return g
 
 
+def param(name):
+    """
+    Return a :class:`Parameter` placeholder named ``name`` for a prepared query.
+    """
+    return Parameter(name)
+
+
 def select(*variables):
     """
     Construct and return :class:`surf.query.Query` object of type **SELECT**
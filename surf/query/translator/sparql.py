@@ -35,9 +35,8 @@
 # -*- coding: utf-8 -*-
 from surf.query.translator import QueryTranslator
 from surf.query import Query, SELECT, ASK, DESCRIBE, CONSTRUCT, Group
-from surf.query import NamedGroup, OptionalGroup, Union, Filter
-from surf.rdf import BNode, Literal, URIRef
-from surf.util import is_uri
+from surf.query import NamedGroup, OptionalGroup, Union, Filter, Values
+from surf.query.translator.term import render
 
 __author__ = 'Cosmin Basca'
 
@@ -58,7 +57,7 @@ class SparqlTranslator(QueryTranslator):
         if query.query_type == DESCRIBE:
             query_type = "DESCRIBE"
 
-        rep = u'%(query_type)s %(modifier)s %(vars)s %(from_)s %(from_named)s WHERE { %(where)s } %(order_by)s %(limit)s %(offset)s '
+        rep = u'%(query_type)s %(modifier)s %(vars)s %(from_)s %(from_named)s WHERE { %(where)s } %(group_by)s %(having)s %(order_by)s %(limit)s %(offset)s '
         modifier = query.query_modifier and query.query_modifier.upper() or ''
         limit = query.query_limit and ' LIMIT %d ' % (query.query_limit) or ''
         offset = query.query_offset and ' OFFSET %d ' % (query.query_offset) or ''        
@@ -66,6 +65,12 @@ class SparqlTranslator(QueryTranslator):
         vars = ' '.join([var for var in query.query_vars])
         from_ = ' '.join([ "FROM <%s>" % uri for uri in query.query_from])
         from_named = ' '.join([ "FROM NAMED <%s>" % uri for uri in query.query_from_named])
+        group_by = ''
+        if len(query.query_group_by) > 0:
+            group_by = ' GROUP BY %s' % (' '.join(query.query_group_by))
+        having = ''
+        if len(query.query_having) > 0:
+            having = ' HAVING %s' % (' '.join(query.query_having))
         if len(self.query.query_order_by) > 0:
             order_by = ' ORDER BY %s' % (' '.join([var for var in self.query.query_order_by]))
         else:
@@ -79,6 +84,8 @@ class SparqlTranslator(QueryTranslator):
                      'where'        : where,
                      'limit'        : limit,
                      'offset'       : offset,
+                     'group_by'     : group_by,
+                     'having'       : having,
                      'order_by'     : order_by, })
 
     def _translate_ask(self, query):
@@ -91,29 +98,10 @@ class SparqlTranslator(QueryTranslator):
                      'where'        : where, })
 
     def _term(self, term):
-        if type(term) in [URIRef, BNode]:
-            return '%s' % (term.n3())
-        elif type(term) in [str, unicode]:
-            if term.startswith('?'):
-                return '%s' % term
-            elif is_uri(term):
-                return '<%s>' % term
-            else:
-                return '"%s"' % term
-        elif type(term) is Literal:
-            return term.n3()
-        elif type(term) in [list, tuple]:
-            return '"%s"@%s' % (term[0], term[1])
-        elif type(term) is type and hasattr(term, 'uri'):
-            return '%s' % term.uri().n3()
-        elif hasattr(term, 'subject'):
-            return '%s' % term.subject.n3()
-        return term.__str__()
+        return render(term)
 
     def _triple_pattern(self, statement):
-        return ' %(s)s %(p)s %(o)s ' % ({'s':self._term(statement[0]),
-                                        'p':self._term(statement[1]),
-                                        'o':self._term(statement[2])})
+        return u' %s %s %s ' % (render(statement[0]), render(statement[1]), render(statement[2]))
 
     def _group(self, g):
         return ' { %s } ' % ('. '.join([self._statement(stmt) for stmt in g]))
@@ -131,6 +119,16 @@ class SparqlTranslator(QueryTranslator):
     def _filter(self, stmt):
         return ' FILTER %s ' % (stmt)
 
+    def _values(self, values):
+        def value(term):
+            return u'UNDEF' if term is None else render(term)
+
+        if len(values.variables) == 1:
+            return u' VALUES %s { %s } ' % (values.variables[0], u' '.join([value(row[0]) for row in values.rows]))
+
+        rows = u' '.join([u'(%s)' % u' '.join([value(term) for term in row]) for row in values.rows])
+        return u' VALUES (%s) { %s } ' % (u' '.join(values.variables), rows)
+
     def _subquery(self, stmt):
         return ' { %s } ' % (SparqlTranslator(stmt).translate())
 
@@ -147,5 +145,7 @@ class SparqlTranslator(QueryTranslator):
             return self._union(statement)
         elif type(statement) is Filter:
             return self._filter(statement)
+        elif type(statement) is Values:
+            return self._values(statement)
         elif type(statement) is Query:
             return self._subquery(statement)
@@ -0,0 +1,164 @@
+# Copyright (c) 2009, Digital Enterprise Research Institute (DERI),
+# NUI Galway
+# All rights reserved.
+
+# author: Cosmin Basca
+# email: cosmin.basca@gmail.com
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer
+#      in the documentation and/or other materials provided with
+#      the distribution.
+#    * Neither the name of DERI nor the
+#      names of its contributors may be used to endorse or promote
+#      products derived from this software without specific prior
+#      written permission.
+
+# THIS SOFTWARE IS PROVIDED BY DERI ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A
+# PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL DERI BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY,
+# OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED
+# OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# -*- coding: utf-8 -*-
+from surf.namespace import OWL
+from surf.query import Parameter
+from surf.rdf import BNode, ClosedNamespace, Literal, RDF, RDFS, URIRef
+from surf.util import is_uri
+
+__author__ = 'Cosmin Basca'
+
+# the number of URIRef renderings kept by the cache
+URI_CACHE_SIZE = 8192
+
+
+class RenderCache(object):
+    """ A bounded cache of rendered terms with least-recently-used eviction,
+    approximated by two generations of plain dictionaries.
+
+    Hits in the old generation are promoted to the new one, when the new
+    generation is full the old one is dropped. Lookups and inserts are single
+    dictionary operations, so the cache is safe to share between threads.
+
+    """
+
+    def __init__(self, size = URI_CACHE_SIZE):
+        self.__size = max(1, size / 2)
+        self.__new = {}
+        self.__old = {}
+
+    def get(self, term):
+        value = self.__new.get(term)
+        if value is None:
+            value = self.__old.get(term)
+            if value is not None:
+                self.set(term, value)
+        return value
+
+    def set(self, term, value):
+        if len(self.__new) >= self.__size:
+            self.__old = self.__new
+            self.__new = {}
+        self.__new[term] = value
+
+    def clear(self):
+        self.__new = {}
+        self.__old = {}
+
+    def __len__(self):
+        return len(self.__new) + len(self.__old)
+
+
+# renderings that are never evicted
+_precomputed = {}
+_uri_cache = RenderCache()
+
+
+def precompute(*terms):
+    """ Precompute the rendering of frequently used `terms`, namespaces with a
+    closed set of terms (like :data:`surf.rdf.RDF`) can be given as well.
+    """
+
+    for term in terms:
+        if isinstance(term, ClosedNamespace):
+            precompute(*term._ClosedNamespace__uris.values())
+        else:
+            _precomputed[unicode(term)] = URIRef(term).n3()
+
+
+def _uri(term):
+    # plain unicode keys, hashing a URIRef is much slower
+    key = unicode(term)
+    rendered = _precomputed.get(key) or _uri_cache.get(key)
+    if rendered is None:
+        rendered = term.n3()
+        _uri_cache.set(key, rendered)
+    return rendered
+
+
+def _n3(term):
+    return term.n3()
+
+
+def _string(term):
+    if term.startswith('?'):
+        return term
+    # is_uri parses the string, only strings that may be URIs get that far
+    elif '://' in term and is_uri(term):
+        return '<%s>' % term
+    return '"%s"' % term
+
+
+def _parameter(term):
+    # kept as is, prepared queries split the translation at the markers
+    return term
+
+
+def _language_literal(term):
+    return '"%s"@%s' % (term[0], term[1])
+
+
+def _other(term):
+    if type(term) is type and hasattr(term, 'uri'):
+        return term.uri().n3()
+    elif hasattr(term, 'subject'):
+        return term.subject.n3()
+    return term.__str__()
+
+
+RENDERERS = {
+    URIRef: _uri,
+    BNode: _n3,
+    Literal: _n3,
+    str: _string,
+    unicode: _string,
+    Parameter: _parameter,
+    list: _language_literal,
+    tuple: _language_literal,
+}
+
+
+def render(term):
+    """ Return the query language representation of `term`.
+
+    Terms are dispatched on their exact type, `URIRef` renderings are
+    cached, plain strings are variables (starting with '?'), URIs or literals.
+
+    """
+
+    return RENDERERS.get(type(term), _other)(term)
+
+
+precompute(RDF, RDFS, OWL.Class, OWL.Thing, OWL.sameAs)
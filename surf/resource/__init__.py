@@ -38,14 +38,61 @@ from surf.rdf import BNode, ClosedNamespace, ConjunctiveGraph, Graph, Literal
 from surf.rdf import Namespace, RDF, RDFS, URIRef
 from surf.resource.lazy import LazyResourceLoader
 from surf.resource.result_proxy import ResultProxy
-from surf.serializer import to_json
+from surf.serializer import WRITERS, serialize_triples
 from surf.store import NO_CONTEXT, Store
 from surf.util import attr2rdf, namespace_split, rdf2attr
 from surf.util import uri_to_class, uuid_subject, value_to_rdf
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
+from cStringIO import StringIO
+import threading
 
 __author__ = 'Cosmin Basca'
 
+# The load states of a resource, see :attr:`Resource.load_state`
+UNLOADED    = 'unloaded'
+PARTIAL     = 'partial'
+FULL_DIRECT = 'full_direct'
+FULL        = 'full'
+
+# The attributes with more values than this are fetched a window at a time
+# after a summary load, unless the session has a smaller `window_size`
+SUMMARY_WINDOW_SIZE = 1000
+
+
+def _unique(values):
+    """ Return the ``values`` without duplicates, in order. """
+
+    return list(OrderedDict.fromkeys(values))
+
+
+class _ValuesWindow(object):
+    """ The values of an attribute of a `resource` in the store, fetched
+    ``size`` at a time by a :class:`LazyResourceLoader`, ``count`` is their
+    number when it is already known. """
+
+    def __init__(self, resource, predicate, direct, size, count = None):
+        self.resource   = resource
+        self.predicate  = predicate
+        self.direct     = direct
+        self.size       = size
+        self.__count    = count
+
+    def __store(self):
+        return self.resource.session[self.resource.store_key]
+
+    def values(self, limit, offset):
+        return self.__store().get(self.resource, self.predicate, self.direct,
+                                  limit = limit, offset = offset)
+
+    def count(self):
+        if self.__count is None:
+            self.__count = self.__store().count(self.resource, self.predicate, self.direct)
+        return self.__count
+
+    def contains(self, value):
+        return self.__store().has_value(self.resource, self.predicate, value, self.direct)
+
+
 class ResourceMeta(type):
     def __new__(mcs, classname, bases, class_dict):
         if 'uri' not in class_dict:
@@ -167,6 +214,7 @@ class Resource(object):
 
     __metaclass__ = ResourceMeta
     _dirty_instances = set()
+    _dirty_lock = threading.Lock()
     
     def __init__(self, subject = None, block_auto_load = False, context = None,
                  namespace = None):
@@ -208,6 +256,18 @@ class Resource(object):
         # triplestore.
         self.__full_direct  = False
         self.__full_inverse = False
+        # The predicates with all their values loaded, when not fully loaded
+        self.__loaded_direct    = set()
+        self.__loaded_inverse   = set()
+        # The number of values of each predicate, after a summary load
+        self.__summary_direct   = None
+        self.__summary_inverse  = None
+
+        # The direct values of the resource in the store, as last loaded or
+        # written, by predicate. When __rdf_stored_full is set, predicates
+        # that are not present have no values in the store.
+        self.__rdf_stored       = {}
+        self.__rdf_stored_full  = False
 
         if self.session:
             if not self.store_key:
@@ -226,18 +286,26 @@ class Resource(object):
         if not isinstance(dirty, bool):
             raise ValueError('Value must be of type bool not <%s>' % type(dirty))
 
-        # Setting dirty to "True" means: 
-        # adding this instance to "dirty_instances" set
-        if dirty and not self in self._dirty_instances:
-            self._dirty_instances.add(self)
-            
-        # Setting dirty to "False" means: 
-        # removing this instance from "dirty_instances" set
-        if not dirty and self in self._dirty_instances:
-            self._dirty_instances.remove(self)
+        # With auto_persist, each change is queued to be written, the queue
+        # marks the resource dirty until it is written
+        if dirty and self.session and self.session.auto_persist:
+            self.session.write_behind.enqueue(self)
+        else:
+            self._mark_dirty(dirty)
+
+    def _mark_dirty(self, dirty):
+        """ Add the resource to, or remove it from, the dirty instances. """
+
+        # The dirty instances are shared with the write behind thread
+        with self._dirty_lock:
+            if dirty:
+                self._dirty_instances.add(self)
+            else:
+                self._dirty_instances.discard(self)
 
     def get_dirty(self):
-        return self in self._dirty_instances
+        with self._dirty_lock:
+            return self in self._dirty_instances
 
     dirty = property(fget = get_dirty, fset = set_dirty)
     """ Reflects the `dirty` state of the resource. """
@@ -248,11 +316,45 @@ class Resource(object):
     rdf_inverse = property(fget = lambda self: self.__rdf_inverse)
     """ Inverse predicates (`incoming` predicates). """
 
+    def __get_load_state(self):
+        if self.__full_direct:
+            return FULL if self.__full_inverse else FULL_DIRECT
+        if (self.__loaded_direct or self.__loaded_inverse or self.__full_inverse
+            or self.__summary_direct is not None):
+            return PARTIAL
+        return UNLOADED
+
+    load_state = property(fget = __get_load_state)
+    """ How much of the resource was loaded from the store, one of
+    `UNLOADED`, `PARTIAL` (some attributes, see :meth:`is_loaded`),
+    `FULL_DIRECT` (all direct attributes) or `FULL` (all direct and
+    inverse attributes). """
+
+    def is_loaded(self, attr_name):
+        """ Return True if the values of the attribute `attr_name` were loaded
+        from the store, in which case accessing it doesn't query the store.
+
+        """
+
+        predicate, direct = attr2rdf(attr_name)
+        if not predicate:
+            raise AttributeError('Not a predicate: %s' % attr_name)
+
+        if direct:
+            loaded, summary = self.__full_direct or predicate in self.__loaded_direct, self.__summary_direct
+        else:
+            loaded, summary = self.__full_inverse or predicate in self.__loaded_inverse, self.__summary_inverse
+        # After a summary load, the attributes not in the summary have no values
+        return loaded or (summary is not None and predicate not in summary)
+
     def __set_context(self, value):
         if not isinstance(value, URIRef):
             value = URIRef(value)
 
         self.__context = value
+        # The values stored in another context are not the ones to update
+        self.__rdf_stored       = {}
+        self.__rdf_stored_full  = False
 
     context = property(fget = lambda self: self.__context,
                        fset = __set_context)
@@ -377,7 +479,6 @@ class Resource(object):
             return value.subject
         return value_to_rdf(value)
 
-    #TODO: add the auto_persist feature...
     def __setattr__(self, name, value):
         """
         The `set` method - responsible for *caching* the `value` to the
@@ -429,7 +530,6 @@ class Resource(object):
         return setattr(self, attr_name, value)
 
 
-    #TODO: add the auto_persist feature...
     def __delattr__(self, attr_name):
         """
         The `del` method - responsible for deleting the attribute of the object given
@@ -491,25 +591,40 @@ class Resource(object):
                     store = resource.session[resource.store_key]
                     # send request to triple store
                     values = store.get(resource, predicate, direct)
+                    if direct:
+                        resource.__rdf_stored[predicate] = list(values)
+                        resource.__loaded_direct.add(predicate)
+                    else:
+                        resource.__loaded_inverse.add(predicate)
                     if not values:
                         predicate_values = rdf_dict.get(predicate,[])
                         values.update([(pred_val, []) for pred_val in predicate_values])
-                    # instantiate SuRF objects
-                    surf_values = resource._lazy(values)
                 else:
-                    surf_values = []
+                    values = {}
 
-                rdf_dict[predicate] = [resource.to_rdf(value) for value in surf_values]
-                return surf_values, rdf_dict[predicate]
+                # SuRF objects are instantiated when the values are accessed
+                rdf_dict[predicate] = list(values)
+                return values, rdf_dict[predicate]
 
             return getvalues_callable
 
-        # If resource is fully loaded and we're still here (__getattr__), this must be an empty
+        # If the attribute was loaded and we're still here (__getattr__), this must be an empty
         # attribute, therefore there is no point in querying the triple store !
-        retrieve_values     = (not self.__full_direct) if direct else (not self.__full_inverse)
+        retrieve_values     = not self.is_loaded(attr_name)
         getvalues_callable  = prepare_getvalues_callable(self, predicate, direct, retrieve_values)
 
-        attr_value          = LazyResourceLoader(getvalues_callable, self, attr_name)
+        # Large attributes can be fetched a window of values at a time
+        window              = None
+        rdf_dict            = self.__rdf_direct if direct else self.__rdf_inverse
+        window_size         = self.session.window_size if self.session else None
+        summary             = self.__summary_direct if direct else self.__summary_inverse
+        count               = summary.get(predicate) if summary else None
+        if count is not None and count > (window_size or SUMMARY_WINDOW_SIZE):
+            window_size = window_size or SUMMARY_WINDOW_SIZE
+        if retrieve_values and window_size and not rdf_dict.get(predicate):
+            window = _ValuesWindow(self, predicate, direct, window_size, count)
+
+        attr_value          = LazyResourceLoader(getvalues_callable, self, attr_name, window)
 
         # Not using self.__setattr__, that would trigger loading of attributes
 #        object.__setattr__(self, attr_name, attr_value)
@@ -527,7 +642,7 @@ class Resource(object):
 
         return getattr(self, attr_name)
     
-    def load(self, direct_only=False, **kwargs):
+    def load(self, direct_only=False, summary=False, **kwargs):
         """Load all attributes from the data store.
         
         By default, load all attributes from the data store:
@@ -538,34 +653,72 @@ class Resource(object):
         This can be used as optimization when client knows invese
         attributes won't be accessed. 
 
+        If `summary` is `True`, only load which attributes the resource has
+        and their number of values: accessing the attributes it doesn't have
+        won't query the data store, the values of the others are loaded when
+        accessed, a window at a time for the attributes with many values (see
+        :attr:`surf.session.Session.window_size`).
+
         .. note:: This method resets the *dirty* state of the object.
 
         """
 
-        results_d = self.session[self.store_key].load(self, True)
-        self.__set_predicate_values(results_d, True)
+        if summary:
+            store = self.session[self.store_key]
+            self.__summary_direct = store.summary(self, True)
+            if not direct_only:
+                self.__summary_inverse = store.summary(self, False)
+        else:
+            self.__load_direct()
+            if not direct_only:
+                self.__load_inverse()
+
+        self.dirty = False
+
+    def __load_direct(self):
+        results = self.session[self.store_key].load(self, True)
+        self.__set_predicate_values(results, True)
         self.__full_direct = True
+        self.__rdf_stored = dict((p, list(v)) for p, v in results.items())
+        self.__rdf_stored_full = True
+
+    def __load_inverse(self):
+        results = self.session[self.store_key].load(self, False)
+        self.__set_predicate_values(results, False)
+        self.__full_inverse = True
 
-        if not direct_only:
-            results_i = self.session[self.store_key].load(self, False)
-            self.__set_predicate_values(results_i, False)
-            self.__full_inverse = True
+    def __auto_load(self):
+        """ Load what was not loaded yet, if the session `auto_load` is on. """
 
+        if not (self.session and self.session.auto_load):
+            return
+
+        if not self.__full_direct:
+            self.__load_direct()
+        if not self.__full_inverse:
+            self.__load_inverse()
         self.dirty = False
 
 
     def __set_predicate_values(self, results, direct):
-        """ set the prediate - value(s) to the resource using lazy loading,
+        """ set the prediate - value(s) loaded from the store to the resource,
         `results` is a dict under the form:
         {'predicate':{'value':[concept,concept],...},...}.
 
+        The values are set directly, not through `__setattr__`, so this
+        doesn't change the *dirty* state of the resource.
+
         """
 
+        rdf_dict = self.__rdf_direct if direct else self.__rdf_inverse
         for p, v in results.items():
-            attr = rdf2attr(p, direct)
-            value = self._lazy(v)
-            if value:
-                self.__setattr__(attr, value)
+            if v:
+                attr = rdf2attr(p, direct)
+                # the values are already rdflib terms, the resources are
+                # instantiated when the values are accessed
+                rdf_dict[p] = list(v)
+                attr_value = LazyResourceLoader.loaded(self, attr, v, rdf_dict[p])
+                object.__setattr__(self, attr, attr_value)
 
 
     @classmethod
@@ -639,20 +792,44 @@ class Resource(object):
         instance = cls._instance(subject, [_rdf_type],
                                  context = context,
                                  store = cls.store_key,
-                                 block_auto_load = False)
-
-        instance.__set_predicate_values(data.get("direct", {}), True)
-        instance.__set_predicate_values(data.get("inverse", {}), False)
-        
-        full                    = bool(params.get("full"))
-        direct_only             = bool(params.get("direct_only"))
-        instance.__full_direct  = full
-        instance.__full_inverse = full and not direct_only
-        # __setattr__ marked it as dirty but it's freshly loaded!
-        instance.dirty = False 
+                                 block_auto_load = True)
 
+        instance._hydrate(data, full = bool(params.get("full")),
+                          direct_only = bool(params.get("direct_only")),
+                          only = params.get("only", []))
         return instance
 
+    def _hydrate(self, data, full = False, direct_only = False, only = ()):
+        """ Set the attributes loaded from the store, ``data`` is a dictionary
+        with the `direct` and `inverse` values, as returned by
+        :meth:`surf.store.Store.get_by`. ``full`` and ``direct_only`` tell
+        which attributes were all loaded, ``only`` are the `(predicate,
+        direct)` attributes loaded when not all of them were.
+
+        What was loaded is not queried again, neither when the attributes are
+        accessed nor by the session `auto_load`, which loads only the rest.
+
+        """
+
+        self.__set_predicate_values(data.get("direct", {}), True)
+        self.__set_predicate_values(data.get("inverse", {}), False)
+        for predicate, values in data.get("direct", {}).items():
+            self.__rdf_stored[predicate] = list(values)
+
+        # Attributes loaded with ResultProxy.only() that have no values
+        # must not be retrieved again when accessed
+        for predicate, direct in only:
+            if direct:
+                self.__loaded_direct.add(predicate)
+                self.__rdf_stored.setdefault(predicate, [])
+            else:
+                self.__loaded_inverse.add(predicate)
+
+        self.__full_direct  = self.__full_direct or full
+        self.__full_inverse = self.__full_inverse or (full and not direct_only)
+        self.__rdf_stored_full = self.__rdf_stored_full or full
+        self.__auto_load()
+
     @classmethod
     def all(cls):
         """ Retrieve all or limited number of `instances`. """
@@ -712,7 +889,7 @@ class Resource(object):
         kwargs = {inverse_attribute_name : self.subject}
         return proxy.get_by(**kwargs)
 
-    def serialize(self, format = 'xml', direct = False):
+    def serialize(self, format = 'xml', direct = False, fp = None):
         """
         Return a serialized version of the internal graph represenatation
         of the resource, the format is the same as expected by rdflib's graph
@@ -721,16 +898,59 @@ class Resource(object):
         supported formats:
             - **n3**
             - **xml**
-            - **json** (internal serializer)
-            - **nt**
+            - **json** (internal streaming serializer, rdf-json)
+            - **json-ld** (internal streaming serializer)
+            - **nt** (internal streaming serializer)
             - **turtle**
 
+        The internal serializers write the :meth:`triples` directly, without
+        building a graph. If a file-like object `fp` is given, the
+        serialization is written to it instead of being returned.
+
+        """
+
+        if format in WRITERS:
+            out = fp if fp is not None else StringIO()
+            serialize_triples(self.triples(direct = direct), out, format = format)
+            return out.getvalue() if fp is None else None
+
+        data = self.graph(direct = direct).serialize(format = format)
+        if fp is None:
+            return data
+        fp.write(data)
+
+    def triples(self, direct = True):
         """
+        Iterate over the `(s, p, o)` triples of the `resource`, grouped by subject.
 
-        graph = self.graph(direct = direct)
-        if format == 'json':
-            return to_json(graph)
-        return graph.serialize(format = format)
+        The `rdf:type` triple and the direct triples come first, followed by
+        the inverse triples (unless `direct` is True) grouped by their subject.
+
+        """
+
+        subject = self.subject
+        if self.uri not in self.__rdf_direct.get(RDF_TYPE, []):
+            yield subject, RDF_TYPE, self.uri
+
+        rdf_types = (URIRef, Literal, BNode)
+        for predicate, values in self.__rdf_direct.items():
+            for value in values:
+                if type(value) in rdf_types:
+                    yield subject, predicate, value
+
+        if not direct:
+            inverse = OrderedDict()
+            for predicate, values in self.__rdf_inverse.items():
+                for value in values:
+                    if type(value) in rdf_types:
+                        inverse.setdefault(value, []).append(predicate)
+            # The triples pointing at the resource itself stay in its group
+            for predicate in inverse.pop(subject, []):
+                if subject not in self.__rdf_direct.get(predicate, []):
+                    yield subject, predicate, subject
+            for value, predicates in inverse.iteritems():
+                for predicate in predicates:
+                    yield value, predicate, subject
 
     def graph(self, direct = True):
         """
@@ -762,6 +982,61 @@ class Resource(object):
 
         self.session[self.store_key].save(self)
 
+    def _set_stored(self, values=None, full=False):
+        """ Record the direct ``values``, by default the current ones, as the
+        ones in the store. When ``full`` is set, they are all the direct
+        values in the store. """
+
+        if values is None:
+            values = self.__rdf_direct
+        if full:
+            self.__rdf_stored = {}
+            self.__rdf_stored_full = True
+        for predicate, objects in values.items():
+            self.__rdf_stored[predicate] = list(objects)
+
+    def changes(self):
+        """ Return the direct statements to remove from and to add to the
+        data `store` to update the `resource`, as a ``(removed, added)`` tuple
+        of lists of `(s, p, o)` statements.
+
+        Only the values that changed since the attribute was loaded (or
+        written) are included. For attributes whose values in the store are
+        not known, the removed statement has `None` as object: all the
+        values of the attribute are removed, and all the current values are
+        added.
+
+        """
+
+        return self.__changes(self.__rdf_direct)
+
+    def _snapshot(self):
+        """ Return a copy of the direct values, and the `(removed, added)`
+        statements that write them, see :meth:`changes`. """
+
+        values = dict((predicate, list(objects)) for predicate, objects in self.__rdf_direct.items())
+        return values, self.__changes(values)
+
+    def __changes(self, direct):
+        removed, added = [], []
+        for predicate, values in direct.items():
+            values = _unique(values)
+            if predicate in self.__rdf_stored:
+                stored = _unique(self.__rdf_stored[predicate])
+            elif self.__rdf_stored_full:
+                stored = []
+            else:
+                removed.append((self.subject, predicate, None))
+                added.extend((self.subject, predicate, value) for value in values)
+                continue
+
+            current = set(values)
+            removed.extend((self.subject, predicate, value) for value in stored if value not in current)
+            stored = set(stored)
+            added.extend((self.subject, predicate, value) for value in values if value not in stored)
+
+        return removed, added
+
     def remove(self, inverse = False):
         """ Remove the `resource` from the data `store`. """
 
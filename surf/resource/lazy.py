@@ -34,6 +34,8 @@
 
 # -*- coding: utf-8 -*-
 from surf.exceptions import NoResultFound, MultipleResultsFound
+from collections import OrderedDict
+import sys
 
 __author__ = ['Peteris Caune', 'Cosmin Basca']
 
@@ -49,9 +51,22 @@ class LazyResourceLoader(list):
     .. note::
         instances of this class **must** not be created manually, instead they are
         automatically generated by `SuRF` as needed
-        
+
+    .. note::
+        the values can be given as the `{value: [concept, ...]}` dictionary
+        returned by the `store`, the resources are then instantiated only when
+        the values are accessed, `len`, `in` and `first` don't instantiate
+        all of them
+
+    .. note::
+        with a `window` (see :attr:`surf.session.Session.window_size`), the
+        values are not all fetched: indexing, slicing, `first` and iteration
+        fetch the needed windows of values, which are kept for the next
+        accesses, `len` and `in` ask the `store`.
+        Changing the values, comparing or printing them fetches all of them
+
     '''
-    def __init__(self, getvalues_callable, resource, attribute_name):
+    def __init__(self, getvalues_callable, resource, attribute_name, window = None):
         list.__init__(self)
         if not hasattr(getvalues_callable, '__call__'):
             raise ValueError('getvalues_callable must be a callable instance or a function!')
@@ -63,21 +78,89 @@ class LazyResourceLoader(list):
 
         # For lazy loading list contents
         self.__getvalues = getvalues_callable
+        self.__rdf_values = None
+        self.__types = None
         self.__data_loaded = False
 
+        # For windowed loading, until all the values are loaded, the windows
+        # fetched are kept by offset
+        self.__window = window
+        self.__windows = {}
+        self.__count = None
+
+    @classmethod
+    def loaded(cls, resource, attribute_name, values, rdf_values):
+        ''' return a loader of `values` that are already loaded, either as
+        a list or as a `{value: [concept, ...]}` dictionary, `rdf_values` is
+        the list of their **RDF** representations, kept in sync with the
+        `values`
+        '''
+        loader = cls.__new__(cls)
+        list.__init__(loader)
+        loader.resource = resource
+        loader.__attribute_name = attribute_name
+        loader.__getvalues = None
+        loader.__window = None
+        loader.__set_values(values, rdf_values)
+        return loader
+
+    def __set_values(self, values, rdf_values):
+        self.__rdf_values = rdf_values
+        if isinstance(values, dict):
+            self.__types = values
+            self.__data_loaded = False
+        else:
+            self[:] = values
+            self.__data_loaded = True
+
+    def __prepare_rdf_values(self):
+        if self.__rdf_values is None:
+            self.__set_values(*self.__getvalues())
+
+    def __instantiate(self, rdf_values, types):
+        return self.resource._lazy(OrderedDict((value, types.get(value, []))
+                                               for value in rdf_values))
+
     def __prepare_values(self):
+        self.__prepare_rdf_values()
         if not self.__data_loaded:
-            self[:], self.__rdf_values = self.__getvalues()
+            self[:] = self.__instantiate(self.__rdf_values, self.__types)
+            self.__types = None
             self.__data_loaded = True
 
+    def __windowed(self):
+        return self.__window is not None and self.__rdf_values is None
+
+    def __fetch(self, limit, offset):
+        values = self.__window.values(limit, offset)
+        return self.__instantiate(values.keys(), values)
+
+    def __get_window(self, offset):
+        values = self.__windows.get(offset)
+        if values is None:
+            size = self.__window.size
+            values = self.__windows[offset] = self.__fetch(size, offset)
+            if len(values) < size and self.__count is None:
+                self.__count = offset + len(values)
+        return values
+
+    def __iter_windows(self, start = 0, stop = None):
+        size = self.__window.size
+        offset = start - start % size
+        while stop is None or offset < stop:
+            values = self.__get_window(offset)
+            for value in values[max(start - offset, 0):None if stop is None else stop - offset]:
+                yield value
+            if len(values) < size:
+                break
+            offset += size
+
     def get_one(self):
         ''' return only one `resource`. If there are more `resources` available
         the :class:`surf.exc.NoResultFound` exception is raised
         '''
-        self.__prepare_values()
-
         if len(self) == 1:
-            return self[0]
+            return self.first
         elif len(self) == 0:
             raise NoResultFound('list is empty')
         else:
@@ -87,11 +170,18 @@ class LazyResourceLoader(list):
     def get_first(self):
         ''' return the first `resource` or None otherwise.
         '''
-        self.__prepare_values()
+        if self.__windowed():
+            values = self.__get_window(0)
+            return values[0] if values else None
+
+        self.__prepare_rdf_values()
 
-        if len(self) > 0:
-            return self[0]
-        return None
+        if not self.__rdf_values:
+            return None
+        if not self.__data_loaded:
+            # don't instantiate all the values for the first one
+            return self.__instantiate(self.__rdf_values[:1], self.__types)[0]
+        return list.__getitem__(self, 0)
     first = property(fget = get_first)
 
     def set_dirty(self, dirty):
@@ -110,19 +200,49 @@ class LazyResourceLoader(list):
         raise Exception("to_rdf has no reference to resource")
 
     def __len__(self):
-        self.__prepare_values()
-        return list.__len__(self)
+        if self.__windowed():
+            if self.__count is None:
+                self.__count = self.__window.count()
+            return self.__count
+
+        # The rdf values are kept in sync with the values
+        self.__prepare_rdf_values()
+        return len(self.__rdf_values)
 
     def __contains__(self, key):
-        # For now, load all values. In future, if the data is not yet loaded,
-        # we can optimize and do ASK query here. 
-        self.__prepare_values()
+        if self.__windowed():
+            return self.__window.contains(self.to_rdf(key))
+
+        self.__prepare_rdf_values()
         return self.to_rdf(key) in self.__rdf_values 
 
     def __getitem__(self, key):
+        if self.__windowed() and isinstance(key, (int, long)) and key >= 0:
+            size = self.__window.size
+            values = self.__get_window(key - key % size)
+            if key % size >= len(values):
+                raise IndexError('list index out of range')
+            return values[key % size]
+
         self.__prepare_values()
         return list.__getitem__(self, key)
 
+    def __getslice__(self, i, j):
+        if self.__windowed():
+            if j == sys.maxint:
+                return list(self.__iter_windows(i))
+            return list(self.__iter_windows(i, j)) if j > i else []
+
+        self.__prepare_values()
+        return list.__getslice__(self, i, j)
+
+    def __eq__(self, other):
+        self.__prepare_values()
+        return list.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
     def __setitem__(self, key, value):
         self.__prepare_values()
 
@@ -173,6 +293,9 @@ class LazyResourceLoader(list):
         return list.pop(self, i)
 
     def __iter__(self):
+        if self.__windowed():
+            return self.__iter_windows()
+
         self.__prepare_values()
         return list.__iter__(self)
 
@@ -223,6 +346,12 @@ class LazyResourceLoader(list):
         '''
         return self.__query_attribute().desc()
 
+    def after(self, last, value = None):
+        ''' get the `after` `query` attribute. Syntactic sugar
+        for :meth:`surf.resource.Resource.query_attribute` method.
+        '''
+        return self.__query_attribute().after(last, value)
+
     def get_by(self, **kwargs):
         ''' get the `get_by` `query` attribute. Syntactic sugar
         for :meth:`surf.resource.Resource.query_attribute` method.
@@ -1,10 +1,29 @@
 """ Module for ResultProxy. """
 
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from rdflib.util import from_n3
+
 from surf.exceptions import NoResultFound, MultipleResultsFound
-from surf.rdf import Literal
+from surf.rdf import BNode, Literal, URIRef
+from surf.serializer import serialize_triples
 from surf.util import attr2rdf, value_to_rdf
 
 
+def _encode_page_token(subject, value):
+    terms = [subject.n3(), value.n3() if value is not None else None]
+    return urlsafe_b64encode(json.dumps(terms))
+
+
+def _decode_page_token(token):
+    try:
+        subject, value = json.loads(urlsafe_b64decode(str(token)))
+        return from_n3(subject), from_n3(value) if value is not None else None
+    except Exception:
+        raise ValueError('Invalid page token: %r' % token)
+
+
 class ResultProxy(object):
     """ Interface to :meth:`surf.store.Store.get_by`.
 
@@ -89,6 +108,24 @@ class ResultProxy(object):
         params['direct_only']   = direct_only
         return ResultProxy(params)
 
+    def only(self, *attributes):
+        """ Load only the given attributes of the resources.
+
+        The values of the ``attributes`` of all the resources are loaded
+        together with the resources, in one request. Other attributes are
+        loaded lazily when accessed. For example, listing names and
+        mailboxes of persons::
+
+            FoafPerson = session.get_class(surf.ns.FOAF.Person)
+            for person in FoafPerson.all().only("foaf_name", "foaf_mbox"):
+                print person.foaf_name.first, person.foaf_mbox.first
+
+        """
+
+        params = self._params.copy()
+        params["only"] = [attr2rdf(attribute) for attribute in attributes]
+        return ResultProxy(params)
+
     def order(self, value = True):
         """ Request results to be ordered.
 
@@ -117,6 +154,56 @@ class ResultProxy(object):
         params["desc"] = True
         return ResultProxy(params)
 
+    def after(self, last, value = None):
+        """ Continue after the resource ``last`` of the previous page.
+
+        Unlike :meth:`offset`, the store does not scan and discard the
+        resources of the previous pages, the resources following ``last``
+        are selected by their position in the order of the collection, so
+        every page costs the same. The pages must therefore be ordered with
+        :meth:`order`, the first one included.
+
+        ``last`` is a resource, its subject, or a token returned by
+        :meth:`page_token`. When the resources are ordered by an attribute
+        and ``last`` is a subject, ``value`` is the value of that attribute.
+        Paging through persons by surname::
+
+            people = FoafPerson.all().order(surf.ns.FOAF.surname).limit(20)
+            page = list(people)
+            next_page = list(people.after(page[-1]))
+
+        """
+
+        params = self._params.copy()
+        if isinstance(last, (str, unicode)) and not isinstance(last, (URIRef, BNode)):
+            last, value = _decode_page_token(last)
+        params["after"] = (last, value)
+        return ResultProxy(params)
+
+    def page_token(self, last, value = None):
+        """ Return an opaque token for the page following the resource
+        ``last``, to pass to :meth:`after`.
+
+        ``last`` and ``value`` are as in :meth:`after`.
+
+        """
+
+        return _encode_page_token(*self.__after(last, value))
+
+    def __after(self, last, value):
+        if not hasattr(last, "subject"):
+            return last, value
+
+        order = self._params.get("order", True)
+        if order is True:
+            return last.subject, None
+
+        # The resource is ordered by its first value
+        values = [last.to_rdf(item) for item in last[order]]
+        if not values:
+            return last.subject, None
+        return last.subject, max(values) if self._params.get("desc") else min(values)
+
     def get_by(self, **kwargs):
         """ Add filter conditions.
 
@@ -203,14 +290,97 @@ class ResultProxy(object):
         params["context"] = context
         return ResultProxy(params)
 
+    def aggregate(self, group_by = None, **aggregates):
+        """ Compute aggregates over the resources in this collection.
+
+        The aggregation runs in the triple store, only one row per group
+        is returned. Keyword arguments map an aggregate function (`count`,
+        `sum`, `min`, `max`, `avg`, `sample`, `group_concat`) to the
+        attribute (or a list of attributes) to aggregate, `True` aggregates
+        the resources themselves. ``group_by`` is an attribute or a list of
+        attributes whose values group the resources. For example, counting
+        persons and the persons they know by type::
+
+            FoafPerson = session.get_class(surf.ns.FOAF.Person)
+            for row in FoafPerson.all().aggregate(count = [True, "foaf_knows"],
+                                                  group_by = "rdf_type"):
+                print row["rdf_type"], row["count"], row["count_foaf_knows"]
+
+        Each row is a dictionary keyed by the grouping attribute names and
+        by `function_attribute` (or just `function` for the resources),
+        literal values are converted to Python values.
+
+        Each resource and each value of the aggregated attributes is counted
+        once, whatever the other aggregated attributes and the `get_by`
+        values. The resources themselves (``True``) can only be counted,
+        sampled or concatenated.
+
+        """
+
+        names, functions = [], []
+        for function, attributes in sorted(aggregates.items()):
+            if not isinstance(attributes, (list, tuple)):
+                attributes = [attributes]
+            for attribute in attributes:
+                if attribute is True:
+                    names.append(function)
+                    functions.append((function, None, True))
+                else:
+                    names.append("%s_%s" % (function, attribute))
+                    functions.append((function, ) + attr2rdf(attribute))
+
+        if group_by is None:
+            group_by = []
+        elif not isinstance(group_by, (list, tuple)):
+            group_by = [group_by]
+        names = list(group_by) + names
+
+        store = self._params['store']
+        rows = store.aggregate(self.__get_by_params(), functions,
+                               [attr2rdf(attribute) for attribute in group_by])
+        return [dict(zip(names, [self.__to_python(value) for value in row]))
+                for row in rows]
+
+    @staticmethod
+    def __to_python(value):
+        if isinstance(value, Literal):
+            return value.toPython()
+        return value
+
+    def export(self, fp, format = 'json', direct_only = True, page_size = None):
+        """ Write the statements of all resources in this collection to the
+        file-like object ``fp``.
+
+        The resources are selected from the store in pages of ``page_size``,
+        each page following the last resource of the previous one, and their
+        statements are streamed straight into the serialization, no
+        resources are created. ``format`` is one of the streaming formats of
+        :mod:`surf.serializer`: *json* (rdf-json, which gathers the statements
+        by subject before writing them), *json-ld* or *nt*. The inverse
+        statements are exported as well if ``direct_only`` is `False`.
+        The statements of blank node resources can't be selected by subject
+        and are left out.
+
+        """
+
+        store = self._params['store']
+        statements = store.export(self.__get_by_params(), direct_only = direct_only,
+                                  page_size = page_size)
+        serialize_triples(statements, fp, format = format)
+
+    def __get_by_params(self):
+        params = {}
+        for key in ['limit', 'offset', 'full', 'only', 'order', 'desc', 'get_by',
+                    'direct_only', 'context', 'filter']:
+            if key in self._params:
+                params[key] = self._params[key]
+        if 'after' in self._params:
+            params['after'] = self.__after(*self._params['after'])
+        return params
+
     def __execute_get_by(self):
         if self._get_by_response is None:
-            self.__get_by_args = {}
-
-            for key in ['limit', 'offset', 'full', 'order', 'desc', 'get_by',
-                        'direct_only', 'context', 'filter']:
-                if key in self._params:
-                    self.__get_by_args[key] = self._params[key]
+            self.__get_by_args = self.__get_by_params()
 
             store = self._params['store']
             self._get_by_response = store.get_by(self.__get_by_args)
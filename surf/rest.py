@@ -34,8 +34,12 @@
 
 # -*- coding: utf-8 -*-
 import inspect
+from hashlib import sha1
+
+from surf.namespace import DCTERMS
 from surf.rdf import Namespace
 from surf.resource import Resource
+from surf.util import attr2rdf
 
 __author__ = 'Cosmin Basca'
 
@@ -66,14 +70,35 @@ class Rest(object):
 
         self._namespace = resources_namespace
 
-    def index(self):
+    def index(self, limit=None, offset=None, page_token=None, fields=None):
         """
         **REST** : GET /: All items in the collection,
 
+        When a ``limit`` is given, the collection is ordered by subject and
+        paged, either with an ``offset`` or with a ``page_token`` returned by
+        :meth:`surf.resource.result_proxy.ResultProxy.page_token` for the
+        last instance of the previous page. The ``page_token`` pages cost the
+        same however deep they are.
+
+        :param int limit: the maximum number of instances
+        :param int offset: the number of instances to skip
+        :param str page_token: the token of the page to return
+        :param list fields: the names of the attributes to load with the instances, the others are loaded lazily
         :return: all instances for the current :class:`surf.resources.Resource`
         :rtype: list or :class:`surf.resources.ResultProxy`
         """
-        return self._Resource.all()
+        instances = self._Resource.all()
+        if limit is not None or offset is not None or page_token is not None:
+            instances = instances.order()
+        if limit is not None:
+            instances = instances.limit(limit)
+        if offset is not None:
+            instances = instances.offset(offset)
+        if page_token is not None:
+            instances = instances.after(page_token)
+        if fields:
+            instances = instances.only(*fields)
+        return instances
 
     def create(self, json_params):
         """
@@ -129,19 +154,72 @@ class Rest(object):
         instance = self._Resource(self._namespace[id])
         instance.remove()
 
-    def show(self, id):
+    def show(self, id, fields=None, direct_only=False, if_none_match=None):
         """
         **REST** : GET /id: Show a specific item.
         show / retrieve the specified resource
 
+        If ``if_none_match`` is the current :meth:`etag` of the resource, it
+        is not loaded and `None` is returned, the client copy is up to date.
+
         :param str id: the resources id
-        :return: the resource
+        :param list fields: the names of the attributes to load, all the attributes are loaded by default
+        :param bool direct_only: whether to leave out the inverse attributes
+        :param str if_none_match: the *ETag* of the client copy of the resource
+        :return: the resource, or `None` if it has not been modified
         :rtype: :class:`surf.resources.Resource`
         """
-        instance = self._Resource(self._namespace[id])
-        instance.load()
+        if if_none_match is not None and if_none_match == self.etag(id, fields, direct_only):
+            return None
+
+        if fields:
+            instance = self._Resource(self._namespace[id], block_auto_load=True)
+            for attr_name in fields:
+                # Accessing the attribute loads it
+                getattr(instance, attr_name).first
+        else:
+            instance = self._Resource(self._namespace[id])
+            instance.load(direct_only=direct_only)
         return instance
 
+    def etag(self, id, fields=None, direct_only=False):
+        """
+        Return the *ETag* of the representation of a resource, a hash of
+        its statements. The statements are read from the store in one
+        request, no resource attributes are created.
+
+        :param str id: the resources id
+        :param list fields: the names of the represented attributes, all the attributes by default
+        :param bool direct_only: whether the inverse attributes are left out of the representation
+        :return: the quoted *ETag*, `None` if the resource does not exist
+        :rtype: str
+        """
+        instance = self._Resource(self._namespace[id], block_auto_load=True)
+        store = instance.session[instance.store_key]
+        if not store.is_present(instance):
+            return None
+
+        attributes = [attr2rdf(attr_name) for attr_name in fields] if fields else None
+        lines = [u'%s %s %s .' % (s.n3(), p.n3(), o.n3())
+                 for s, p, o in store.statements(instance, attributes, direct_only)]
+
+        digest = sha1(u'\n'.join(sorted(lines)).encode('utf-8')).hexdigest()
+        return '"%s"' % digest
+
+    def last_modified(self, id):
+        """
+        Return the *Last-Modified* date of a resource, the value of its
+        `dcterms:modified` attribute, or `None` if it doesn't have one.
+
+        :param str id: the resources id
+        :return: the last modification date
+        :rtype: :class:`datetime.datetime`
+        """
+        instance = self._Resource(self._namespace[id], block_auto_load=True)
+        store = instance.session[instance.store_key]
+        values = [value.toPython() for value in store.get(instance, DCTERMS['modified'], True)]
+        return max(values) if values else None
+
     @classmethod
     def resource(cls, session, resources_namespace, concept_class, id):
         """
@@ -36,12 +36,71 @@
 
 __author__ = 'Cosmin Basca'
 
+from collections import OrderedDict
+
 try:
     from json import dumps
 except ImportError, e:
     from simplejson import dumps
 from surf.rdf import BNode, Literal, URIRef
 
+VALUE_TYPES = {
+    URIRef: 'uri',
+    Literal: 'literal',
+    BNode: 'bnode'
+}
+
+
+def _json_value(value):
+    json_value = {'value': value, 'type': VALUE_TYPES[type(value)]}
+    if type(value) is Literal and value.language:
+        json_value['lang'] = unicode(value.language)
+    if type(value) is Literal and value.datatype:
+        json_value['datatype'] = unicode(value.datatype)
+    return json_value
+
+
+def _json_ld_value(value):
+    if type(value) is URIRef:
+        return {'@id': unicode(value)}
+    elif type(value) is BNode:
+        return {'@id': u'_:%s' % value}
+
+    json_value = {'@value': unicode(value)}
+    if value.language:
+        json_value['@language'] = unicode(value.language)
+    elif value.datatype:
+        json_value['@type'] = unicode(value.datatype)
+    return json_value
+
+
+def _subject_groups(triples, merge=False):
+    """
+    groups consecutive triples sharing the same subject, yields
+    `(subject, {predicate: [values]})` pairs, predicates keep their order
+
+    with `merge` set, all the triples of a subject form one group, the groups
+    are only yielded once all the triples are read
+    """
+    if merge:
+        groups = OrderedDict()
+        for s, p, o in triples:
+            groups.setdefault(s, OrderedDict()).setdefault(p, []).append(o)
+        for group in groups.iteritems():
+            yield group
+        return
+
+    subject, predicates = None, None
+    for s, p, o in triples:
+        if s != subject or predicates is None:
+            if predicates is not None:
+                yield subject, predicates
+            subject, predicates = s, OrderedDict()
+        predicates.setdefault(p, []).append(o)
+
+    if predicates is not None:
+        yield subject, predicates
+
 
 def to_json(graph):
     """
@@ -53,39 +112,89 @@ def to_json(graph):
     :return: a *JSON* serialization of the graph
     :rtype: str
     """
-    value_types = {
-        URIRef: 'uri',
-        Literal: 'literal',
-        BNode: 'bnode'
-    }
-
     json_root = {}
-    subjects = []
-    # group subjects
-    for s in graph.subjects():
-        if s not in subjects:
-            subjects.append(s)
-
-    for s in subjects:
-        json_subjects = {}
-        predicates = []
-        # group predicates
-        for p in graph.predicates(s):
-            if p not in predicates:
-                predicates.append(p)
-
-        for p in predicates:
-            json_values = []
-
-            for v in graph.objects(s,p):
-                value = {'value': v, 'type': value_types[type(v)]}
-                if type(v) is Literal and v.language:
-                    value['lang'] = unicode(v.language)
-                if type(v) is Literal and v.datatype:
-                    value['datatype'] = unicode(v.datatype)
-
-                json_values.append(value)
-            json_subjects[unicode(p)] = json_values
-        json_root[unicode(s)] = json_subjects
+    for s, p, o in graph:
+        json_values = json_root.setdefault(unicode(s), {}).setdefault(unicode(p), [])
+        json_values.append(_json_value(o))
 
     return dumps(json_root)
+
+
+def write_json(triples, fp):
+    """
+    writes the `triples` to the file-like object `fp` as *rdf-json*, one subject
+    at a time
+
+    *rdf-json* holds each subject once, the triples are therefore gathered by
+    subject before they are written, use *json-ld* or *nt* to write large
+    sets of triples without holding them in memory
+    """
+    fp.write('{')
+    separator = ''
+    for s, predicates in _subject_groups(triples, merge=True):
+        json_subject = dict((unicode(p), [_json_value(o) for o in objs]) for p, objs in predicates.iteritems())
+        fp.write('%s%s: %s' % (separator, dumps(unicode(s)), dumps(json_subject)))
+        separator = ', '
+    fp.write('}')
+
+
+def write_json_ld(triples, fp):
+    """
+    writes the `triples` to the file-like object `fp` as expanded *JSON-LD*, one
+    node object for every run of triples sharing the same subject
+    """
+    fp.write('[')
+    separator = ''
+    for s, predicates in _subject_groups(triples):
+        node = {'@id': unicode(s) if type(s) is not BNode else u'_:%s' % s}
+        for p, objs in predicates.iteritems():
+            node[unicode(p)] = [_json_ld_value(o) for o in objs]
+        fp.write(separator + dumps(node))
+        separator = ', '
+    fp.write(']')
+
+
+def write_ntriples(triples, fp):
+    """
+    writes the `triples` to the file-like object `fp` as utf-8 encoded *N-Triples*
+    """
+    for s, p, o in triples:
+        fp.write((u'%s %s %s .\n' % (s.n3(), p.n3(), o.n3())).encode('utf-8'))
+
+
+WRITERS = {
+    'json': write_json,
+    'json-ld': write_json_ld,
+    'nt': write_ntriples,
+}
+
+
+def serialize_triples(triples, fp, format='json'):
+    """
+    streams the `triples` to the file-like object `fp` in one of the formats
+    in :data:`WRITERS`, no intermediate graph is built
+
+    :param triples: an iterable of `(s, p, o)` tuples
+    :param fp: a file-like object
+    :param str format: one of *json* (rdf-json), *json-ld* or *nt*
+    """
+    try:
+        writer = WRITERS[format]
+    except KeyError:
+        raise ValueError('Unsupported streaming serialization format: %s' % format)
+    writer(triples, fp)
+
+
+def serialize_resources(resources, fp, format='json', direct=True):
+    """
+    streams the triples of every resource (any iterable of resources, like a
+    :class:`surf.resource.result_proxy.ResultProxy`) to the file-like object `fp`
+
+    with `direct` set to False the inverse triples are written as well
+    """
+    def triples():
+        for resource in resources:
+            for triple in resource.triples(direct=direct):
+                yield triple
+
+    serialize_triples(triples(), fp, format=format)
@@ -35,8 +35,9 @@
 # -*- coding: utf-8 -*-
 __author__ = 'Cosmin Basca'
 
+from surf.persist import WriteBehind
 from surf.rdf import BNode, URIRef
-from surf.resource import Resource
+from surf.resource import Resource, RDF_TYPE
 from surf.store import Store, NO_CONTEXT
 from surf.util import DE_CAMEL_CASE_DEFAULT
 from surf.util import attr2rdf, de_camel_case, is_uri, uri_to_classname
@@ -68,7 +69,8 @@ class Session(object):
     """
 
     # TODO: add cache
-    def __init__(self, default_store=None, mapping=None, auto_persist=False, auto_load=False):
+    def __init__(self, default_store=None, mapping=None, auto_persist=False, auto_load=False,
+                 window_size=None):
         """ Create a new `session` object that handles the creation of types
         and instances, also the session binds itself to the `Resource` objects
         to allow the Resources to access the data `store` and perform
@@ -83,8 +85,10 @@ class Session(object):
             mapping = {}
         self.mapping = mapping
 
-        self._auto_persist = auto_persist
+        self._write_behind = None
+        self.auto_persist = auto_persist
         self._auto_load = auto_load
+        self._window_size = window_size
         self._stores = {}
 
         if default_store is not None:
@@ -134,14 +138,37 @@ class Session(object):
         Toggle `auto_persistence` (no need to explicitly call `commit`,
         `resources` are persisted to the `store` each time a modification occurs)
         on or off. Accepts boolean values.
+
+        The modified `resources` are written in the background by the
+        :attr:`write_behind` queue, :meth:`flush` waits until they are
+        written. Turning `auto_persist` off writes the queued `resources`.
         """
-        return self._auto_persist
+        return self._write_behind is not None
 
     @auto_persist.setter
     def auto_persist(self, val):
-        if not isinstance(val, bool):
-            val = False
-        self._auto_persist = val
+        if val is True and self._write_behind is None:
+            self._write_behind = WriteBehind(self)
+        elif val is not True and self._write_behind is not None:
+            write_behind, self._write_behind = self._write_behind, None
+            write_behind.close()
+
+    @property
+    def write_behind(self):
+        """
+        The :class:`surf.persist.WriteBehind` queue writing the modified
+        `resources` when :attr:`auto_persist` is on, `None` otherwise. Its
+        `batch_size`, `delay`, `max_pending` and `on_error` attributes can
+        be changed.
+        """
+        return self._write_behind
+
+    def flush(self):
+        """ Write the `resources` queued by :attr:`auto_persist`, return once
+        they are written. """
+
+        if self._write_behind is not None:
+            self._write_behind.flush()
 
     @property
     def auto_load(self):
@@ -158,6 +185,23 @@ class Session(object):
             val = False
         self._auto_load = val
 
+    @property
+    def window_size(self):
+        """
+        The number of values fetched at a time when the values of an
+        attribute that is not loaded are accessed: indexing, slicing, `first`
+        and iteration fetch only the needed windows, `len` and `in` query
+        the `store`. When `None` (the default) all the values are fetched
+        on the first access.
+        """
+        return self._window_size
+
+    @window_size.setter
+    def window_size(self, val):
+        if not isinstance(val, (int, long)) or val <= 0:
+            val = None
+        self._window_size = val
+
     @property
     def log_level(self):
         return dict((sid, store.log_level) for sid, store in self._stores.iteritems())
@@ -236,6 +280,7 @@ class Session(object):
 
         """
 
+        self.auto_persist = False
         for store in self._stores.keys():
             self._stores[store].close()
             del self._stores[store]
@@ -324,6 +369,52 @@ class Session(object):
 
         return resource
 
+    def get_resources(self, subjects, concept=None, full=True, direct_only=False,
+                      store=None, context=None):
+        """ Return the resources with the given `subjects`, in the same order.
+
+        The types, and with ``full`` the attributes (only the direct ones if
+        ``direct_only`` is set) of all the resources are loaded together, in
+        a few requests to the `store`. When ``concept`` is not given, the
+        resources are instances of their first type in sorted order, or `None`
+        if they don't have any.
+
+        """
+
+        store = store if store else self.default_store_key
+        subjects = [subject if type(subject) in [URIRef, BNode] else URIRef(unicode(subject))
+                    for subject in subjects]
+
+        data = {}
+        if full or concept is None:
+            params = {"subjects": subjects, "context": context}
+            if full:
+                params["full"] = True
+                params["direct_only"] = direct_only
+            data = dict(self[store].get_by(params))
+
+        classes = {}
+        resources = []
+        for subject in subjects:
+            instance_data = data.get(subject, {})
+            uri = concept
+            if uri is None:
+                types = instance_data.get("direct", {}).get(RDF_TYPE)
+                if not types:
+                    resources.append(None)
+                    continue
+                # the same class whatever the order the store returns the types in
+                uri = min(types)
+
+            if uri not in classes:
+                classes[uri] = self.map_type(uri, store=store)
+            resource = self.map_instance(classes[uri], subject, store=store,
+                                         block_auto_load=True, context=context)
+            resource._hydrate(instance_data, full=full, direct_only=direct_only)
+            resources.append(resource)
+
+        return resources
+
     def load_resource(self, uri, subject, store=None, data=None,
                       file=None, location=None, format=None, classes=None):
         """ Create an `instance` of the `class` specified by `uri`, while
@@ -352,6 +443,7 @@ class Session(object):
         """ Commits all changes. In essence the method updates all the `dirty`
         registered `resources`. """
 
+        self.flush()
         # Copy set into list because it will shrink as we go through it
         for resource in list(Resource.get_dirty_instances()):
             resource.update()
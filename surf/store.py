@@ -33,11 +33,16 @@
 # OF THE POSSIBILITY OF SUCH DAMAGE.
 
 # -*- coding: utf-8 -*-
+import threading
+from collections import OrderedDict
+
+from surf.loader import BulkLoader
+from surf.persist import WriteBatch
 from surf.log import *
 from surf.plugin.manager import load_plugins, get_reader, get_writer
 from surf.plugin.reader import RDFReader, NoneReader
 from surf.plugin.writer import RDFWriter, NoneWriter
-from surf.query import Query
+from surf.query import BoundQuery, PreparedQuery, Query
 from surf.rdf import URIRef
 
 __author__ = 'Cosmin Basca'
@@ -47,6 +52,9 @@ __author__ = 'Cosmin Basca'
 # this explicitly says that no context should be used.
 NO_CONTEXT = "no-context"
 
+# the number of prepared queries kept by a store
+PREPARED_QUERIES_CACHE_SIZE = 256
+
 
 class Store(object):
     """ The `Store` class is comprised of a reader and a writer, getting
@@ -82,6 +90,11 @@ class Store(object):
         else:
             self.writer = NoneWriter(self.reader, *args, **kwargs)
 
+        # queries executed with parameters, prepared once per store and
+        # keyed by their translation
+        self.__prepared = OrderedDict()
+        self.__prepared_lock = threading.Lock()
+
         if hasattr(self.reader, 'use_subqueries'):
             self.use_subqueries = property(fget=lambda self: self.reader.use_subqueries)
 
@@ -117,10 +130,20 @@ class Store(object):
         except Exception, e:
             error("Error on closing the writer: %s", e.message)
 
-    def get(self, resource, attribute, direct):
+    def get(self, resource, attribute, direct, limit=None, offset=None):
         """ :func:`surf.plugin.reader.RDFReader.get` method. """
 
-        return self.reader.get(resource, attribute, direct)
+        return self.reader.get(resource, attribute, direct, limit=limit, offset=offset)
+
+    def count(self, resource, attribute, direct):
+        """ :func:`surf.plugin.reader.RDFReader.count` method. """
+
+        return self.reader.count(resource, attribute, direct)
+
+    def has_value(self, resource, attribute, value, direct):
+        """ :func:`surf.plugin.reader.RDFReader.has_value` method. """
+
+        return self.reader.has_value(resource, attribute, value, direct)
 
     # cRud
     def load(self, resource, direct):
@@ -128,11 +151,27 @@ class Store(object):
 
         return self.reader.load(resource, direct)
 
+    def statements(self, resource, attributes=None, direct_only=False):
+        """ :func:`surf.plugin.reader.RDFReader.statements` method. """
+
+        return self.reader.statements(resource, attributes, direct_only)
+
+    def summary(self, resource, direct):
+        """ :func:`surf.plugin.reader.RDFReader.summary` method. """
+
+        return self.reader.summary(resource, direct)
+
     def is_present(self, resource):
         """ :func:`surf.plugin.reader.RDFReader.is_present` method. """
 
         return self.reader.is_present(resource)
 
+    def are_present(self, resources, context=None):
+        """ :func:`surf.plugin.reader.RDFReader.are_present` method. """
+
+        context = self.__add_default_context(context)
+        return self.reader.are_present(resources, context)
+
     def concept(self, resource):
         """ :func:`surf.plugin.reader.RDFReader.concept` method. """
 
@@ -149,10 +188,64 @@ class Store(object):
         params["context"] = self.__add_default_context(params.get("context"))
         return self.reader.get_by(params)
 
-    def execute(self, query):
-        """see :meth:`surf.plugin.query_reader.RDFQueryReader.execute` method. """
+    def aggregate(self, params, aggregates, group_by=()):
+        """ :func:`surf.plugin.reader.RDFReader.aggregate` method. """
+
+        params["context"] = self.__add_default_context(params.get("context"))
+        return self.reader.aggregate(params, aggregates, group_by)
+
+    def export(self, params, direct_only=True, page_size=None):
+        """ :func:`surf.plugin.reader.RDFReader.export` method. """
+
+        params["context"] = self.__add_default_context(params.get("context"))
+        return self.reader.export(params, direct_only=direct_only, page_size=page_size)
+
+    def prepare(self, query):
+        """ Return the :class:`surf.query.PreparedQuery` for ``query``.
+
+        The prepared queries are cached by their translation, the most
+        recently used :data:`PREPARED_QUERIES_CACHE_SIZE` ones are kept, so a
+        query changed after it was executed is prepared again.
+
+        """
 
-        if hasattr(self.reader, 'execute') and isinstance(query, Query):
+        key = unicode(query)
+        with self.__prepared_lock:
+            prepared = self.__prepared.pop(key, None)
+        if prepared is None:
+            prepared = query.prepare()
+        with self.__prepared_lock:
+            self.__prepared[key] = prepared
+            while len(self.__prepared) > PREPARED_QUERIES_CACHE_SIZE:
+                self.__prepared.popitem(last=False)
+        return prepared
+
+    def execute(self, query, **bindings):
+        """see :meth:`surf.plugin.query_reader.RDFQueryReader.execute` method.
+
+        ``query`` can also be a :class:`surf.query.PreparedQuery`, or a query
+        with :func:`surf.query.param` placeholders, the placeholders are bound
+        to the ``bindings`` keyword arguments::
+
+            query = select("?name").where((param("s"), ns.FOAF.name, "?name"))
+            store.execute(query, s = URIRef("http://example.com/john"))
+
+        A `ValueError` listing the parameters is raised when some of them are
+        not bound.
+
+        """
+
+        if not hasattr(self.reader, 'execute'):
+            return None
+
+        if isinstance(query, Query) and not isinstance(query, BoundQuery):
+            # queries without bindings are translated once here instead of by
+            # the reader, and checked for placeholders left unbound
+            query = self.prepare(query) if bindings else query.prepare()
+        if isinstance(query, PreparedQuery):
+            query = query.bind(**bindings)
+
+        if isinstance(query, Query):
             return self.reader.execute(query)
 
         return None
@@ -177,6 +270,9 @@ class Store(object):
         self.writer.save(*resources)
 
         for resource in resources:
+            # the direct values written are all the ones in the store
+            if hasattr(resource, "_set_stored"):
+                resource._set_stored(full=True)
             resource.dirty = False
 
     # crUd
@@ -186,6 +282,8 @@ class Store(object):
         self.writer.update(*resources)
 
         for resource in resources:
+            if hasattr(resource, "_set_stored"):
+                resource._set_stored()
             resource.dirty = False
 
     # cruD
@@ -221,6 +319,22 @@ class Store(object):
         context = self.__add_default_context(context)
         self.writer.remove_triple(s = s, p = p, o = o, context = context)
 
+    def batch(self):
+        """ Return a :class:`surf.persist.WriteBatch` recording the triples
+        added, set and removed with its `add_triple`, `set_triple` and
+        `remove_triple` methods, written at once when it is flushed or when
+        the `with` block using it ends without an exception::
+
+            with store.batch() as batch:
+                for s, o in pairs:
+                    batch.set_triple(s, FOAF.knows, o)
+
+        See :func:`surf.plugin.writer.RDFWriter.write_batch` method.
+
+        """
+
+        return WriteBatch(self.writer, self.__add_default_context)
+
     def index_triples(self, **kwargs):
         """ See :func:`surf.plugin.writer.RDFWriter.index_triples` method. """
 
@@ -232,5 +346,25 @@ class Store(object):
         context = self.__add_default_context(context)
         return self.writer.load_triples(context=context, **kwargs)
 
+    def bulk_load(self, source, context=None, batch_size=None, workers=1, checkpoint=None):
+        """ Stream the `N-Triples` or `N-Quads` from ``source`` (a file name or
+        a file-like object, possibly gzip compressed) into the `store`.
+
+        Statements are sent in batches of ``batch_size``, by default the
+        writer's :attr:`surf.plugin.writer.RDFWriter.batch_size`, using up to
+        ``workers`` concurrent requests. Triples without a context are added
+        to ``context``. If a ``checkpoint`` file name is given, a failed load
+        resumes where the previous one stopped.
+
+        Return the number of statements loaded.
+        See :class:`surf.loader.BulkLoader`.
+
+        """
+
+        context = self.__add_default_context(context)
+        loader = BulkLoader(self.writer, batch_size=batch_size, workers=workers,
+                            checkpoint=checkpoint, context=context)
+        return loader.load(source)
+
     def __len__(self):
         return self.size()
@@ -0,0 +1,18 @@
+# coding=UTF-8
+import pytest
+
+
+@pytest.fixture
+def record_queries(monkeypatch):
+    """
+    Return a function recording the queries executed by the reader of a
+    store in the list it returns, the reader is restored after the test.
+    """
+
+    def record(store):
+        queries = []
+        execute = store.reader._execute
+        monkeypatch.setattr(store.reader, "_execute", lambda query: queries.append(query) or execute(query))
+        return queries
+
+    return record
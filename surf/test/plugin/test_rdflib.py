@@ -1,7 +1,7 @@
 import pytest
 import surf
 import os
-from rdflib.term import Literal
+from rdflib.term import Literal, URIRef
 
 _card_file = os.path.join(os.path.split(os.path.abspath(__file__))[0], 'card.rdf')
 
@@ -48,3 +48,20 @@ def test_rdflib_query():
 
     assert len(all_persons) == 1
     assert all_persons.one().foaf_name.first == Literal(u'Timothy Berners-Lee')
+
+
+def test_rdflib_get_by_alternatives():
+    """
+    Test get_by with several alternative values.
+    """
+
+    store = surf.Store(reader="rdflib", writer="rdflib")
+    session = surf.Session(store)
+    Person = session.get_class(surf.ns.FOAF.Person)
+    for name in ["John", "Jane", "Joe"]:
+        person = Person("http://%s" % name)
+        person.foaf_name = name
+    session.commit()
+
+    people = Person.get_by(foaf_name=["John", "Joe"]).order()
+    assert [person.subject for person in people] == [URIRef("http://Joe"), URIRef("http://John")]
@@ -6,6 +6,7 @@ from surf.rdf import Literal, URIRef
 from surf.exceptions import CardinalityException
 from surf.plugin.sparql_protocol.reader import SparqlReaderException
 from surf.plugin.sparql_protocol.writer import SparqlWriterException
+from surf.plugin.sparql_protocol.writer import _prepare_batch_queries, _prepare_delete_many_query, _prepare_update_queries
 
 
 @pytest.fixture
@@ -69,3 +70,138 @@ def test_exceptions():
 
     with pytest.raises(SparqlWriterException):
         try_add_triple()
+
+
+def test_delete_queries_use_values():
+    """
+    Test that the delete queries bind the subjects as inline data.
+    """
+
+    class MockResource(object):
+        def __init__(self, subject):
+            self.subject = URIRef(subject)
+            self.rdf_direct = {URIRef("http://p"): []}
+
+    resources = [MockResource("http://a"), MockResource("http://b")]
+
+    query = unicode(_prepare_delete_many_query(resources, URIRef("http://g"), inverse=True))
+    assert "VALUES ?s { <http://a> <http://b> }" in query
+    assert "VALUES ?o { <http://a> <http://b> }" in query
+    assert "FILTER" not in query
+
+    # resources that don't track their changes have their attributes replaced
+    query = unicode(_prepare_update_queries(resources)[0])
+    assert "VALUES (?s ?p) { (<http://a> <http://p>) (<http://b> <http://p>) }" in query
+
+
+def test_update_queries_write_changes():
+    """
+    Test that updating a resource only writes the changed statements.
+    """
+
+    store = surf.Store(reader="rdflib", writer="rdflib")
+    session = surf.Session(store)
+    Person = session.get_class(surf.ns.FOAF.Person)
+    person = Person("http://a")
+    person.foaf_name = ["John", "Johnny"]
+    person.foaf_age = 30
+    person.save()
+
+    person.foaf_name.remove(Literal("Johnny"))
+    person.foaf_nick = "J"
+    # after a save, the attributes not saved have no values in the store
+    queries = [unicode(query) for query in _prepare_update_queries([person])]
+    assert len(queries) == 2
+    assert queries[0].startswith("DELETE DATA")
+    assert '"Johnny"' in queries[0] and '"John"' not in queries[0]
+    assert queries[1].startswith("INSERT DATA")
+    assert '"J"' in queries[1] and "age" not in queries[1]
+    session.commit()
+
+
+def test_batch_queries():
+    """
+    Test the queries writing a batch of removed and added statements.
+    """
+
+    a, knows, name = URIRef("http://a"), surf.ns.FOAF.knows, surf.ns.FOAF.name
+    removed = [(a, knows, None), (None, knows, a), (a, name, Literal("A"))]
+    added = [(a, knows, URIRef("http://b")), (a, name, Literal("B"))]
+    queries = [unicode(query) for query in _prepare_batch_queries(removed, added, URIRef("http://g"))]
+    assert len(queries) == 4
+    assert "VALUES (?s ?p) { (<http://a> <http://xmlns.com/foaf/0.1/knows>) }" in queries[0]
+    assert "VALUES (?p ?o) { (<http://xmlns.com/foaf/0.1/knows> <http://a>) }" in queries[1]
+    assert queries[2].startswith("DELETE DATA") and '"A"' in queries[2]
+    assert queries[3].startswith("INSERT DATA") and '"B"' in queries[3] and "<http://b>" in queries[3]
+
+
+def test_update_queries_blank_nodes():
+    """
+    Test that removed statements with blank nodes are deleted by pattern.
+    """
+
+    from surf.rdf import BNode, Graph
+
+    store = surf.Store(reader="rdflib", writer="rdflib")
+    session = surf.Session(store)
+    Person = session.get_class(surf.ns.FOAF.Person)
+    person = Person("http://a")
+    person.foaf_knows = [BNode(), URIRef("http://b")]
+    person.foaf_name = "A"
+    person.save()
+
+    graph = Graph()
+    for statement in store.reader.graph.triples((None, None, None)):
+        graph.add(statement)
+    graph.add((BNode(), surf.ns.FOAF.knows, URIRef("http://a")))
+
+    person.foaf_knows = URIRef("http://c")
+    queries = [unicode(query) for query in _prepare_update_queries([person])]
+    assert not any("_:" in query for query in queries)
+    for query in queries:
+        graph.update(query)
+    assert set(graph.objects(person.subject, surf.ns.FOAF.knows)) == set([URIRef("http://c")])
+    assert len(graph) == 4
+
+    # blank subjects, and wildcards next to blank nodes
+    blank = graph.value(None, surf.ns.FOAF.knows, URIRef("http://a"))
+    queries = [unicode(query) for query in _prepare_batch_queries([(blank, surf.ns.FOAF.knows, None)], [])]
+    assert len(queries) == 1 and "_:" not in queries[0]
+    graph.update(queries[0])
+    assert len(graph) == 3
+    session.commit()
+
+
+def test_write_batch_requests():
+    """
+    Test that each chunk of a batch is written in one request.
+    """
+
+    class MockWrapper(object):
+        def __init__(self):
+            self.queries = []
+
+        def setQuery(self, query):
+            self.queries.append(query)
+
+        def query(self):
+            pass
+
+    store = surf.Store(reader="sparql_protocol", writer="sparql_protocol", endpoint="http://localhost:9980/sparql")
+    store.writer.batch_size = 3
+    store.writer._local.sparql_wrapper = wrapper = MockWrapper()
+
+    a, name = URIRef("http://a"), surf.ns.FOAF.name
+    removed = [(a, name, None, None), (a, name, Literal("A"), None)]
+    added = [(a, name, Literal("B%d" % i), None) for i in range(4)]
+    store.writer.write_batch(removed, added)
+    assert len(wrapper.queries) == 2
+    assert wrapper.queries[0].count(" ;\n") == 2
+    assert "DELETE DATA" in wrapper.queries[0] and '"B0"' in wrapper.queries[0]
+
+    store = surf.Store(reader="sparql_protocol", writer="sparql_protocol", endpoint="http://localhost:9980/sparql",
+                       sparql11_update="false")
+    store.writer.batch_size = 3
+    store.writer._local.sparql_wrapper = wrapper = MockWrapper()
+    store.writer.write_batch(removed, added)
+    assert len(wrapper.queries) == 4
@@ -1,9 +1,9 @@
 import pytest
 import re
 
-from surf.query import select, describe, ask
+from surf.query import select, describe, ask, param, aggregate, Filter
 from surf.query.translator.sparql import SparqlTranslator 
-from surf.rdf import URIRef
+from surf.rdf import Literal, URIRef
 
 
 def canonical(sparql_string):
@@ -200,3 +200,79 @@ def test_ask():
 
     result = canonical(SparqlTranslator(query).translate())
     assert expected == result
+
+
+def test_prepare():
+    """
+    Test binding the parameters of a prepared query.
+    """
+
+    expected = canonical(u"""
+        SELECT ?name WHERE {
+            <http://a> <http://p> ?name .
+            FILTER (?name != "it's \\"quoted\\"")
+        }
+    """)
+
+    query = select("?name").where((param("s"), URIRef("http://p"), "?name"))
+    query.filter(Filter(u"(?name != %s)" % param("exclude")))
+    prepared = query.prepare()
+    assert prepared.parameters == frozenset(["s", "exclude"])
+
+    bound = prepared.bind(s=URIRef("http://a"), exclude='it\'s "quoted"')
+    assert expected == canonical(unicode(bound))
+    assert bound.query_type == query.query_type
+
+    with pytest.raises(ValueError):
+        prepared.bind(s=URIRef("http://a"))
+    with pytest.raises(ValueError):
+        prepared.bind(s=URIRef("http://a"), exclude="x", other="y")
+    with pytest.raises(Exception):
+        # not a valid URI, it can not be injected into the query
+        prepared.bind(s=URIRef("http://a> ?x <http://b"), exclude="x")
+
+
+def test_values():
+    """
+    Test VALUES inline data with one and several variables.
+    """
+
+    expected = canonical(u"""
+        SELECT ?s WHERE {
+            ?s ?p ?o .
+            VALUES ?s { <http://a> <http://b> } .
+            VALUES (?p ?o) { (<http://p> "x") (<http://q> UNDEF) }
+        }
+    """)
+
+    query = select("?s").where(("?s", "?p", "?o"))
+    query.values("?s", [URIRef("http://a"), URIRef("http://b")])
+    query.values(("?p", "?o"), [(URIRef("http://p"), Literal("x")), (URIRef("http://q"), None)])
+
+    result = canonical(SparqlTranslator(query).translate())
+    assert expected == result
+
+    with pytest.raises(ValueError):
+        query.values(("?p", "?o"), [(URIRef("http://p"), )])
+
+
+def test_group_by():
+    """
+    Test aggregate projections with GROUP BY and HAVING.
+    """
+
+    expected = canonical(u"""
+        SELECT ?c (COUNT(DISTINCT ?s) AS ?n) WHERE {
+            ?s <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> ?c
+        } GROUP BY ?c HAVING (COUNT(DISTINCT ?s) > 1) ORDER BY DESC(?n)
+    """)
+
+    query = select("?c", aggregate("count", "?s", "?n", distinct=True))
+    query.where(("?s", URIRef("http://www.w3.org/1999/02/22-rdf-syntax-ns#type"), "?c"))
+    query.group_by("?c").having("(COUNT(DISTINCT ?s) > 1)").order_by("DESC(?n)")
+
+    result = canonical(SparqlTranslator(query).translate())
+    assert expected == result
+
+    with pytest.raises(ValueError):
+        aggregate("median", "?s", "?n")
@@ -0,0 +1,54 @@
+import pytest
+
+from surf.namespace import FOAF
+from surf.query.translator.term import RenderCache, precompute, render
+from surf.rdf import BNode, Literal, RDF, URIRef
+
+
+def test_render_terms():
+    """
+    Test the rendering of every supported term type.
+    """
+
+    assert render(URIRef("http://a/b")) == u"<http://a/b>"
+    assert render(BNode("x")) == u"_:x"
+    assert render(Literal("x", lang="en")) == u'"x"@en'
+    assert render(Literal(1)) == u'"1"^^<http://www.w3.org/2001/XMLSchema#integer>'
+    assert render("?s") == "?s"
+    assert render(u"http://a/b") == u"<http://a/b>"
+    assert render("http://a") == '"http://a"'
+    assert render("text") == '"text"'
+    assert render(("text", "en")) == '"text"@en'
+    assert render(["text", "en"]) == '"text"@en'
+
+
+def test_render_cached_uri():
+    """
+    Test that URIRef renderings are cached and precomputed ones are kept.
+    """
+
+    uri = FOAF["test_render_cached_uri"]
+    assert render(uri) == render(uri) == u"<%s>" % uri
+
+    precompute(FOAF.knows)
+    assert render(FOAF.knows) == u"<http://xmlns.com/foaf/0.1/knows>"
+    assert render(RDF.type) == u"<http://www.w3.org/1999/02/22-rdf-syntax-ns#type>"
+
+
+def test_render_cache_eviction():
+    """
+    Test that the cache is bounded and keeps recently used entries.
+    """
+
+    cache = RenderCache(size=4)
+    cache.set("a", "A")
+    cache.set("b", "B")
+    cache.set("c", "C")
+    # a is promoted, b is the least recently used
+    assert cache.get("a") == "A"
+    cache.set("d", "D")
+    cache.set("e", "E")
+    assert len(cache) <= 4
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.get("e") == "E"
@@ -263,3 +263,169 @@ def test_query_attribute_unicode(store_session):
         # Regardless of results, revert our patch so other tests are not
         # affected.
         RP.get_by = original_get_by
+
+
+def test_update_changes(store_session):
+    """
+    Test that updating a resource writes only the changed statements.
+    """
+
+    store, session = store_session
+    Person = session.get_class(surf.ns.FOAF.Person)
+    person = Person("http://p1")
+    person.foaf_name = ["John", "Johnny"]
+    person.foaf_age = 30
+    person.save()
+    assert person.changes() == ([], [])
+
+    person = Person("http://p1")
+    person.load()
+    person.foaf_name.remove(Literal("Johnny"))
+    person.foaf_nick = "J"
+    removed, added = person.changes()
+    assert removed == [(person.subject, surf.ns.FOAF.name, Literal("Johnny"))]
+    assert added == [(person.subject, surf.ns.FOAF.nick, Literal("J"))]
+
+    # attributes loaded one at a time
+    person.update()
+    person = Person("http://p1")
+    person.foaf_age = [person.foaf_age.first, 31]
+    person.foaf_mbox = "john@example.com"
+    removed, added = person.changes()
+    assert (person.subject, surf.ns.FOAF.mbox, None) in removed
+    assert (person.subject, surf.ns.FOAF.age, Literal(31)) in added
+    assert (person.subject, surf.ns.FOAF.age, Literal(30)) not in added
+    session.commit()
+
+    person = Person("http://p1")
+    person.load()
+    assert sorted(person.foaf_name) == [Literal("John")]
+    assert sorted(person.foaf_age) == [Literal(30), Literal(31)]
+    assert person.foaf_nick.first == Literal("J")
+    assert person.foaf_mbox.first == Literal("john@example.com")
+
+
+def test_hydrated_attributes(store_session):
+    """
+    Test that attributes loaded from the store don't go through the dirty state.
+    """
+
+    _, session = store_session
+    Person = session.get_class(surf.ns.FOAF.Person)
+    person = Person("http://p1")
+    person.foaf_name = ["John", "Johnny"]
+    person.save()
+
+    class DirtyInstances(set):
+        added = 0
+
+        def add(self, instance):
+            DirtyInstances.added += 1
+            set.add(self, instance)
+
+    dirty_instances = Resource._dirty_instances
+    Resource._dirty_instances = DirtyInstances()
+    try:
+        person = Person.all().full().one()
+        person.load()
+        assert DirtyInstances.added == 0
+        assert sorted(person.foaf_name) == [Literal("John"), Literal("Johnny")]
+        assert sorted(person.rdf_direct[surf.ns.FOAF.name]) == [Literal("John"), Literal("Johnny")]
+
+        # the loaded values stay in sync with rdf_direct
+        person.foaf_name.append("Jo")
+        assert person.dirty
+        assert Literal("Jo") in person.rdf_direct[surf.ns.FOAF.name]
+        person.dirty = False
+    finally:
+        Resource._dirty_instances = dirty_instances
+
+
+def test_windowed_attribute(store_session, record_queries):
+    """
+    Test fetching the values of a large attribute a window at a time.
+    """
+
+    store, session = store_session
+    Person = session.get_class(surf.ns.FOAF.Person)
+    hub = Person("http://hub")
+    hub.foaf_name = "Hub"
+    hub.save()
+    for i in range(10):
+        person = Person("http://p%d" % i)
+        person.foaf_knows = hub
+        person.save()
+
+    queries = record_queries(store)
+
+    session.window_size = 4
+    hub = Person("http://hub")
+    subjects = [URIRef("http://p%d" % i) for i in range(10)]
+    assert hub.is_foaf_knows_of.first.subject == subjects[0]
+    assert [person.subject for person in hub.is_foaf_knows_of[2:5]] == subjects[2:5]
+    assert hub.is_foaf_knows_of[9].subject == subjects[9]
+    assert len(queries) == 3
+
+    # the windows fetched are reused, the last one gives the number of values
+    assert [hub.is_foaf_knows_of[i].subject for i in (1, 3, 6, 8)] == [subjects[i] for i in (1, 3, 6, 8)]
+    assert len(hub.is_foaf_knows_of) == 10
+    assert [person.subject for person in iter(hub.is_foaf_knows_of)] == subjects
+    assert [person.subject for person in hub.is_foaf_knows_of[3:]] == subjects[3:]
+    assert len(queries) == 3
+
+    assert subjects[3] in hub.is_foaf_knows_of
+    assert URIRef("http://p10") not in hub.is_foaf_knows_of
+    assert len(queries) == 5
+
+    # changing the values loads all of them
+    first = hub.is_foaf_knows_of.first
+    del queries[:]
+    hub.is_foaf_knows_of.remove(first)
+    assert len(queries) == 1
+    assert len(hub.is_foaf_knows_of) == 9
+    assert subjects[0] not in hub.is_foaf_knows_of
+    assert len(queries) == 1
+    hub.dirty = False
+    session.window_size = None
+
+
+def test_summary_load(store_session, record_queries):
+    """
+    Test loading only the attributes of a resource and their number of values.
+    """
+
+    store, session = store_session
+    Person = session.get_class(surf.ns.FOAF.Person)
+    hub = Person("http://hub")
+    hub.foaf_name = ["Hub", "The hub"]
+    hub.save()
+    for i in range(5):
+        person = Person("http://p%d" % i)
+        person.foaf_knows = hub
+        person.save()
+
+    queries = record_queries(store)
+
+    hub = Person("http://hub")
+    hub.load(summary=True)
+    assert len(queries) == 2
+    assert hub.is_loaded("foaf_mbox")
+    assert hub.is_loaded("is_foaf_member_of")
+    assert not hub.is_loaded("foaf_name")
+    assert hub.foaf_mbox == []
+    assert len(queries) == 2
+
+    assert sorted(hub.foaf_name) == [Literal("Hub"), Literal("The hub")]
+    assert len(queries) == 3
+
+    # attributes with many values are fetched a window at a time
+    surf.resource.SUMMARY_WINDOW_SIZE, window_size = 2, surf.resource.SUMMARY_WINDOW_SIZE
+    try:
+        del queries[:]
+        hub = Person("http://hub")
+        hub.load(summary=True)
+        assert len(hub.is_foaf_knows_of) == 5
+        assert hub.is_foaf_knows_of.first.subject == URIRef("http://p0")
+        assert len(queries) == 3
+    finally:
+        surf.resource.SUMMARY_WINDOW_SIZE = window_size
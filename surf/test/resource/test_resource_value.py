@@ -170,3 +170,40 @@ def test_get_by_resource(store_value):
         list(value.get_by(foaf_knows=resource))
     except Exception, e:
         pytest.fail(e.message, pytrace=True)
+
+
+def test_deferred_instantiation():
+    """
+    Test that values given with their types are instantiated when accessed.
+    """
+
+    instantiated = []
+
+    class Resource(MockResource):
+        def to_rdf(self, arg):
+            return arg.replace("obj", "uriref")
+
+        def _lazy(self, values):
+            instantiated.extend(values)
+            return [value.replace("uriref", "obj") for value in values]
+
+    types = {"1st_uriref": ["concept"], "2nd_uriref": ["concept"], "3rd_uriref": []}
+    rdf_values = ["1st_uriref", "2nd_uriref", "3rd_uriref"]
+    value = LazyResourceLoader.loaded(Resource(), "some_name", types, rdf_values)
+
+    assert len(value) == 3
+    assert "2nd_obj" in value
+    assert "4th_obj" not in value
+    assert instantiated == []
+
+    assert value.first == "1st_obj"
+    assert instantiated == ["1st_uriref"]
+
+    del instantiated[:]
+    assert list(value) == ["1st_obj", "2nd_obj", "3rd_obj"]
+    assert value[1:] == ["2nd_obj", "3rd_obj"]
+    assert instantiated == rdf_values
+
+    value.append("4th_obj")
+    assert rdf_values[-1] == "4th_uriref"
+    assert len(value) == 4
@@ -132,3 +132,254 @@ def test_get_by_resource(store_proxy):
         list(proxy.get_by(foaf_knows = resource))
     except Exception, e:
         pytest.fail(e.message, pytrace=True)
+
+
+def test_export(record_queries):
+    """
+    Test exporting a collection without creating resources.
+    """
+
+    import json
+    from cStringIO import StringIO
+    from rdflib.term import BNode, URIRef
+
+    store = surf.Store(reader="rdflib", writer="rdflib")
+    session = surf.Session(store)
+    Person = session.get_class(surf.ns.FOAF.Person)
+    for i in range(5):
+        person = Person("http://person/%d" % i)
+        person.foaf_name = "Person %d" % i
+        person.foaf_knows = URIRef("http://person/0")
+    session.commit()
+
+    def no_instances(params, instance_data):
+        raise AssertionError("export must not create resources")
+
+    people = Person.all().instance_factory(no_instances)
+
+    fp = StringIO()
+    people.export(fp, page_size=4)
+    data = json.loads(fp.getvalue())
+    assert sorted(data) == ["http://person/%d" % i for i in range(5)]
+    assert data["http://person/3"][unicode(surf.ns.FOAF.name)] == [
+        {"type": "literal", "value": "Person 3"}]
+
+    fp = StringIO()
+    people.order().desc().limit(2).export(fp, format="nt", direct_only=False)
+    lines = fp.getvalue().splitlines()
+    # rdf:type, foaf:name and foaf:knows, nobody knows persons 4 and 3
+    assert len(lines) == 6
+    assert lines[0].startswith("<http://person/4>")
+
+    fp = StringIO()
+    people.order().limit(1).export(fp, format="nt", direct_only=False)
+    # the 3 direct statements of person 0 and the 4 other people knowing it
+    assert len(fp.getvalue().splitlines()) == 7
+
+    # the statements are selected with VALUES, blank node resources are left out
+    queries = record_queries(store)
+    blank = Person(BNode())
+    blank.foaf_name = "Blank"
+    blank.save()
+    fp = StringIO()
+    people.export(fp, format="nt")
+    assert len(fp.getvalue().splitlines()) == 15
+    assert "VALUES ?s" in unicode(queries[-1]) and "FILTER" not in unicode(queries[-1])
+    blank.remove()
+
+    # every subject is written once, with all its statements
+    fp = StringIO()
+    people.export(fp, direct_only=False, page_size=2)
+    data = json.loads(fp.getvalue())
+    assert len(data["http://person/0"][unicode(surf.ns.FOAF.name)]) == 1
+    assert len(data["http://person/1"][unicode(surf.ns.RDF.type)]) == 1
+
+    # ordered by an attribute with several values, each resource comes once
+    person = Person("http://person/2")
+    person.foaf_nick = ["a", "z"]
+    person.update()
+    fp = StringIO()
+    people.order(surf.ns.FOAF.nick).export(fp, format="nt", page_size=2)
+    subjects = [line.split()[0] for line in fp.getvalue().splitlines()]
+    assert len(subjects) == 17
+    assert subjects[0] == "<http://person/0>" and subjects[-1] == "<http://person/2>"
+    assert subjects.count("<http://person/2>") == 5
+
+
+def test_aggregate():
+    """
+    Test aggregating a collection in the store.
+    """
+
+    from rdflib.term import URIRef
+
+    store = surf.Store(reader="rdflib", writer="rdflib")
+    session = surf.Session(store)
+    Person = session.get_class(surf.ns.FOAF.Person)
+    for i in range(5):
+        person = Person("http://person/%d" % i)
+        person.foaf_age = 20 + i
+        person.foaf_knows = [URIRef("http://person/%d" % j) for j in range(i)]
+    Agent = session.get_class(surf.ns.FOAF.Agent)
+    Agent("http://agent/0").foaf_age = 40
+    session.commit()
+
+    rows = Person.all().aggregate(count=[True, "foaf_knows"])
+    assert rows == [{"count": 5, "count_foaf_knows": 10}]
+    assert Person.all().aggregate(sum="foaf_age", avg="foaf_age") == [{"sum_foaf_age": 110, "avg_foaf_age": 22}]
+
+    rows = Person.get_by(foaf_knows=URIRef("http://person/3")).aggregate(max="foaf_age")
+    assert rows == [{"max_foaf_age": 24}]
+
+    # neither the matched values nor the other attributes multiply the values
+    rows = Person.get_by(foaf_knows=[URIRef("http://person/0"), URIRef("http://person/1")]).aggregate(
+        count=[True, "foaf_knows"], sum="foaf_age")
+    assert rows == [{"count": 4, "count_foaf_knows": 10, "sum_foaf_age": 90}]
+
+    with pytest.raises(ValueError):
+        Person.all().aggregate(sum=True)
+
+    rows = Person.all().aggregate(count="foaf_knows", group_by="foaf_age")
+    assert sorted((row["foaf_age"], row["count_foaf_knows"]) for row in rows) == [
+        (20, 0), (21, 1), (22, 2), (23, 3), (24, 4)]
+
+    rows = ResultProxy(store=store).aggregate(count=True, group_by="rdf_type")
+    assert sorted((unicode(row["rdf_type"]), row["count"]) for row in rows) == [
+        (unicode(surf.ns.FOAF.Agent), 1), (unicode(surf.ns.FOAF.Person), 5)]
+
+
+def test_only(record_queries):
+    """
+    Test loading only some of the attributes of a collection.
+    """
+
+    from rdflib.term import URIRef
+
+    store = surf.Store(reader="rdflib", writer="rdflib")
+    session = surf.Session(store)
+    Person = session.get_class(surf.ns.FOAF.Person)
+    for i in range(5):
+        person = Person("http://person/%d" % i)
+        person.foaf_name = "Person %d" % i
+        person.foaf_age = 20 + i
+        if i:
+            person.foaf_knows = URIRef("http://person/0")
+    session.commit()
+
+    queries = record_queries(store)
+
+    people = list(Person.all().only("foaf_name", "is_foaf_knows_of").order())
+    assert len(queries) == 1
+    assert [person.subject for person in people] == [URIRef("http://person/%d" % i) for i in range(5)]
+    assert people[2].foaf_name.first == Literal("Person 2")
+    assert len(people[0].is_foaf_knows_of) == 4
+    assert people[1].is_foaf_knows_of == []
+    assert not people[0].dirty
+    assert len(queries) == 1
+
+    # the other attributes are loaded lazily
+    assert people[3].foaf_age.first == Literal(23)
+    assert len(queries) == 2
+
+    del queries[:]
+    people = list(Person.all().only("foaf_name").order().desc().limit(2))
+    assert [person.foaf_name.first for person in people] == [Literal("Person 4"), Literal("Person 3")]
+    assert len(queries) == 2
+
+
+def test_after():
+    """
+    Test keyset pagination.
+    """
+
+    from rdflib.term import URIRef
+
+    store = surf.Store(reader="rdflib", writer="rdflib")
+    session = surf.Session(store)
+    Person = session.get_class(surf.ns.FOAF.Person)
+    for i in range(7):
+        person = Person("http://person/%d" % i)
+        person.foaf_name = "Person %d" % i
+        if i != 3:
+            person.foaf_age = 20 + i % 3
+    session.commit()
+
+    def pages(people, size):
+        result = []
+        page = list(people.limit(size))
+        while page:
+            result.append([person.subject for person in page])
+            page = list(people.limit(size).after(people.page_token(page[-1])))
+        return result
+
+    subjects = [URIRef("http://person/%d" % i) for i in range(7)]
+    assert pages(Person.all().order(), 3) == [subjects[0:3], subjects[3:6], subjects[6:]]
+    assert pages(Person.all().order().desc(), 4) == [subjects[:2:-1], subjects[2::-1]]
+
+    # by age, then subject, person 3 has no age
+    by_age = [subjects[i] for i in (3, 0, 6, 1, 4, 2, 5)]
+    assert sum(pages(Person.all().order(surf.ns.FOAF.age), 2), []) == by_age
+    assert sum(pages(Person.all().order(surf.ns.FOAF.age).desc(), 3), []) == by_age[::-1]
+
+    people = list(Person.all().order(surf.ns.FOAF.age).after(subjects[6], Literal(20)).limit(2))
+    assert [person.subject for person in people] == by_age[3:5]
+
+    with pytest.raises(ValueError):
+        Person.all().after("not a token")
+
+
+def test_full_auto_load(record_queries):
+    """
+    Test that fully loaded collections don't load their instances again.
+    """
+
+    from surf.resource import FULL, FULL_DIRECT, PARTIAL, UNLOADED
+
+    store = surf.Store(reader="rdflib", writer="rdflib")
+    session = surf.Session(store, auto_load=True)
+    Person = session.get_class(surf.ns.FOAF.Person)
+    for i in range(3):
+        person = Person("http://person/%d" % i)
+        person.foaf_name = "Person %d" % i
+    session.commit()
+
+    queries = record_queries(store)
+
+    session.auto_load = False
+    list(Person.all().full().order())
+    without_auto_load = len(queries)
+
+    session.auto_load = True
+    del queries[:]
+    people = list(Person.all().full().order())
+    assert len(queries) == without_auto_load
+    assert [person.load_state for person in people] == [FULL] * 3
+    assert people[0].foaf_name.first == Literal("Person 0")
+    assert not people[0].dirty
+
+    # only the inverse attributes are left to load
+    session.auto_load = False
+    del queries[:]
+    list(Person.all().full(direct_only=True))
+    without_auto_load = len(queries)
+
+    session.auto_load = True
+    del queries[:]
+    people = list(Person.all().full(direct_only=True))
+    assert len(queries) == without_auto_load + 3
+    assert people[0].load_state == FULL
+
+    session.auto_load = False
+    del queries[:]
+    person = Person.all().only("foaf_name", "foaf_knows").first()
+    assert len(queries) == 1
+    assert person.load_state == PARTIAL
+    assert person.is_loaded("foaf_knows")
+    assert not person.is_loaded("foaf_age")
+    assert person.foaf_knows == []
+    assert len(queries) == 1
+
+    person = Person.all().full(direct_only=True).first()
+    assert person.load_state == FULL_DIRECT
+    assert Person("http://person/4").load_state == UNLOADED
+
@@ -0,0 +1,130 @@
+# coding=UTF-8
+import gzip
+import os
+
+import pytest
+
+from surf import Store
+from surf.loader import BulkLoadException, StatementParser
+from surf.rdf import BNode, Literal, URIRef
+
+NTRIPLES = u"""# a comment
+<http://a> <http://p> <http://b> .
+<http://a> <http://p> "naïve"@fr .
+
+<http://b> <http://p> "1"^^<http://www.w3.org/2001/XMLSchema#integer> .
+_:x <http://p> <http://a> .
+<http://c> <http://p> _:x .
+""".encode('utf-8')
+
+NQUADS = """<http://a> <http://p> <http://b> <http://g1> .
+<http://a> <http://p> <http://c> .
+<http://b> <http://p> <http://c> <http://g2> .
+"""
+
+
+def _store():
+    return Store(reader="rdflib", writer="rdflib", rdflib_store="IOMemory")
+
+
+def _write(tmpdir, name, content, compress=False):
+    path = str(tmpdir.join(name))
+    fp = gzip.open(path, "wb") if compress else open(path, "wb")
+    fp.write(content)
+    fp.close()
+    return path
+
+
+def test_parse_statement():
+    """
+    Test that triples, quads, comments and blank lines are parsed.
+    """
+
+    parser = StatementParser()
+    assert parser.parse_statement(u"# comment") is None
+    assert parser.parse_statement(u"   ") is None
+
+    s, p, o, context = parser.parse_statement(u'<http://a> <http://p> "x"@en .')
+    assert (s, p, o, context) == (URIRef("http://a"), URIRef("http://p"), Literal("x", lang="en"), None)
+
+    quad = parser.parse_statement(u"_:b <http://p> <http://o> <http://g> .")
+    assert isinstance(quad[0], BNode)
+    assert quad[3] == URIRef("http://g")
+    assert parser.parse_statement(u"_:b <http://p> <http://o> .")[0] == quad[0]
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_bulk_load_ntriples(tmpdir, compress):
+    """
+    Test loading plain and gzip compressed N-Triples in several batches.
+    """
+
+    store = _store()
+    path = _write(tmpdir, "data.nt", NTRIPLES, compress)
+    assert store.bulk_load(path, batch_size=2, workers=3) == 5
+    assert len(store) == 5
+
+    graph = store.writer.graph
+    assert (URIRef("http://a"), URIRef("http://p"), Literal(u"naïve", lang="fr")) in graph
+    bnode = graph.value(URIRef("http://c"), URIRef("http://p"))
+    assert graph.value(bnode, URIRef("http://p")) == URIRef("http://a")
+
+
+def test_bulk_load_nquads_context(tmpdir):
+    """
+    Test that quads keep their graph and triples go to the given context.
+    """
+
+    store = _store()
+    path = _write(tmpdir, "data.nq", NQUADS)
+    assert store.bulk_load(path, context=URIRef("http://default")) == 3
+
+    graph = store.writer.graph
+    assert len(graph.get_context(URIRef("http://g1"))) == 1
+    assert len(graph.get_context(URIRef("http://g2"))) == 1
+    assert len(graph.get_context(URIRef("http://default"))) == 1
+
+
+def test_bulk_load_resume(tmpdir):
+    """
+    Test that a failed load resumes from its checkpoint.
+    """
+
+    store = _store()
+    path = _write(tmpdir, "data.nt", NTRIPLES)
+    checkpoint = str(tmpdir.join("data.checkpoint"))
+
+    add_triples = store.writer.add_triples
+    calls = []
+
+    def failing_add_triples(quads):
+        calls.append(quads)
+        if len(calls) == 3:
+            raise Exception("connection lost")
+        add_triples(quads)
+
+    store.writer.add_triples = failing_add_triples
+    with pytest.raises(BulkLoadException):
+        store.bulk_load(path, batch_size=2, checkpoint=checkpoint)
+    assert len(store) == 4
+    assert os.path.exists(checkpoint)
+
+    assert store.bulk_load(path, batch_size=2, checkpoint=checkpoint) == 1
+    assert len(store) == 5
+    assert not os.path.exists(checkpoint)
+
+    # the blank node written before the failure is the one read after it
+    graph = store.writer.graph
+    bnode = graph.value(URIRef("http://c"), URIRef("http://p"))
+    assert graph.value(bnode, URIRef("http://p")) == URIRef("http://a")
+
+
+def test_bulk_load_invalid_line(tmpdir):
+    """
+    Test that a malformed line aborts the load.
+    """
+
+    store = _store()
+    path = _write(tmpdir, "data.nt", "<http://a> <http://p> .\n")
+    with pytest.raises(BulkLoadException):
+        store.bulk_load(path)
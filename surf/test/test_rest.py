@@ -0,0 +1,79 @@
+import pytest
+from datetime import datetime
+
+import surf
+from surf.rdf import Literal, URIRef
+from surf.rest import Rest
+
+
+@pytest.fixture
+def rest():
+    store = surf.Store(reader="rdflib", writer="rdflib")
+    session = surf.Session(store)
+    Person = session.get_class(surf.ns.FOAF.Person)
+    for i in range(5):
+        person = Person("http://people/%d" % i)
+        person.foaf_name = "Person %d" % i
+        person.foaf_knows = URIRef("http://people/0")
+        if i == 1:
+            person.dcterms_modified = datetime(2010, 1, 1)
+    session.commit()
+    return Rest("http://people/", Person)
+
+
+def test_index(rest):
+    """
+    Test paging and projecting the collection.
+    """
+
+    page = list(rest.index(limit=2, fields=["foaf_name"]))
+    assert [person.subject for person in page] == [URIRef("http://people/0"), URIRef("http://people/1")]
+    assert page[1].foaf_name.first == Literal("Person 1")
+
+    token = rest.index(limit=2).page_token(page[-1])
+    page = list(rest.index(limit=2, page_token=token))
+    assert [person.subject for person in page] == [URIRef("http://people/2"), URIRef("http://people/3")]
+
+    page = list(rest.index(limit=2, offset=4))
+    assert [person.subject for person in page] == [URIRef("http://people/4")]
+    assert len(rest.index()) == 5
+
+
+def test_show_etag(rest, record_queries):
+    """
+    Test conditional retrieval of a resource.
+    """
+
+    etag = rest.etag("0")
+    assert etag == rest.etag("0")
+    assert etag != rest.etag("0", direct_only=True)
+
+    person = rest.show("0", if_none_match='"outdated"')
+    assert len(person.is_foaf_knows_of) == 5
+    assert person.foaf_name.first == Literal("Person 0")
+
+    # an up to date copy costs a presence check and one statements query
+    queries = record_queries(rest._Resource.session.default_store)
+    assert rest.show("0", if_none_match=etag) is None
+    assert len(queries) == 2
+    assert rest.etag("missing") is None
+
+    # the generic implementation reads the same statements
+    from surf.plugin.reader import RDFReader
+    reader = rest._Resource.session.default_store.reader
+    subject, knows = URIRef("http://people/0"), surf.ns.FOAF.knows
+    for attributes in (None, [(knows, False), (surf.ns.FOAF.name, True)]):
+        assert (sorted(RDFReader._statements(reader, subject, attributes, False, None))
+                == sorted(reader._statements(subject, attributes, False, None)))
+
+    person.foaf_name = "Someone"
+    person.update()
+    assert rest.etag("0") != etag
+
+    etag = rest.etag("1", fields=["foaf_name"])
+    assert rest.show("1", fields=["foaf_name"], if_none_match=etag) is None
+    person = rest.show("1", fields=["foaf_name"])
+    assert person.foaf_name.first == Literal("Person 1")
+
+    assert rest.last_modified("1") == datetime(2010, 1, 1)
+    assert rest.last_modified("2") is None
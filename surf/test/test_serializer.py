@@ -0,0 +1,119 @@
+# coding=UTF-8
+import json
+from cStringIO import StringIO
+
+import pytest
+
+import surf
+from surf.rdf import BNode, Graph, Literal, URIRef
+from surf.serializer import serialize_resources, serialize_triples, to_json
+
+
+@pytest.fixture
+def person():
+    """ Return a resource with direct and inverse values. """
+
+    store = surf.Store(reader="rdflib", writer="rdflib")
+    session = surf.Session(store)
+    Person = session.get_class(surf.ns.FOAF.Person)
+    john = Person("http://john")
+    john.foaf_name = [Literal(u"Jöhn", lang="de"), "John"]
+    john.foaf_age = 42
+    john.foaf_knows = URIRef("http://jane")
+    john.rdf_inverse[surf.ns.FOAF.knows] = [URIRef("http://jane"), BNode("b1")]
+    yield john
+    # do not leave dirty instances behind for other tests
+    session.commit()
+
+
+def test_to_json():
+    """
+    Test the rdf-json serialization of a graph.
+    """
+
+    graph = Graph()
+    graph.add((URIRef("http://a"), URIRef("http://p"), Literal("x", lang="en")))
+    graph.add((URIRef("http://a"), URIRef("http://p"), URIRef("http://b")))
+    graph.add((BNode("c"), URIRef("http://q"), Literal(1)))
+
+    data = json.loads(to_json(graph))
+    assert sorted(data) == ["c", "http://a"]
+    assert {"value": "x", "type": "literal", "lang": "en"} in data["http://a"]["http://p"]
+    assert {"value": "http://b", "type": "uri"} in data["http://a"]["http://p"]
+    assert data["c"]["http://q"][0]["datatype"] == "http://www.w3.org/2001/XMLSchema#integer"
+
+
+def test_serialize_json_matches_graph(person):
+    """
+    Test that the streaming rdf-json serialization equals the graph based one.
+    """
+
+    for direct in (True, False):
+        expected = json.loads(to_json(person.graph(direct=direct)))
+        data = json.loads(person.serialize("json", direct=direct))
+        for subject in data:
+            for predicate in data[subject]:
+                data[subject][predicate].sort()
+                expected[subject][predicate].sort()
+        assert data == expected
+
+
+def test_serialize_ntriples(person):
+    """
+    Test that the N-Triples serialization holds the graph of the resource.
+    """
+
+    graph = Graph()
+    graph.parse(data=person.serialize("nt", direct=False), format="nt")
+    assert len(graph) == len(person.graph(direct=False))
+    assert (URIRef("http://john"), surf.ns.FOAF.name, Literal(u"Jöhn", lang="de")) in graph
+
+
+def test_serialize_json_ld(person):
+    """
+    Test the JSON-LD serialization of a resource.
+    """
+
+    fp = StringIO()
+    person.serialize("json-ld", direct=True, fp=fp)
+    nodes = json.loads(fp.getvalue())
+    assert len(nodes) == 1
+    assert nodes[0]["@id"] == "http://john"
+    assert {"@value": u"Jöhn", "@language": "de"} in nodes[0][unicode(surf.ns.FOAF.name)]
+    assert nodes[0][unicode(surf.ns.FOAF.knows)] == [{"@id": "http://jane"}]
+
+
+def test_serialize_resources(person):
+    """
+    Test streaming several resources at once.
+    """
+
+    jane = person.__class__("http://jane")
+    jane.foaf_name = "Jane"
+
+    fp = StringIO()
+    serialize_resources([person, jane], fp, format="json")
+    data = json.loads(fp.getvalue())
+    assert sorted(data) == ["http://jane", "http://john"]
+
+    with pytest.raises(ValueError):
+        serialize_triples([], fp, format="rdfa")
+
+
+def test_serialize_json_merges_subjects(person):
+    """
+    Test that every subject is written once in rdf-json.
+    """
+
+    person.rdf_inverse[surf.ns.FOAF.knows].append(person.subject)
+    data = json.loads(person.serialize("json", direct=False))
+    knows = data["http://john"][unicode(surf.ns.FOAF.knows)]
+    assert {"value": "http://john", "type": "uri"} in knows
+    assert data["http://john"][unicode(surf.ns.FOAF.name)]
+
+    fp = StringIO()
+    serialize_triples([(URIRef("http://a"), URIRef("http://p"), Literal("x")),
+                       (URIRef("http://b"), URIRef("http://p"), Literal("y")),
+                       (URIRef("http://a"), URIRef("http://q"), Literal("z"))], fp, format="json")
+    data = json.loads(fp.getvalue())
+    assert sorted(data["http://a"]) == ["http://p", "http://q"]
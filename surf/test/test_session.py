@@ -19,3 +19,148 @@ def test_close_multiples_stores():
         session.close()
     except Exception, e:
         pytest.fail(e.message, pytrace=True)
+
+
+def test_get_resources(record_queries):
+    """
+    Test getting many resources by subject at once.
+    """
+
+    import surf
+    from surf.plugin import query_reader
+    from surf.rdf import Literal, URIRef
+
+    store = Store(reader="rdflib", writer="rdflib")
+    session = Session(store)
+    Person = session.get_class(surf.ns.FOAF.Person)
+    for i in range(5):
+        person = Person("http://person/%d" % i)
+        person.foaf_name = "Person %d" % i
+        person.foaf_knows = URIRef("http://person/%d" % ((i + 1) % 5))
+    session.commit()
+
+    queries = record_queries(store)
+
+    subjects = ["http://person/3", "http://nobody", URIRef("http://person/1"), "http://person/4"]
+    chunk, query_reader.GET_SUBJECTS_CHUNK = query_reader.GET_SUBJECTS_CHUNK, 2
+    try:
+        resources = session.get_resources(subjects)
+    finally:
+        query_reader.GET_SUBJECTS_CHUNK = chunk
+    assert len(queries) == 2
+
+    assert resources[1] is None
+    assert [resource.subject for resource in resources if resource] == [
+        URIRef("http://person/3"), URIRef("http://person/1"), URIRef("http://person/4")]
+    assert resources[0].foaf_name.first == Literal("Person 3")
+    assert resources[0].foaf_knows.first.subject == URIRef("http://person/4")
+    assert resources[2].is_foaf_knows_of.first.subject == URIRef("http://person/0")
+    assert not resources[0].dirty
+    assert len(queries) == 2
+
+    resources = session.get_resources(subjects, concept=surf.ns.FOAF.Person, full=False)
+    assert len(queries) == 2
+    assert resources[1].subject == URIRef("http://nobody")
+
+    # with several types, the class is the one of the first type in sorted order
+    store.add_triple(URIRef("http://person/3"), surf.ns.RDF.type, surf.ns.FOAF.Agent)
+    resources = session.get_resources(subjects)
+    assert resources[0].uri == surf.ns.FOAF.Agent
+    assert resources[2].uri == surf.ns.FOAF.Person
+
+
+def test_auto_persist():
+    """
+    Test writing the modified resources in the background.
+    """
+
+    import surf
+    from surf.rdf import Literal, URIRef
+
+    store = Store(reader="rdflib", writer="rdflib")
+    session = Session(store, auto_persist=True)
+    session.write_behind.delay = 60
+
+    batches = []
+    write_batch = store.writer.write_batch
+    store.writer.write_batch = lambda removed, added: batches.append(added) or write_batch(removed, added)
+
+    Person = session.get_class(surf.ns.FOAF.Person)
+    people = [Person("http://person/%d" % i) for i in range(3)]
+    for person in people:
+        person.foaf_name = "Name"
+    people[0].foaf_name = "Changed"
+    people[0].foaf_nick = "Nick"
+    assert session.write_behind.pending == 3
+    assert people[0].dirty
+    assert batches == []
+
+    session.flush()
+    assert session.write_behind.pending == 0
+    assert len(batches) == 1
+    assert sorted(set(s for s, p, o, c in batches[0])) == [person.subject for person in people]
+    assert not people[0].dirty
+    assert Person("http://person/0").foaf_name.first == Literal("Changed")
+
+    # failed writes are reported, the resources stay dirty
+    errors = []
+    session.write_behind.on_error = lambda resources, e: errors.append((resources, e))
+
+    def failing_write_batch(removed, added):
+        raise ValueError("store is down")
+
+    store.writer.write_batch = failing_write_batch
+    people[1].foaf_name = "Lost"
+    session.flush()
+    assert [resource.subject for resource in errors[0][0]] == [URIRef("http://person/1")]
+    assert isinstance(errors[0][1], ValueError)
+    assert people[1].dirty
+
+    # changed while it is written, a resource stays dirty and is written again
+    dirty = []
+
+    def changing_write_batch(removed, added):
+        dirty.append(people[2].dirty)
+        if len(dirty) == 1:
+            people[2].foaf_name = "Second"
+        write_batch(removed, added)
+
+    store.writer.write_batch = changing_write_batch
+    people[2].foaf_name = "First"
+    session.flush()
+    assert dirty == [True, True]
+    assert not people[2].dirty
+    assert list(store.reader.graph.objects(people[2].subject, surf.ns.FOAF.name)) == [Literal("Second")]
+
+    store.writer.write_batch = write_batch
+    session.auto_persist = False
+    assert session.write_behind is None
+    session.commit()
+    assert Person("http://person/1").foaf_name.first == Literal("Lost")
+
+
+def test_auto_persist_back_pressure():
+    """
+    Test that queuing blocks while too many resources wait to be written.
+    """
+
+    import surf
+
+    store = Store(reader="rdflib", writer="rdflib")
+    session = Session(store, auto_persist=True)
+    session.write_behind.delay = 60
+    session.write_behind.max_pending = 2
+    session.write_behind.batch_size = 10
+
+    updates = []
+    write_batch = store.writer.write_batch
+    store.writer.write_batch = lambda removed, added: (updates.append(len(set(quad[0] for quad in added)))
+                                                       or write_batch(removed, added))
+
+    Person = session.get_class(surf.ns.FOAF.Person)
+    for i in range(5):
+        Person("http://person/%d" % i).foaf_name = "Name"
+    session.flush()
+    assert sum(updates) == 5
+    assert max(updates) <= 2
+    session.close()
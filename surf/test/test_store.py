@@ -145,3 +145,152 @@ def test_successful_close():
         store.close()
     except Exception, e:
         pytest.fail(e.message, pytrace=True)
+
+
+def test_execute_prepared():
+    """
+    Test executing a query with parameters, prepared once per store.
+    """
+
+    from surf.query import a, param, select
+    from surf.rdf import Literal, URIRef
+
+    store = Store(reader="rdflib", writer="rdflib", log_level=logging.NOTSET)
+    session = Session(store)
+    Person = session.get_class(surf.ns.FOAF.Person)
+    for name in ["John", "Jane"]:
+        person = Person("http://%s" % name)
+        person.foaf_name = name
+    session.commit()
+
+    query = select("?name").where((param("s"), a, surf.ns.FOAF.Person),
+                                  (param("s"), surf.ns.FOAF.name, "?name"))
+    for name in ["John", "Jane"]:
+        rows = list(store.execute(query, s=URIRef("http://%s" % name)))
+        assert [unicode(row[0]) for row in rows] == [name]
+    assert store.prepare(query) is store.prepare(query)
+
+    # a query changed after it was executed is prepared again
+    query.where((param("s"), surf.ns.FOAF.name, Literal("John")))
+    assert list(store.execute(query, s=URIRef("http://Jane"))) == []
+    assert [unicode(row[0]) for row in store.execute(query, s=URIRef("http://John"))] == ["John"]
+
+    # placeholders are never sent unbound
+    with pytest.raises(ValueError) as e:
+        store.execute(query)
+    assert str(e.value) == "Unbound query parameters: s"
+    assert len(list(store.execute(select("?s").where(("?s", a, surf.ns.FOAF.Person))))) == 2
+
+
+def test_update_stored_values():
+    """
+    Test that saving and updating through the store record the values written.
+    """
+
+    from surf.rdf import Literal
+
+    store = Store(reader="rdflib", writer="rdflib", log_level=logging.NOTSET)
+    session = Session(store)
+    Person = session.get_class(surf.ns.FOAF.Person)
+    person = Person("http://a")
+    person.load()
+    person.foaf_name = "B"
+    store.update(person)
+    person.foaf_name = "A"
+    store.update(person)
+    assert list(store.reader.graph.objects(person.subject, surf.ns.FOAF.name)) == [Literal("A")]
+
+    store.save(person)
+    person.foaf_nick = "N"
+    assert person.changes() == ([], [(person.subject, surf.ns.FOAF.nick, Literal("N"))])
+
+
+def test_are_present():
+    """
+    Test checking the existence of many resources at once.
+    """
+
+    from surf.plugin import query_reader
+    from surf.plugin.query_reader import RDFQueryReader
+    from surf.rdf import Literal, URIRef
+
+    store = Store(reader="rdflib", writer="rdflib", log_level=logging.NOTSET)
+    session = Session(store)
+    Person = session.get_class(surf.ns.FOAF.Person)
+    people = [Person("http://person/%d" % i) for i in range(5)]
+    for person in people[:3]:
+        person.foaf_name = "Person"
+    session.commit()
+
+    expected = set(person.subject for person in people[:3])
+    assert store.are_present(people) == expected
+    assert store.are_present([URIRef("http://person/1"), URIRef("http://other")]) == set([URIRef("http://person/1")])
+    assert store.are_present([]) == set()
+    assert store.are_present(["http://person/2", "http://other"]) == set([URIRef("http://person/2")])
+
+    # the resources are looked for in their own context
+    one, two = URIRef("http://graph/1"), URIRef("http://graph/2")
+    store.reader.graph.get_context(one).add((URIRef("http://person/5"), surf.ns.FOAF.name, Literal("Person")))
+    assert store.are_present([Person("http://person/5", context=one), Person("http://person/0", context=two),
+                              Person("http://person/0")]) == set([URIRef("http://person/5"), URIRef("http://person/0")])
+    assert store.are_present([Person("http://person/5", context=two)]) == set()
+    assert store.are_present([URIRef("http://person/5")], context=two) == set()
+
+    # the query based implementation, in chunks
+    chunk, query_reader.PRESENT_SUBJECTS_CHUNK = query_reader.PRESENT_SUBJECTS_CHUNK, 2
+    try:
+        subjects = [person.subject for person in people]
+        assert RDFQueryReader._are_present(store.reader, subjects, None) == expected
+    finally:
+        query_reader.PRESENT_SUBJECTS_CHUNK = chunk
+
+
+def test_batch():
+    """
+    Test writing triples added and removed in a batch at once.
+    """
+
+    from surf.rdf import Literal, URIRef
+
+    store = Store(reader="rdflib", writer="rdflib", log_level=logging.NOTSET)
+    a, b, c = URIRef("http://a"), URIRef("http://b"), URIRef("http://c")
+    knows, name = surf.ns.FOAF.knows, surf.ns.FOAF.name
+    store.add_triple(a, knows, b)
+    store.add_triple(a, name, Literal("A"))
+
+    batches = []
+    write_batch = store.writer.write_batch
+    store.writer.write_batch = lambda removed, added: batches.append((removed, added)) or write_batch(removed, added)
+
+    with store.batch() as batch:
+        batch.set_triple(a, knows, c)
+        batch.add_triple(b, name, Literal("B"))
+        batch.add_triple(c, name, Literal("C"))
+        batch.remove_triple(c, None, None)
+        batch.remove_triple(a, name, Literal("A"))
+        batch.add_triple(a, name, Literal("A"))
+        assert batches == []
+
+    assert len(batches) == 1
+    graph = store.reader.graph
+    assert set(graph.triples((None, None, None))) == set([(a, knows, c), (a, name, Literal("A")),
+                                                         (b, name, Literal("B"))])
+
+    # removals drop the matching recorded additions, by subject and
+    # predicate or by scanning them for other patterns
+    with store.batch() as batch:
+        for o in (a, b, c):
+            batch.set_triple(o, knows, a)
+            batch.add_triple(o, name, Literal("X"))
+        batch.set_triple(b, knows, c)
+        batch.remove_triple(c, name, Literal("X"))
+        batch.remove_triple(None, name, None)
+        assert batch.added == [(a, knows, a, None), (c, knows, a, None), (b, knows, c, None)]
+
+    # nothing is written when the block fails
+    with pytest.raises(ValueError):
+        with store.batch() as batch:
+            batch.remove_triple(a, None, None)
+            raise ValueError()
+    assert len(batches) == 2
+    assert (b, knows, c) in graph